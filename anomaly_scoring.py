@@ -0,0 +1,113 @@
+import itertools
+import warnings
+
+import numpy as np
+
+# Scale factor making the median absolute deviation a consistent estimator of
+# the standard deviation for normally distributed counts
+MAD_SCALE = 1.4826
+
+ANOMALY_MODELS = ('mean', 'median', 'ewma', 'zscore', 'mad')
+
+# Models that can be scored from a group's point count, sum and sum of squares alone
+SUMMARY_MODELS = ('mean', 'zscore')
+
+def build_history_matrix(historical_counts, depth=None):
+    """Pack per-group history lists (newest first) into a NaN-padded float matrix."""
+    if depth is None:
+        depth = max((len(counts) for counts in historical_counts), default=0)
+    lengths = np.fromiter((min(len(counts), depth) for counts in historical_counts),
+                          dtype=np.intp, count=len(historical_counts))
+    values = np.fromiter(itertools.chain.from_iterable(counts[:depth] for counts in historical_counts),
+                         dtype=float, count=int(lengths.sum()))
+    matrix = np.full((len(historical_counts), depth), np.nan)
+    # Boolean assignment fills row by row, matching the order of the flattened values
+    matrix[np.arange(depth) < lengths[:, None]] = values
+    return matrix
+
+def _ewma(history, alpha):
+    """Exponentially weighted mean of each row, newest value first, ignoring NaN padding."""
+    weights = alpha * (1 - alpha) ** np.arange(history.shape[1])
+    present = ~np.isnan(history)
+    weighted = np.where(present, history, 0.0) * weights
+    total_weight = (present * weights).sum(axis=1)
+    return weighted.sum(axis=1) / total_weight
+
+def _safe_ratio(deviation, scale):
+    """deviation / scale, where a zero scale is 0 for no deviation and inf otherwise."""
+    return np.where(scale > 0, deviation / np.where(scale > 0, scale, 1.0),
+                    np.where(deviation > 0, np.inf, 0.0))
+
+def _classify(expected, score, sufficient, threshold):
+    """Blank out groups with insufficient history and label the rest against the threshold."""
+    expected = np.where(sufficient, expected, np.nan)
+    score = np.where(sufficient, score, np.nan)
+    status = np.where(~sufficient, 'insufficient_data',
+                      np.where(score >= threshold, 'anomaly', 'normal'))
+    return expected, score, status
+
+def score_anomalies(current_counts, history, model='mean', threshold=0.1,
+                    minimum_data_points=5, ewma_alpha=0.3):
+    """Score every group's current count against its history in one vectorised pass.
+
+    history is a (groups x points) matrix, newest point first and NaN-padded.
+    For the mean, median and ewma models the score is the relative change from
+    the expected count; for zscore and mad it is the number of (robust) standard
+    deviations from the mean or median. A group is an anomaly when its score
+    reaches the threshold. Returns (expected, score, status) arrays, with NaN
+    expected and score values for groups with insufficient history.
+    """
+    if model not in ANOMALY_MODELS:
+        raise ValueError(f"Unsupported anomaly model: {model}")
+    current = np.asarray(current_counts, dtype=float)
+    history = np.asarray(history, dtype=float).reshape(len(current), -1)
+    points = (~np.isnan(history)).sum(axis=1)
+    sufficient = points >= max(minimum_data_points, 1)
+
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        if model == 'mean':
+            expected = np.nanmean(history, axis=1)
+            score = _safe_ratio(np.abs(current - expected), expected)
+        elif model == 'median':
+            expected = np.nanmedian(history, axis=1)
+            score = _safe_ratio(np.abs(current - expected), expected)
+        elif model == 'ewma':
+            expected = _ewma(history, ewma_alpha)
+            score = _safe_ratio(np.abs(current - expected), expected)
+        elif model == 'zscore':
+            expected = np.nanmean(history, axis=1)
+            score = _safe_ratio(np.abs(current - expected), np.nanstd(history, axis=1))
+        else:
+            expected = np.nanmedian(history, axis=1)
+            mad = np.nanmedian(np.abs(history - expected[:, None]), axis=1)
+            score = _safe_ratio(np.abs(current - expected), MAD_SCALE * mad)
+
+    return _classify(expected, score, sufficient, threshold)
+
+def score_anomalies_from_summary(current_counts, point_counts, count_sums, count_sum_squares,
+                                 model='mean', threshold=0.1, minimum_data_points=5):
+    """Score every group's current count against rolling statistics of its history.
+
+    Each group's history is given as the number of points, their sum and their
+    sum of squares, as kept in row_count_summary. The scores match
+    score_anomalies over the same points for the mean and zscore models, the
+    only ones the statistics determine.
+    """
+    if model not in SUMMARY_MODELS:
+        raise ValueError(f"Anomaly model {model} cannot be scored from summary statistics")
+    current = np.asarray(current_counts, dtype=float)
+    points = np.asarray(point_counts, dtype=float)
+    sums = np.asarray(count_sums, dtype=float)
+    squares = np.asarray(count_sum_squares, dtype=float)
+    sufficient = points >= max(minimum_data_points, 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = sums / points
+        if model == 'mean':
+            score = _safe_ratio(np.abs(current - expected), expected)
+        else:
+            # Population variance from the sums, clamped at zero against rounding
+            variance = np.maximum(points * squares - sums * sums, 0.0) / (points * points)
+            score = _safe_ratio(np.abs(current - expected), np.sqrt(variance))
+    return _classify(expected, score, sufficient, threshold)
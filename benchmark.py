@@ -0,0 +1,397 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timedelta
+
+import pandas as pd
+import yaml
+
+from config_compiler import compile_config
+from data_quality_checks import generate_group_count_query, refresh_history_summaries
+from execution_backends import DuckDBClient
+from group_keys import canonical_group_by, group_key, serialize_group_values
+from main import main as run_pipeline
+
+BENCHMARK_DATASET = 'benchmark_dataset'
+HISTORY_TABLE_ID = 'your_project.your_dataset.row_count_history'  # Same table as data_quality_checks
+
+# Bytes per value as BigQuery bills them; strings cost 2 bytes plus their length
+BIGQUERY_VALUE_BYTES = {
+    'BOOLEAN': 1,
+    'UUID': 38
+}
+DEFAULT_VALUE_BYTES = 8
+
+class FakeWarehouseClient(DuckDBClient):
+    """DuckDB stand-in for BigQuery that meters every call and injects latency.
+
+    Bytes scanned are estimated as BigQuery would bill them: the size of every
+    column of a referenced table that the query mentions.
+    """
+
+    def __init__(self, database=':memory:', query_latency=0.0, insert_latency=0.0):
+        super().__init__(database)
+        self.query_latency = query_latency
+        self.insert_latency = insert_latency
+        self._metrics_lock = threading.Lock()
+        self._column_bytes = {}
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self.metrics = {
+                'queries': 0,
+                'dry_runs': 0,
+                'bytes_scanned': 0,
+                'insert_calls': 0,
+                'load_jobs': 0,
+                'rows_written': {}
+            }
+
+    def _record(self, metric, amount=1):
+        with self._metrics_lock:
+            self.metrics[metric] += amount
+
+    def column_bytes(self, schema, table):
+        """Billed bytes per column of a table, cached until the table is written to."""
+        key = (schema, table)
+        if key not in self._column_bytes:
+            cursor = self._cursor()
+            try:
+                columns = cursor.execute(
+                    "SELECT column_name, data_type FROM information_schema.columns "
+                    "WHERE table_schema = ? AND table_name = ?", [schema, table]
+                ).fetchall()
+                if not columns:
+                    return {}
+                sizes = [
+                    f'COALESCE(SUM(LENGTH(CAST("{name}" AS VARCHAR)) + 2), 0)' if data_type == 'VARCHAR'
+                    else f'COUNT("{name}") * {BIGQUERY_VALUE_BYTES.get(data_type, DEFAULT_VALUE_BYTES)}'
+                    for name, data_type in columns
+                ]
+                totals = cursor.execute(f'SELECT {", ".join(sizes)} FROM "{schema}"."{table}"').fetchone()
+            finally:
+                cursor.close()
+            self._column_bytes[key] = {name.lower(): int(size) for (name, _), size in zip(columns, totals)}
+        return self._column_bytes[key]
+
+    def estimate_bytes(self, query):
+        """Bytes BigQuery would bill for a query over the referenced tables' mentioned columns.
+
+        A TABLESAMPLE after a table reference scales that table's bytes.
+        """
+        words = set(re.findall(r'\w+', query.lower()))
+        select_all = re.search(r'SELECT\s+\*', query, re.IGNORECASE) is not None
+        total = 0
+        references = re.findall(r'"([^"]+)"\."([^"]+)"(?:\s+TABLESAMPLE\s+\w+\s*\(([\d.]+) PERCENT\))?', query)
+        for schema, table, sample_percent in set(references):
+            # Only the sampled fraction of a table is read and billed
+            fraction = float(sample_percent) / 100 if sample_percent else 1.0
+            for column, size in self.column_bytes(schema, table).items():
+                if select_all or column in words:
+                    total += int(size * fraction)
+        return total
+
+    def query(self, query, job_config=None, **kwargs):
+        job = super().query(query, job_config, **kwargs)
+        job.total_bytes_processed = job.total_bytes_billed = self.estimate_bytes(query)
+        if job.dry_run:
+            # Dry runs are answered without running the query but still cost a round trip
+            time.sleep(self.query_latency)
+            self._record('dry_runs')
+        else:
+            self._record('queries')
+            self._record('bytes_scanned', job.total_bytes_processed)
+        return job
+
+    def run_query(self, query, dry_run=False):
+        if not dry_run:
+            time.sleep(self.query_latency)
+        return super().run_query(query, dry_run)
+
+    def insert_rows_json(self, table_id, json_rows, **kwargs):
+        time.sleep(self.insert_latency)
+        errors = super().insert_rows_json(table_id, json_rows, **kwargs)
+        with self._metrics_lock:
+            self.metrics['insert_calls'] += 1
+            rows_written = self.metrics['rows_written']
+            rows_written[table_id] = rows_written.get(table_id, 0) + len(json_rows) - len(errors)
+        self._column_bytes.pop(tuple(table_id.split('.')[-2:]), None)
+        return errors
+
+    def load_table_from_file(self, file_obj, destination, job_config=None, **kwargs):
+        self._record('load_jobs')
+        return super().load_table_from_file(file_obj, destination, job_config, **kwargs)
+
+def generate_synthetic_data(client, rows, group_cardinality, days):
+    """Create transactions, sales and users tables shaped like the test_generator fixtures.
+
+    Values are derived from hashes of the row number, so the same parameters
+    always produce the same data.
+    """
+    connection = client.connection
+    connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{BENCHMARK_DATASET}"')
+    connection.execute("CREATE OR REPLACE MACRO uniform(i, k) AS (hash(i * 31 + k) % 1000000) / 1000000.0")
+    unique_transactions = max(int(rows * 0.98), 1)
+    connection.execute(f"""
+    CREATE OR REPLACE TABLE "{BENCHMARK_DATASET}"."transactions" AS
+    SELECT
+      'txn_' || CAST(i % {unique_transactions} AS VARCHAR) AS transaction_id,
+      CASE WHEN uniform(i, 1) < 0.05 THEN NULL
+           ELSE 'user_' || CAST(CAST(uniform(i, 2) * {max(rows // 10, 1)} AS BIGINT) AS VARCHAR) END AS user_id,
+      ROUND((uniform(i, 3) - 0.1) * 100, 2) AS amount,
+      CASE WHEN uniform(i, 4) < 0.05 THEN 'INVALID' ELSE 'USD' END AS currency,
+      CASE WHEN uniform(i, 5) < 0.1 THEN 'failed' ELSE 'completed' END AS status,
+      CAST(current_date - CAST(uniform(i, 6) * {days} AS INTEGER) AS DATE) AS transaction_date,
+      'region_' || CAST(i % {group_cardinality} AS VARCHAR) AS region
+    FROM range({rows}) AS r(i)
+    """)
+    connection.execute(f"""
+    CREATE OR REPLACE TABLE "{BENCHMARK_DATASET}"."sales" AS
+    SELECT
+      'sale_' || CAST(i AS VARCHAR) AS sale_id,
+      'product_' || CAST(CAST(uniform(i, 7) * 100 AS BIGINT) AS VARCHAR) AS product_id,
+      CAST(1 + uniform(i, 8) * 10 AS BIGINT) AS quantity,
+      CAST(current_date - CAST(i % {days} AS INTEGER) AS DATE) AS sale_date,
+      'store_' || CAST(CAST(uniform(i, 9) * 10 AS BIGINT) AS VARCHAR) AS store_id,
+      'region_' || CAST(CAST(uniform(i, 10) * {group_cardinality} AS BIGINT) AS VARCHAR) AS region
+    FROM range({rows}) AS r(i)
+    """)
+    user_rows = max(rows // 2, 1)
+    connection.execute(f"""
+    CREATE OR REPLACE TABLE "{BENCHMARK_DATASET}"."users" AS
+    SELECT
+      'user_' || CAST(i AS VARCHAR) AS user_id,
+      CASE WHEN uniform(i, 11) < 0.05 THEN NULL
+           ELSE 'user' || CAST(i % {max(int(user_rows * 0.98), 1)} AS VARCHAR) || '@example.com' END AS email,
+      CAST(current_date - CAST(uniform(i, 12) * 1000 AS INTEGER) AS DATE) AS signup_date,
+      CASE WHEN uniform(i, 13) < 0.05 THEN 'inactive' WHEN uniform(i, 13) < 0.1 THEN 'pending'
+           ELSE 'active' END AS status,
+      CASE WHEN uniform(i, 14) < 0.3 THEN 'US' WHEN uniform(i, 14) < 0.6 THEN 'GB' ELSE 'CA' END AS country
+    FROM range({user_rows}) AS r(i)
+    """)
+
+def build_benchmark_config(history_depth):
+    """Checks and group anomaly detection over the synthetic tables, in config.yaml form."""
+    group_detection = {
+        'historical_data_points': history_depth,
+        'minimum_data_points': min(5, history_depth)
+    }
+    return {
+        'tables': [
+            {
+                'dataset': BENCHMARK_DATASET,
+                'table': 'transactions',
+                'checks': {
+                    'null_checks': [{'column': 'user_id', 'threshold': 0, 'filter': "status = 'completed'"}],
+                    'uniqueness_checks': [{'columns': ['transaction_id'], 'threshold': 0}],
+                    'conditional_checks': [{'condition': 'amount > 0', 'threshold': 0,
+                                            'description': 'Transaction amount should be positive',
+                                            'filter': "currency = 'USD'"}]
+                },
+                'trend_analysis': {'group_anomaly_detection': dict(group_detection, groups=[
+                    {'columns': ['region'], 'anomaly_threshold': 0.1}
+                ])}
+            },
+            {
+                'dataset': BENCHMARK_DATASET,
+                'table': 'users',
+                'checks': {
+                    'null_checks': [{'column': 'email', 'threshold': 0}],
+                    'uniqueness_checks': [{'columns': ['email'], 'threshold': 0, 'filter': "status = 'active'"}],
+                    'conditional_checks': [{'condition': 'LENGTH(email) <= 30', 'threshold': 0,
+                                            'description': 'Email length should be <= 30 characters'}]
+                }
+            },
+            {
+                'dataset': BENCHMARK_DATASET,
+                'table': 'sales',
+                'trend_analysis': {'group_anomaly_detection': dict(group_detection, groups=[
+                    {'columns': ['region'], 'anomaly_threshold': 0.2},
+                    {'columns': ['sale_date'], 'anomaly_threshold': 0.15, 'filter': "region = 'region_0'"},
+                    {'columns': ['region', 'sale_date'], 'anomaly_threshold': 0.2}
+                ])}
+            }
+        ]
+    }
+
+def generate_history(client, config, history_depth):
+    """Store history_depth past daily runs of every group's count, jittered by up to 5%.
+
+    The rolling summaries are refreshed afterwards, as a pipeline run would.
+    """
+    rows = []
+    now = datetime.utcnow()
+    # Filters are translated as the pipeline stores them in row_count_history
+    group_configs = compile_config(config, 'anomaly_detection', client.dialect).group_configs
+    for group_config in group_configs:
+        columns = group_config['columns']
+        query = generate_group_count_query(group_config['dataset'], group_config['table'], columns,
+                                           group_config['filter'], client.dialect)
+        counts = DuckDBClient.run_query(client, query)
+        for record in counts:
+            values = {column: record[column] for column in columns}
+            group_values = serialize_group_values(values)
+            key = group_key(values)
+            for depth in range(1, history_depth + 1):
+                seed = zlib.crc32(f"{group_values}:{depth}".encode('utf-8'))
+                jitter = 1 + ((seed % 1000) / 1000.0 - 0.5) / 10
+                rows.append({
+                    'run_id': f"benchmark_history_{depth}",
+                    'dataset': group_config['dataset'],
+                    'table': group_config['table'],
+                    'group_by_columns': canonical_group_by(columns),
+                    'group_key': key,
+                    'group_values': group_values,
+                    'row_count': int(record['row_count'] * jitter),
+                    'filter_condition': group_config['filter'],
+                    'timestamp': (now - timedelta(days=depth)).isoformat()
+                })
+    if rows:
+        DuckDBClient.insert_rows_json(client, HISTORY_TABLE_ID, rows)
+        refresh_history_summaries(group_configs, client)
+    return len(rows)
+
+def source_version():
+    """Git commit of the benchmarked code, when available."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_benchmark(rows=100000, group_cardinality=10, history_depth=14, days=60, runs=1,
+                  query_latency=0.0, insert_latency=0.0, max_concurrency=1, trace_memory=False):
+    """Generate synthetic data, run the full pipeline against a fake warehouse and measure it."""
+    client = FakeWarehouseClient(query_latency=query_latency, insert_latency=insert_latency)
+    setup_start = time.perf_counter()
+    generate_synthetic_data(client, rows, group_cardinality, days)
+    config = build_benchmark_config(history_depth)
+    history_rows = generate_history(client, config, history_depth)
+    setup_seconds = time.perf_counter() - setup_start
+
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False) as config_file:
+        yaml.safe_dump(config, config_file)
+    run_results = []
+    try:
+        for _ in range(runs):
+            client.reset_metrics()
+            if trace_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            summary = run_pipeline(client=client, argv=['--config', config_file.name,
+                                                        '--max-concurrency', str(max_concurrency)])
+            wall_seconds = time.perf_counter() - started
+            peak_python_memory = None
+            if trace_memory:
+                peak_python_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            run_results.append({
+                'status': summary['status'],
+                'wall_seconds': wall_seconds,
+                'phase_seconds': summary['phase_seconds'],
+                'tasks_run': summary['tasks_run'],
+                'results': summary['results'],
+                'queries': client.metrics['queries'],
+                'dry_runs': client.metrics['dry_runs'],
+                'bytes_scanned': client.metrics['bytes_scanned'],
+                'insert_calls': client.metrics['insert_calls'],
+                'load_jobs': client.metrics['load_jobs'],
+                'rows_written': client.metrics['rows_written'],
+                'peak_python_memory_bytes': peak_python_memory,
+                'telemetry': summary.get('telemetry')
+            })
+            # Runs started within the same second would share a run_id
+            time.sleep(max(0.0, 1.0 - wall_seconds))
+    finally:
+        os.unlink(config_file.name)
+
+    import duckdb
+    return {
+        'benchmark': 'pipeline',
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'version': source_version(),
+        'environment': {
+            'python': platform.python_version(),
+            'duckdb': duckdb.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {
+            'rows': rows,
+            'group_cardinality': group_cardinality,
+            'history_depth': history_depth,
+            'days': days,
+            'runs': runs,
+            'query_latency': query_latency,
+            'insert_latency': insert_latency,
+            'max_concurrency': max_concurrency
+        },
+        'setup_seconds': setup_seconds,
+        'history_rows': history_rows,
+        # Process-wide peak, including data generation and DuckDB's native memory
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'runs': run_results
+    }
+
+def compare_benchmarks(current, baseline):
+    """Relative change of each run metric against a baseline benchmark result."""
+    changes = {}
+    metrics = ('wall_seconds', 'queries', 'dry_runs', 'bytes_scanned', 'insert_calls',
+               'peak_python_memory_bytes')
+    for metric in metrics:
+        current_value = current['runs'][0].get(metric)
+        baseline_value = baseline['runs'][0].get(metric)
+        if current_value is None or not baseline_value:
+            continue
+        changes[metric] = (current_value - baseline_value) / baseline_value
+    for phase, seconds in current['runs'][0]['phase_seconds'].items():
+        baseline_seconds = baseline['runs'][0]['phase_seconds'].get(phase)
+        if baseline_seconds:
+            changes[f"phase_seconds.{phase}"] = (seconds - baseline_seconds) / baseline_seconds
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the data quality pipeline on synthetic data')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows in the transactions and sales tables')
+    parser.add_argument('--group-cardinality', type=int, default=10, help='Distinct region values')
+    parser.add_argument('--history-depth', type=int, default=14, help='Past runs stored in row_count_history')
+    parser.add_argument('--days', type=int, default=60, help='Distinct dates in the data')
+    parser.add_argument('--runs', type=int, default=1, help='Number of pipeline runs to measure')
+    parser.add_argument('--query-latency', type=float, default=0.0, help='Seconds added to every query and dry run')
+    parser.add_argument('--insert-latency', type=float, default=0.0, help='Seconds added to every insert call')
+    parser.add_argument('--max-concurrency', type=int, default=1, help='Passed to main.py')
+    parser.add_argument('--trace-memory', action='store_true', help='Measure peak Python memory per run with tracemalloc (slower)')
+    parser.add_argument('--output', type=str, default=None, help='Result JSON path (default benchmark_results/benchmark_<timestamp>.json)')
+    parser.add_argument('--compare', type=str, default=None, help='Baseline result JSON to compare against')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.rows, args.group_cardinality, args.history_depth, args.days,
+                           args.runs, args.query_latency, args.insert_latency,
+                           args.max_concurrency, args.trace_memory)
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            result['comparison'] = {'baseline': args.compare,
+                                    'relative_change': compare_benchmarks(result, json.load(file))}
+    output = args.output or os.path.join(
+        'benchmark_results', f"benchmark_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(result, file, indent=2)
+    logging.info(f"Benchmark results written to {output}")
+    print(json.dumps(result['runs'], indent=2))
+
+if __name__ == "__main__":
+    main()
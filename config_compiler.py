@@ -0,0 +1,491 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+
+import yaml
+
+import query_planner
+import sql_dialects
+from anomaly_scoring import ANOMALY_MODELS
+from query_planner import check_id, plan_table_scans, uses_persisted_sketch
+from sql_dialects import translate_bigquery_sql
+
+# Check lists under a table's checks key and the check type of each
+CHECK_KINDS = {
+    'null_checks': 'null_check',
+    'uniqueness_checks': 'uniqueness_check',
+    'conditional_checks': 'conditional_check'
+}
+
+# Values of --checks other than 'all' and the check type each one selects
+CHECK_SELECTORS = dict(CHECK_KINDS, anomaly_detection='anomaly_detection')
+
+class ConfigError(ValueError):
+    """A configuration with problems; problems lists every one of them."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__(f"Invalid configuration ({len(problems)} problems):\n  " + '\n  '.join(problems))
+
+class CompiledCheck:
+    """A validated check, read like a check dict.
+
+    Subclasses list their fields in __slots__; check['field'] and
+    check.get('field') work as on a dict, so the planner and executors take
+    either.
+    """
+
+    __slots__ = ()
+    check_type = None
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class NullCheck(CompiledCheck):
+    __slots__ = ('check_id', 'dataset', 'table', 'column', 'threshold', 'filter', 'incremental',
+                 'sample_percent', 'confidence')
+    check_type = 'null_check'
+
+class UniquenessCheck(CompiledCheck):
+    __slots__ = ('check_id', 'dataset', 'table', 'columns', 'threshold', 'filter', 'approximate',
+                 'partition_column')
+    check_type = 'uniqueness_check'
+
+class ConditionalCheck(CompiledCheck):
+    __slots__ = ('check_id', 'dataset', 'table', 'condition', 'description', 'threshold', 'filter',
+                 'incremental', 'sample_percent', 'confidence')
+    check_type = 'conditional_check'
+
+class GroupAnomalyCheck(CompiledCheck):
+    __slots__ = ('check_id', 'dataset', 'table', 'columns', 'anomaly_threshold', 'historical_data_points',
+                 'minimum_data_points', 'filter', 'model', 'ewma_alpha', 'streaming', 'page_size',
+                 'max_groups')
+    check_type = 'anomaly_detection'
+
+# Compiled check class of each check type
+CHECK_CLASSES = {check_class.check_type: check_class
+                 for check_class in (NullCheck, UniquenessCheck, ConditionalCheck, GroupAnomalyCheck)}
+
+class CompiledConfig:
+    """Checks, settings and table scan plan compiled from a configuration for one dialect."""
+
+    __slots__ = ('config_hash', 'dialect', 'checks', 'null_checks', 'uniqueness_checks',
+                 'conditional_checks', 'group_configs', 'table_scans', 'sketch_checks',
+                 'byte_budget', 'result_cache')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def describe(self):
+        """Counts of the compiled checks and planned scans, for logs and --compile-only."""
+        return {
+            'config_hash': self.config_hash,
+            'dialect': self.dialect,
+            'checks': self.checks,
+            'null_checks': len(self.null_checks),
+            'uniqueness_checks': len(self.uniqueness_checks),
+            'conditional_checks': len(self.conditional_checks),
+            'group_anomaly_checks': len(self.group_configs),
+            'table_scans': len(self.table_scans),
+            'sketch_checks': len(self.sketch_checks)
+        }
+
+    def check_lists(self):
+        """The compiled checks of each check type."""
+        return {'null_check': self.null_checks, 'uniqueness_check': self.uniqueness_checks,
+                'conditional_check': self.conditional_checks, 'anomaly_detection': self.group_configs}
+
+    def to_dict(self):
+        """The plan as plain JSON values, the form kept in the plan cache.
+
+        Table scans and sketch checks refer to checks by their position in the
+        check lists, and table keys are stored as [dataset, table] lists.
+        """
+        positions = {id(check): index for checks in self.check_lists().values()
+                     for index, check in enumerate(checks)}
+        return {
+            'config_hash': self.config_hash,
+            'dialect': self.dialect,
+            'checks': self.checks,
+            'check_lists': {check_type: [check.to_dict() for check in checks]
+                            for check_type, checks in self.check_lists().items()},
+            'table_scans': [dict(plan, checks=[{'check_type': entry['check_type'],
+                                                'index': positions[id(entry['check'])]}
+                                               for entry in plan['checks']])
+                            for plan in self.table_scans],
+            'sketch_checks': [positions[id(check)] for check in self.sketch_checks],
+            'byte_budget': dict(self.byte_budget, table_budgets=[
+                [dataset, table, max_bytes]
+                for (dataset, table), max_bytes in self.byte_budget['table_budgets'].items()]),
+            'result_cache': dict(self.result_cache, disabled_tables=[
+                list(table_key) for table_key in self.result_cache['disabled_tables']])
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a plan from to_dict's values."""
+        check_lists = {check_type: [CHECK_CLASSES[check_type](**fields) for fields in checks]
+                       for check_type, checks in data['check_lists'].items()}
+        return cls(
+            config_hash=data['config_hash'],
+            dialect=data['dialect'],
+            checks=data['checks'],
+            null_checks=check_lists['null_check'],
+            uniqueness_checks=check_lists['uniqueness_check'],
+            conditional_checks=check_lists['conditional_check'],
+            group_configs=check_lists['anomaly_detection'],
+            table_scans=[dict(plan, checks=[{'check_type': entry['check_type'],
+                                             'check': check_lists[entry['check_type']][entry['index']]}
+                                            for entry in plan['checks']])
+                         for plan in data['table_scans']],
+            sketch_checks=[check_lists['uniqueness_check'][index] for index in data['sketch_checks']],
+            byte_budget=dict(data['byte_budget'], table_budgets={
+                (dataset, table): max_bytes
+                for dataset, table, max_bytes in data['byte_budget']['table_budgets']}),
+            result_cache=dict(data['result_cache'], disabled_tables=[
+                tuple(table_key) for table_key in data['result_cache']['disabled_tables']])
+        )
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ''
+
+class _Validator:
+    """Collects every problem of a configuration instead of stopping at the first."""
+
+    def __init__(self):
+        self.problems = []
+
+    def require(self, condition, location, message):
+        if not condition:
+            self.problems.append(f"{location}: {message}")
+        return condition
+
+    def text(self, fields, key, location, required=False):
+        value = fields.get(key)
+        if value is None:
+            self.require(not required, location, f"{key} is required")
+            return None
+        self.require(_is_text(value), location, f"{key} must be a non-empty string")
+        return value
+
+    def number(self, fields, key, location, default=None, minimum=0, maximum=None, required=False,
+               integer=False, exclusive_minimum=False):
+        value = fields.get(key, default)
+        if value is None:
+            self.require(not required, location, f"{key} is required")
+            return None
+        kind = 'an integer' if integer else 'a number'
+        valid = (isinstance(value, int) and not isinstance(value, bool)) if integer else _is_number(value)
+        if not self.require(valid, location, f"{key} must be {kind}, got {value!r}"):
+            return value
+        if minimum is not None:
+            too_small = value <= minimum if exclusive_minimum else value < minimum
+            bound = 'greater than' if exclusive_minimum else 'at least'
+            self.require(not too_small, location, f"{key} must be {bound} {minimum}, got {value!r}")
+        if maximum is not None:
+            self.require(value <= maximum, location, f"{key} must be at most {maximum}, got {value!r}")
+        return value
+
+    def flag(self, fields, key, location, default=False):
+        value = fields.get(key, default)
+        self.require(isinstance(value, bool), location, f"{key} must be true or false, got {value!r}")
+        return value
+
+    def columns(self, fields, location):
+        columns = fields.get('columns')
+        if self.require(isinstance(columns, list) and columns, location,
+                        'columns must be a non-empty list of column names'):
+            self.require(all(_is_text(column) for column in columns), location,
+                         'columns must only hold column names')
+        return columns
+
+    def mapping(self, value, location, name):
+        if value is None:
+            return {}
+        if not self.require(isinstance(value, dict), location, f"{name} must be a mapping"):
+            return {}
+        return value
+
+    def items(self, fields, key, location):
+        value = fields.get(key)
+        if value is None:
+            return []
+        if not self.require(isinstance(value, list), location, f"{key} must be a list"):
+            return []
+        entries = []
+        for index, entry in enumerate(value):
+            entry_location = f"{location} {key}[{index}]"
+            if self.require(isinstance(entry, dict), entry_location, 'must be a mapping'):
+                entries.append((entry_location, entry))
+        return entries
+
+    def sampling(self, check, location):
+        sample_percent = self.number(check, 'sample_percent', location, minimum=0, maximum=100,
+                                     exclusive_minimum=True)
+        confidence = self.number(check, 'confidence', location, default=0.95, minimum=0,
+                                 exclusive_minimum=True)
+        if _is_number(confidence):
+            self.require(confidence < 1, location, f"confidence must be less than 1, got {confidence!r}")
+        return sample_percent, confidence
+
+def _translate(sql, dialect):
+    """A check's BigQuery filter or condition in the target dialect."""
+    if not sql or dialect == 'bigquery':
+        return sql
+    return translate_bigquery_sql(sql, dialect)
+
+def compile_config(config, checks='all', dialect='bigquery', config_hash=None):
+    """Validate a configuration and compile its checks and table scan plan.
+
+    Every table is read once. All problems are collected and raised together
+    as a ConfigError, before any query runs. Every check gets its stable
+    check_id from its configured values, then its filter and condition are
+    translated to the dialect and the fused table scans are generated.
+    """
+    validator = _Validator()
+    if checks != 'all' and checks not in CHECK_SELECTORS:
+        validator.problems.append(f"checks must be all or one of {', '.join(CHECK_SELECTORS)}, "
+                                  f"got {checks!r}")
+    if not isinstance(config, dict):
+        raise ConfigError(['configuration must be a mapping with a tables list'])
+    tables = config.get('tables')
+    if not isinstance(tables, list) or not tables:
+        raise ConfigError(['tables must be a non-empty list'])
+
+    compiled = {'null_check': [], 'uniqueness_check': [], 'conditional_check': [], 'anomaly_detection': []}
+    table_budgets = {}
+    disabled_tables = []
+    seen_tables = set()
+    for table_index, table_config in enumerate(tables):
+        location = f"tables[{table_index}]"
+        if not validator.require(isinstance(table_config, dict), location, 'must be a mapping'):
+            continue
+        dataset = validator.text(table_config, 'dataset', location, required=True)
+        table = validator.text(table_config, 'table', location, required=True)
+        if dataset and table:
+            location = f"{location} ({dataset}.{table})"
+            validator.require((dataset, table) not in seen_tables, location,
+                              'table is configured more than once')
+            seen_tables.add((dataset, table))
+
+        max_bytes = validator.number(table_config, 'max_bytes', location, integer=True)
+        if max_bytes is not None:
+            table_budgets[(dataset, table)] = max_bytes
+        if validator.flag(table_config, 'cache', location, default=True) is False:
+            disabled_tables.append((dataset, table))
+
+        incremental = validator.mapping(table_config.get('incremental'), location, 'incremental')
+        if incremental:
+            validator.text(incremental, 'partition_column', f"{location} incremental", required=True)
+
+        table_checks = validator.mapping(table_config.get('checks'), location, 'checks')
+        for kind in table_checks:
+            validator.require(kind in CHECK_KINDS, f"{location} checks", f"unknown check list {kind!r}")
+
+        for check_location, check in validator.items(table_checks, 'null_checks', location):
+            sample_percent, confidence = validator.sampling(check, check_location)
+            compiled['null_check'].append(NullCheck(
+                dataset=dataset,
+                table=table,
+                column=validator.text(check, 'column', check_location, required=True),
+                threshold=validator.number(check, 'threshold', check_location, required=True),
+                filter=validator.text(check, 'filter', check_location),
+                incremental=table_config.get('incremental'),
+                sample_percent=sample_percent,
+                confidence=confidence
+            ))
+
+        for check_location, check in validator.items(table_checks, 'uniqueness_checks', location):
+            approximate = validator.flag(check, 'approximate', check_location)
+            # Approximate checks on incremental tables default to sketches per partition
+            partition_column = validator.text(check, 'partition_column', check_location)
+            if approximate and not partition_column:
+                partition_column = incremental.get('partition_column')
+            compiled['uniqueness_check'].append(UniquenessCheck(
+                dataset=dataset,
+                table=table,
+                columns=validator.columns(check, check_location),
+                threshold=validator.number(check, 'threshold', check_location, required=True),
+                filter=validator.text(check, 'filter', check_location),
+                approximate=approximate,
+                partition_column=partition_column
+            ))
+
+        for check_location, check in validator.items(table_checks, 'conditional_checks', location):
+            sample_percent, confidence = validator.sampling(check, check_location)
+            compiled['conditional_check'].append(ConditionalCheck(
+                dataset=dataset,
+                table=table,
+                condition=validator.text(check, 'condition', check_location, required=True),
+                description=check.get('description', ''),
+                threshold=validator.number(check, 'threshold', check_location, required=True),
+                filter=validator.text(check, 'filter', check_location),
+                incremental=table_config.get('incremental'),
+                sample_percent=sample_percent,
+                confidence=confidence
+            ))
+
+        trend_analysis = validator.mapping(table_config.get('trend_analysis'), location, 'trend_analysis')
+        detection_location = f"{location} group_anomaly_detection"
+        group_detection = validator.mapping(trend_analysis.get('group_anomaly_detection'),
+                                            detection_location, 'group_anomaly_detection')
+        historical_data_points = validator.number(group_detection, 'historical_data_points',
+                                                  detection_location, default=7, minimum=1, integer=True)
+        minimum_data_points = validator.number(group_detection, 'minimum_data_points', detection_location,
+                                               default=5, minimum=1, integer=True)
+        if all(isinstance(points, int) for points in (historical_data_points, minimum_data_points)):
+            validator.require(minimum_data_points <= historical_data_points, detection_location,
+                              'minimum_data_points must not exceed historical_data_points')
+        for group_location, group in validator.items(group_detection, 'groups', detection_location):
+            model = group.get('model', group_detection.get('model', 'mean'))
+            validator.require(model in ANOMALY_MODELS, group_location,
+                              f"model must be one of {', '.join(ANOMALY_MODELS)}, got {model!r}")
+            ewma_alpha = validator.number(group, 'ewma_alpha', group_location,
+                                          default=group_detection.get('ewma_alpha', 0.3),
+                                          minimum=0, maximum=1, exclusive_minimum=True)
+            streaming = validator.flag(group, 'streaming', group_location,
+                                       default=group_detection.get('streaming', False))
+            page_size = validator.number(group, 'page_size', group_location,
+                                         default=group_detection.get('page_size'), minimum=1, integer=True)
+            max_groups = validator.number(group, 'max_groups', group_location,
+                                          default=group_detection.get('max_groups'), minimum=1, integer=True)
+            compiled['anomaly_detection'].append(GroupAnomalyCheck(
+                dataset=dataset,
+                table=table,
+                columns=validator.columns(group, group_location),
+                anomaly_threshold=validator.number(group, 'anomaly_threshold', group_location,
+                                                   required=True),
+                historical_data_points=historical_data_points,
+                minimum_data_points=minimum_data_points,
+                filter=validator.text(group, 'filter', group_location),
+                model=model,
+                ewma_alpha=ewma_alpha,
+                streaming=streaming,
+                page_size=page_size,
+                max_groups=max_groups
+            ))
+
+    budget = validator.mapping(config.get('budget'), 'budget', 'budget')
+    result_cache = validator.mapping(config.get('result_cache'), 'result_cache', 'result_cache')
+    byte_budget = {
+        'max_bytes_per_run': validator.number(budget, 'max_bytes_per_run', 'budget', integer=True),
+        'max_bytes_per_table': validator.number(budget, 'max_bytes_per_table', 'budget', integer=True),
+        'table_budgets': table_budgets
+    }
+    result_cache = {
+        'enabled': validator.flag(result_cache, 'enabled', 'result_cache', default=True),
+        'max_age_days': validator.number(result_cache, 'max_age_days', 'result_cache', default=30,
+                                         minimum=0, exclusive_minimum=True),
+        'disabled_tables': disabled_tables
+    }
+    if validator.problems:
+        raise ConfigError(validator.problems)
+
+    # IDs are assigned only to valid checks, as check_id needs every field, and before
+    # translation, so a check keeps its ID on every engine
+    for check_list in compiled.values():
+        for check in check_list:
+            check.check_id = check_id(check.check_type, check)
+            check.filter = _translate(check.filter, dialect)
+            if check.check_type == 'conditional_check':
+                check.condition = _translate(check.condition, dialect)
+    selected = {check_type: compiled[check_type] if checks in ('all', selector) else []
+                for selector, check_type in CHECK_SELECTORS.items()}
+    null_checks = selected['null_check']
+    uniqueness_checks = selected['uniqueness_check']
+    conditional_checks = selected['conditional_check']
+    return CompiledConfig(
+        config_hash=config_hash,
+        dialect=dialect,
+        checks=checks,
+        null_checks=null_checks,
+        uniqueness_checks=uniqueness_checks,
+        conditional_checks=conditional_checks,
+        group_configs=selected['anomaly_detection'],
+        table_scans=plan_table_scans(null_checks, uniqueness_checks, conditional_checks, dialect),
+        sketch_checks=[check for check in uniqueness_checks if uses_persisted_sketch(check, dialect)],
+        byte_budget=byte_budget,
+        result_cache=result_cache
+    )
+
+def plan_code_version():
+    """Hash of the code that compiles configurations and generates their SQL.
+
+    It is part of the plan cache key, so plans cached by an older version of
+    the code are not reused.
+    """
+    digest = hashlib.sha256(sys.version.encode('utf-8'))
+    for module in (sys.modules[__name__], query_planner, sql_dialects):
+        with open(module.__file__, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def config_cache_key(content, checks='all', dialect='bigquery'):
+    """Key of a compiled plan: the configuration file's bytes, check selection, dialect and code."""
+    digest = hashlib.sha256(content)
+    digest.update(f"\0{checks}\0{dialect}\0{plan_code_version()}".encode('utf-8'))
+    return digest.hexdigest()
+
+def compile_config_file(config_file, checks='all', dialect='bigquery', cache_dir=None):
+    """Compile a configuration file, reusing the plan cached for identical input.
+
+    Compiled plans are kept as JSON in cache_dir under their config_cache_key,
+    with the plan_code_version that wrote them; a plan written by other code is
+    ignored. Pass cache_dir=None to always compile. A plan cache that cannot be
+    read or written only costs a recompilation.
+    """
+    with open(config_file, 'rb') as file:
+        content = file.read()
+    config_hash = config_cache_key(content, checks, dialect)
+    code_version = plan_code_version()
+    cache_path = os.path.join(cache_dir, f"{config_hash}.json") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as file:
+                cached = json.load(file)
+            if cached.get('plan_code_version') != code_version:
+                raise ValueError('written by another version of the planner')
+            compiled = CompiledConfig.from_dict(cached['plan'])
+            logging.info(f"Compiled configuration {config_hash[:12]} loaded from {cache_path}")
+            return compiled
+        except Exception as e:
+            logging.warning(f"Could not read the compiled configuration in {cache_path}: {e}")
+
+    config = yaml.safe_load(content)
+    logging.info(f"Configuration loaded from {config_file}")
+    compiled = compile_config(config, checks, dialect, config_hash)
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'w') as file:
+                json.dump({'plan_code_version': code_version, 'plan': compiled.to_dict()}, file)
+            os.replace(temporary_path, cache_path)
+        except Exception as e:
+            logging.warning(f"Could not cache the compiled configuration in {cache_path}: {e}")
+    return compiled
@@ -1,9 +1,39 @@
-import json
 import logging
+import math
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from statistics import NormalDist
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import bigquery
 from google.api_core.exceptions import ServerError
+from requests.adapters import HTTPAdapter
+
+from anomaly_scoring import (
+    SUMMARY_MODELS,
+    build_history_matrix,
+    score_anomalies,
+    score_anomalies_from_summary
+)
+from group_keys import canonical_group_by, serialize_groups
+from result_sinks import BigQuerySink
+from result_records import CheckResult, ResultBatch
+from query_telemetry import store_query_telemetry
+from query_planner import (
+    HLL_PRECISION,
+    SCAN_COUNT_METRICS,
+    check_id,
+    check_sample_percent,
+    scan_column_alias,
+    task_checks
+)
+from sql_dialects import (
+    client_dialect,
+    quote_identifier,
+    quote_string,
+    table_reference
+)
 
 # Set up logging if not already configured
 logging.basicConfig(
@@ -12,65 +42,233 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
-def execute_query_with_retries(query, retries=3):
-    """Execute a BigQuery SQL query with retry logic."""
-    client = bigquery.Client()
+# Groups collected, stored and scored at a time by streaming anomaly detection
+GROUP_PAGE_SIZE = 50000
+
+def create_bigquery_client(max_concurrency=1):
+    """Create the BigQuery client shared by a whole run.
+
+    Credentials are discovered once and the HTTP session keeps a connection
+    pool large enough for every concurrently running job.
+    """
+    credentials, project = google.auth.default(scopes=bigquery.Client.SCOPE)
+    pool_size = max(10, max_concurrency)
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return bigquery.Client(project=project, credentials=credentials, _http=session)
+
+def execute_query_with_retries(query, retries=3, client=None, cache=None, as_dataframe=True,
+                               telemetry=None, max_rows=None):
+    """Execute a BigQuery SQL query with retry logic.
+
+    Results are materialised as a DataFrame, or with as_dataframe=False as a
+    list of dicts of plain Python values, which avoids pandas entirely. When a
+    per-run cache dict is given, results are keyed on the SQL text so a query
+    issued twice in the same run is only executed once. With a QueryTelemetry
+    collector, the job statistics and attempt count of every executed query
+    are recorded. A result of more than max_rows rows raises RowLimitExceeded
+    before it is downloaded.
+    """
+    if cache is not None and query in cache:
+        return cache[query]
+    if client is None:
+        client = bigquery.Client()
+    started = time.perf_counter()
+    query_job = None
     for attempt in range(retries):
         try:
             query_job = client.query(query)
-            return query_job.result().to_dataframe()
+            row_iterator = query_job.result()
+            check_row_limit(row_iterator, max_rows)
+            if as_dataframe:
+                result = row_iterator.to_dataframe()
+            else:
+                result = [dict(row.items()) for row in row_iterator]
+            if cache is not None:
+                cache[query] = result
+            if telemetry is not None:
+                telemetry.record(query, query_job, attempt + 1, time.perf_counter() - started,
+                                 len(result))
+            return result
         except ServerError as e:
             logging.warning(f"ServerError on attempt {attempt + 1}: {e}")
             time.sleep(2 ** attempt)
         except Exception as e:
             logging.error(f"Failed to execute query: {e}")
+            if telemetry is not None:
+                telemetry.record(query, query_job, attempt + 1, time.perf_counter() - started,
+                                 error_message=str(e))
             raise
     logging.error("Max retries exceeded.")
+    if telemetry is not None:
+        telemetry.record(query, query_job, retries, time.perf_counter() - started,
+                         error_message="Max retries exceeded.")
     raise Exception("Max retries exceeded.")
 
+class RowLimitExceeded(ValueError):
+    """A query result has more rows than the caller's max_rows."""
+
+def check_row_limit(row_iterator, max_rows):
+    """Raise RowLimitExceeded when a query result has more than max_rows rows."""
+    total_rows = getattr(row_iterator, 'total_rows', None)
+    if max_rows is not None and total_rows is not None and total_rows > max_rows:
+        raise RowLimitExceeded(f"Query returned {total_rows} rows, more than the limit of {max_rows}")
+
+def create_bqstorage_client(client):
+    """A BigQuery Storage Read API client for streaming results, or None.
+
+    Needs the google-cloud-bigquery-storage package; without it streamed
+    results are paged through the REST API instead.
+    """
+    if client_dialect(client) != 'bigquery':
+        return None
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+    return bigquery_storage.BigQueryReadClient(credentials=getattr(client, '_credentials', None))
+
+def execute_query_pages(query, page_size, retries=3, client=None, telemetry=None, max_rows=None):
+    """Run a query and yield its result as DataFrames of at most page_size rows.
+
+    The result is downloaded as it is consumed, through the BigQuery Storage
+    Read API (Arrow record batches) when available, so memory is bounded by
+    the page size rather than the result size. Only running the job is
+    retried. A result of more than max_rows rows raises RowLimitExceeded before
+    anything is downloaded.
+    """
+    if client is None:
+        client = bigquery.Client()
+    started = time.perf_counter()
+    query_job = None
+    row_iterator = None
+    for attempt in range(retries):
+        try:
+            query_job = client.query(query)
+            row_iterator = query_job.result(page_size=page_size)
+            check_row_limit(row_iterator, max_rows)
+            break
+        except ServerError as e:
+            logging.warning(f"ServerError on attempt {attempt + 1}: {e}")
+            time.sleep(2 ** attempt)
+        except Exception as e:
+            logging.error(f"Failed to execute query: {e}")
+            if telemetry is not None:
+                telemetry.record(query, query_job, attempt + 1, time.perf_counter() - started,
+                                 error_message=str(e))
+            raise
+    if row_iterator is None:
+        logging.error("Max retries exceeded.")
+        if telemetry is not None:
+            telemetry.record(query, query_job, retries, time.perf_counter() - started,
+                             error_message="Max retries exceeded.")
+        raise Exception("Max retries exceeded.")
+    if telemetry is not None:
+        telemetry.record(query, query_job, attempt + 1, time.perf_counter() - started,
+                         getattr(row_iterator, 'total_rows', None))
+    for frame in row_iterator.to_dataframe_iterable(bqstorage_client=create_bqstorage_client(client)):
+        for start in range(0, len(frame), page_size):
+            yield frame.iloc[start:start + page_size]
+
+def execute_scalar_query(query, retries=3, client=None, telemetry=None, cache=None):
+    """Execute a single-row aggregate query and return its row as a dict."""
+    rows = execute_query_with_retries(query, retries, client, cache, as_dataframe=False,
+                                      telemetry=telemetry)
+    if not rows:
+        raise Exception("Aggregate query returned no rows.")
+    return rows[0]
+
+def map_concurrently(func, items, max_concurrency=1):
+    """Apply func to each item on a bounded thread pool, preserving input order."""
+    items = list(items)
+    if max_concurrency <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+        return list(executor.map(func, items))
+
+def approximate_error_bound(unique_count, precision=HLL_PRECISION):
+    """Approximate 95% error bound on an HLL++ distinct count.
+
+    HLL++ has a relative standard error of about 1.04 / sqrt(2 ** precision);
+    two standard errors are reported in the metric's own units.
+    """
+    return 2 * 1.04 / math.sqrt(2 ** precision) * float(unique_count)
+
+def sampled_count_interval(sample_count, sample_fraction, confidence=0.95):
+    """Extrapolate a count from a table sample and give its confidence interval.
+
+    Rows are treated as sampled independently with probability sample_fraction,
+    so the sampled count has variance count * (1 - f) / f in table units. The
+    score interval is used because it stays informative when the sampled count
+    is zero. Block sampling clusters rows, so the true interval can be wider.
+    Returns (estimate, lower, upper).
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    estimate = sample_count / sample_fraction
+    spread = z * z * (1 - sample_fraction) / sample_fraction
+    half_width = math.sqrt(spread * estimate + spread * spread / 4)
+    return estimate, max(estimate + spread / 2 - half_width, 0.0), estimate + spread / 2 + half_width
+
 def evaluate_threshold(metric_value, threshold):
     """Determine pass or fail based on the threshold."""
     return 'pass' if metric_value <= threshold else 'fail'
 
-def generate_null_check_query(dataset, table, column, filter_condition=None):
-    """Generate SQL for null checks with optional filter."""
-    where_clause = f"WHERE {filter_condition}" if filter_condition else ""
-    query = f"""
-    SELECT
-      COUNT(*) AS total_rows,
-      SUM(CASE WHEN {column} IS NULL THEN 1 ELSE 0 END) AS null_count
-    FROM `{dataset}.{table}`
-    {where_clause};
-    """
-    return query
+def generate_sketch_uniqueness_query(dataset, table, columns, partition_column, run_id,
+                                     filter_condition=None):
+    """Generate a script that refreshes per-partition HLL++ sketches and merges them.
 
-def generate_uniqueness_check_query(dataset, table, columns, filter_condition=None):
-    """Generate SQL for uniqueness checks with optional filter."""
-    columns_list = ', '.join(columns)
+    Sketches from the latest stored partition onwards are rebuilt (the newest
+    partition may still have been filling on the previous run); older
+    partitions are never rescanned. The final statement merges every stored
+    sketch for the check into the table-wide distinct count.
+    """
+    sketch_table_id = 'your_project.your_dataset.uniqueness_sketches'  # Update this
     cast_columns = ', '.join([f'CAST({col} AS STRING)' for col in columns])
-    where_clause = f"WHERE {filter_condition}" if filter_condition else ""
+    check_key = f"""dataset = {quote_string(dataset)}
+      AND table = {quote_string(table)}
+      AND columns = {quote_string(','.join(columns))}
+      AND IFNULL(filter_condition, '') = {quote_string(filter_condition or '')}"""
+    filter_clause = f"AND ({filter_condition})" if filter_condition else ""
     query = f"""
+    DECLARE watermark DATE DEFAULT (
+      SELECT MAX(partition_date)
+      FROM `{sketch_table_id}`
+      WHERE {check_key}
+    );
+
+    DELETE FROM `{sketch_table_id}`
+    WHERE {check_key}
+      AND partition_date >= watermark;
+
+    INSERT INTO `{sketch_table_id}`
+      (dataset, table, columns, filter_condition, partition_date, total_rows, sketch, run_id, timestamp)
     SELECT
-      COUNT(*) AS total_rows,
-      COUNT(DISTINCT CONCAT({cast_columns})) AS unique_count
+      {quote_string(dataset)},
+      {quote_string(table)},
+      {quote_string(','.join(columns))},
+      {quote_string(filter_condition) if filter_condition else 'NULL'},
+      DATE({partition_column}) AS partition_date,
+      COUNT(*),
+      HLL_COUNT.INIT(CONCAT({cast_columns}), {HLL_PRECISION}),
+      {quote_string(run_id)},
+      CURRENT_TIMESTAMP()
     FROM `{dataset}.{table}`
-    {where_clause};
-    """
-    return query
+    WHERE DATE({partition_column}) >= IFNULL(watermark, DATE '0001-01-01')
+      {filter_clause}
+    GROUP BY partition_date;
 
-def generate_conditional_check_query(dataset, table, condition, filter_condition=None):
-    """Generate SQL for conditional checks with optional filter."""
-    where_clause = f"WHERE {filter_condition}" if filter_condition else ""
-    query = f"""
     SELECT
-      COUNT(*) AS total_rows,
-      SUM(CASE WHEN NOT ({condition}) THEN 1 ELSE 0 END) AS failure_count
-    FROM `{dataset}.{table}`
-    {where_clause};
+      IFNULL(SUM(total_rows), 0) AS total_rows,
+      IFNULL(HLL_COUNT.MERGE(sketch), 0) AS unique_count
+    FROM `{sketch_table_id}`
+    WHERE {check_key};
     """
     return query
 
-def generate_group_count_query(dataset, table, group_by_columns, filter_condition=None):
+def generate_group_count_query(dataset, table, group_by_columns, filter_condition=None,
+                               dialect='bigquery'):
     """Generate SQL to count rows per group with optional filter."""
     group_by_clause = ', '.join(group_by_columns)
     where_clause = f"WHERE {filter_condition}" if filter_condition else ""
@@ -78,332 +276,911 @@ def generate_group_count_query(dataset, table, group_by_columns, filter_conditio
     SELECT
       {group_by_clause},
       COUNT(*) AS row_count
-    FROM `{dataset}.{table}`
+    FROM {table_reference(f'{dataset}.{table}', dialect)}
     {where_clause}
     GROUP BY {group_by_clause};
     """
     return query
 
-def execute_null_checks(null_checks, run_id):
-    """Execute null checks and collect results."""
+def describe_check(check_type, check):
+    """Return the check name, columns and condition recorded for a check."""
+    if check_type == 'null_check':
+        return f"Null check on {check['column']}", check['column'], None
+    if check_type == 'uniqueness_check':
+        columns = ', '.join(check['columns'])
+        return f"Uniqueness check on {columns}", columns, None
+    check_name = check.get('description', f"Conditional check: {check['condition']}")
+    return check_name, None, check['condition']
+
+CHECK_METRIC_NAMES = {
+    'null_check': 'null_count',
+    'uniqueness_check': 'duplicate_count',
+    'conditional_check': 'failure_count'
+}
+
+def build_check_result(run_id, check_type, check, query, metric_value=None,
+                       total_rows=None, status='error', error_message=None,
+                       error_bound=None):
+    """Build a data_quality_results row for a null, uniqueness or conditional check."""
+    check_name, columns, condition = describe_check(check_type, check)
+    return CheckResult(
+        run_id=run_id,
+        check_id=check_id(check_type, check),
+        dataset=check['dataset'],
+        table=check['table'],
+        check_type=check_type,
+        check_name=check_name,
+        columns=columns,
+        condition=condition,
+        threshold=check['threshold'],
+        metric_name=CHECK_METRIC_NAMES[check_type],
+        metric_value=metric_value,
+        total_rows=total_rows,
+        status=status,
+        filter_condition=check.get('filter'),
+        generated_sql=query,
+        error_message=error_message,
+        error_bound=error_bound,
+        timestamp=datetime.utcnow().isoformat() + 'Z'
+    )
+
+def build_sampled_check_result(run_id, check_type, check, query, sample_percent, sample_rows,
+                               sample_count):
+    """Build the result of a null or conditional check computed on a table sample.
+
+    The metric and total_rows are extrapolated to the whole table. The check
+    only passes when the upper bound of the confidence interval is within the
+    threshold.
+    """
+    sample_fraction = sample_percent / 100.0
+    estimate, lower, upper = sampled_count_interval(sample_count, sample_fraction,
+                                                    check.get('confidence', 0.95))
+    status = evaluate_threshold(upper, check['threshold'])
+    result = build_check_result(run_id, check_type, check, query, estimate,
+                                int(round(sample_rows / sample_fraction)), status,
+                                error_bound=(upper - lower) / 2)
+    result['sample_percent'] = sample_percent
+    result['sample_rows'] = sample_rows
+    result['confidence_lower'] = lower
+    result['confidence_upper'] = upper
+    return result
+
+def compute_check_metric(check_type, total_rows, count):
+    """Turn the aggregate returned for a check into its metric value."""
+    if check_type == 'uniqueness_check':
+        # An approximate distinct count can slightly exceed the row count
+        return max(total_rows - count, 0)
+    return count
+
+def compute_error_bound(check_type, check, count):
+    """Error bound on the metric, for checks computed from approximate aggregates."""
+    if check_type == 'uniqueness_check' and check.get('approximate'):
+        return approximate_error_bound(count)
+    return None
+
+def split_table_scan_result(plan, row, run_id):
+    """Split the single row returned by a fused table scan into per-check results."""
     results = []
-    for check in null_checks:
-        query = generate_null_check_query(
-            check['dataset'],
-            check['table'],
-            check['column'],
-            check.get('filter')
-        )
-        check_name = f"Null check on {check['column']}"
+    for index, entry in enumerate(plan['checks']):
+        check_type = entry['check_type']
+        check = entry['check']
         try:
-            result_df = execute_query_with_retries(query)
-            total_rows = result_df['total_rows'][0]
-            null_count = result_df['null_count'][0]
-            status = evaluate_threshold(null_count, check['threshold'])
-            results.append({
-                'run_id': run_id,
-                'dataset': check['dataset'],
-                'table': check['table'],
-                'check_type': 'null_check',
-                'check_name': check_name,
-                'columns': check['column'],
-                'condition': None,
-                'group_by_columns': None,
-                'group_values': None,
-                'threshold': check['threshold'],
-                'metric_name': 'null_count',
-                'metric_value': null_count,
-                'expected_value': None,
-                'total_rows': total_rows,
-                'status': status,
-                'filter_condition': check.get('filter'),
-                'generated_sql': query,
-                'error_message': None,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
+            total_rows = row[scan_column_alias(index, 'total_rows')]
+            count = row[scan_column_alias(index, SCAN_COUNT_METRICS[check_type])]
+            if plan.get('sample_percent'):
+                results.append(build_sampled_check_result(
+                    run_id, check_type, check, plan['query'], plan['sample_percent'],
+                    total_rows, count
+                ))
+                continue
+            metric_value = compute_check_metric(check_type, total_rows, count)
+            status = evaluate_threshold(metric_value, check['threshold'])
+            results.append(build_check_result(
+                run_id, check_type, check, plan['query'], metric_value, total_rows, status,
+                error_bound=compute_error_bound(check_type, check, count)
+            ))
         except Exception as e:
-            logging.error(f"Null check failed for {check['table']}.{check['column']}: {e}")
-            results.append({
-                'run_id': run_id,
-                'dataset': check['dataset'],
-                'table': check['table'],
-                'check_type': 'null_check',
-                'check_name': check_name,
-                'columns': check['column'],
-                'condition': None,
-                'group_by_columns': None,
-                'group_values': None,
-                'threshold': check['threshold'],
-                'metric_name': 'null_count',
-                'metric_value': None,
-                'expected_value': None,
-                'total_rows': None,
-                'status': 'error',
-                'filter_condition': check.get('filter'),
-                'generated_sql': query,
-                'error_message': str(e),
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
+            logging.error(f"Failed to evaluate {check_type} on {plan['table']}: {e}")
+            results.append(build_check_result(run_id, check_type, check, plan['query'],
+                                              error_message=str(e)))
     return results
 
-def execute_uniqueness_checks(uniqueness_checks, run_id):
-    """Execute uniqueness checks and collect results."""
+def split_incremental_scan_result(plan, rows, run_id):
+    """Turn the combined partials returned by an incremental scan into per-check results."""
+    totals = {row['check_key']: (row['total_rows'], row['metric_count']) for row in rows}
     results = []
-    for check in uniqueness_checks:
-        query = generate_uniqueness_check_query(
-            check['dataset'],
-            check['table'],
-            check['columns'],
-            check.get('filter')
-        )
-        check_name = f"Uniqueness check on {', '.join(check['columns'])}"
+    for entry in plan['checks']:
+        check_type = entry['check_type']
+        check = entry['check']
         try:
-            result_df = execute_query_with_retries(query)
-            total_rows = result_df['total_rows'][0]
-            unique_count = result_df['unique_count'][0]
-            duplicates = total_rows - unique_count
-            status = evaluate_threshold(duplicates, check['threshold'])
-            results.append({
-                'run_id': run_id,
-                'dataset': check['dataset'],
-                'table': check['table'],
-                'check_type': 'uniqueness_check',
-                'check_name': check_name,
-                'columns': ', '.join(check['columns']),
-                'condition': None,
-                'group_by_columns': None,
-                'group_values': None,
-                'threshold': check['threshold'],
-                'metric_name': 'duplicate_count',
-                'metric_value': duplicates,
-                'expected_value': None,
-                'total_rows': total_rows,
-                'status': status,
-                'filter_condition': check.get('filter'),
-                'generated_sql': query,
-                'error_message': None,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
+            # A check with no stored partials has only seen empty partitions
+            total_rows, count = totals.get(check_id(check_type, check), (0, 0))
+            metric_value = compute_check_metric(check_type, total_rows, count)
+            status = evaluate_threshold(metric_value, check['threshold'])
+            results.append(build_check_result(run_id, check_type, check, plan['query'],
+                                              metric_value, total_rows, status))
         except Exception as e:
-            logging.error(f"Uniqueness check failed for {check['table']}.{check['columns']}: {e}")
-            results.append({
-                'run_id': run_id,
-                'dataset': check['dataset'],
-                'table': check['table'],
-                'check_type': 'uniqueness_check',
-                'check_name': check_name,
-                'columns': ', '.join(check['columns']),
-                'condition': None,
-                'group_by_columns': None,
-                'group_values': None,
-                'threshold': check['threshold'],
-                'metric_name': 'duplicate_count',
-                'metric_value': None,
-                'expected_value': None,
-                'total_rows': None,
-                'status': 'error',
-                'filter_condition': check.get('filter'),
-                'generated_sql': query,
-                'error_message': str(e),
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
+            logging.error(f"Failed to evaluate {check_type} on {plan['table']}: {e}")
+            results.append(build_check_result(run_id, check_type, check, plan['query'],
+                                              error_message=str(e)))
     return results
 
-def execute_conditional_checks(conditional_checks, run_id):
-    """Execute conditional checks and collect results."""
-    results = []
-    for check in conditional_checks:
-        query = generate_conditional_check_query(
-            check['dataset'],
-            check['table'],
-            check['condition'],
-            check.get('filter')
+def execute_table_scan(plan, run_id, client=None, telemetry=None, cache=None):
+    """Execute one fused (or incremental) table scan and return its per-check results.
+
+    Fused scan rows are kept in the per-run cache when one is given.
+    """
+    try:
+        if plan.get('partition_column'):
+            rows = execute_query_with_retries(plan['query'], client=client, as_dataframe=False,
+                                              telemetry=telemetry)
+        else:
+            row = execute_scalar_query(plan['query'], client=client, telemetry=telemetry,
+                                       cache=cache)
+    except Exception as e:
+        logging.error(f"Table scan failed for {plan['dataset']}.{plan['table']}: {e}")
+        return [build_check_result(run_id, entry['check_type'], entry['check'],
+                                   plan['query'], error_message=str(e))
+                for entry in plan['checks']]
+    if plan.get('partition_column'):
+        return split_incremental_scan_result(plan, rows, run_id)
+    return split_table_scan_result(plan, row, run_id)
+
+def execute_sketch_uniqueness_check(check, run_id, client=None, telemetry=None):
+    """Execute an approximate uniqueness check backed by persisted partition sketches."""
+    query = generate_sketch_uniqueness_query(
+        check['dataset'],
+        check['table'],
+        check['columns'],
+        check['partition_column'],
+        run_id,
+        check.get('filter')
+    )
+    try:
+        row = execute_scalar_query(query, client=client, telemetry=telemetry)
+        total_rows = row['total_rows']
+        unique_count = row['unique_count']
+        duplicates = compute_check_metric('uniqueness_check', total_rows, unique_count)
+        status = evaluate_threshold(duplicates, check['threshold'])
+        return build_check_result(
+            run_id, 'uniqueness_check', check, query, duplicates, total_rows, status,
+            error_bound=approximate_error_bound(unique_count)
         )
-        check_name = check.get('description', f"Conditional check: {check['condition']}")
-        try:
-            result_df = execute_query_with_retries(query)
-            total_rows = result_df['total_rows'][0]
-            failure_count = result_df['failure_count'][0]
-            status = evaluate_threshold(failure_count, check['threshold'])
-            results.append({
-                'run_id': run_id,
-                'dataset': check['dataset'],
-                'table': check['table'],
-                'check_type': 'conditional_check',
-                'check_name': check_name,
-                'columns': None,
-                'condition': check['condition'],
-                'group_by_columns': None,
-                'group_values': None,
-                'threshold': check['threshold'],
-                'metric_name': 'failure_count',
-                'metric_value': failure_count,
-                'expected_value': None,
-                'total_rows': total_rows,
-                'status': status,
-                'filter_condition': check.get('filter'),
-                'generated_sql': query,
-                'error_message': None,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
-        except Exception as e:
-            logging.error(f"Conditional check failed for {check['table']}: {e}")
-            results.append({
-                'run_id': run_id,
-                'dataset': check['dataset'],
-                'table': check['table'],
-                'check_type': 'conditional_check',
-                'check_name': check_name,
-                'columns': None,
-                'condition': check['condition'],
-                'group_by_columns': None,
-                'group_values': None,
-                'threshold': check['threshold'],
-                'metric_name': 'failure_count',
-                'metric_value': None,
-                'expected_value': None,
-                'total_rows': None,
-                'status': 'error',
-                'filter_condition': check.get('filter'),
-                'generated_sql': query,
-                'error_message': str(e),
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
-    return results
+    except Exception as e:
+        logging.error(f"Sketch uniqueness check failed for {check['table']}.{check['columns']}: {e}")
+        return build_check_result(run_id, 'uniqueness_check', check, query,
+                                  error_message=str(e))
+
+def history_grouping(dataset, table, group_by_columns, filter_condition=None, dialect='bigquery'):
+    """WHERE condition selecting one grouping's rows of row_count_history or row_count_summary.
+
+    Groupings on the same columns with different filters count different
+    rows, so the filter is part of the grouping; no filter matches NULL.
+    """
+    return (f"dataset = {quote_string(dataset, dialect)}\n"
+            f"      AND {quote_identifier('table', dialect)} = {quote_string(table, dialect)}\n"
+            f"      AND group_by_columns = {quote_string(canonical_group_by(group_by_columns), dialect)}\n"
+            f"      AND COALESCE(filter_condition, '') = {quote_string(filter_condition or '', dialect)}")
 
-def collect_and_store_current_counts(group_configs, run_id):
-    """Collect current row counts per group and store in BigQuery."""
-    client = bigquery.Client()
+def store_group_counts(group_config, run_id, group_values_jsons, group_keys, row_counts, sink):
+    """Buffer one run's per-group row counts for row_count_history in a sink."""
     table_id = 'your_project.your_dataset.row_count_history'  # Update this
-    errors = []
-    for group in group_configs:
-        dataset = group['dataset']
-        table = group['table']
-        columns = group['columns']
-        filter_condition = group.get('filter')
-        query = generate_group_count_query(dataset, table, columns, filter_condition)
+    timestamp = datetime.utcnow()
+    sink.add(table_id, [
+        {
+            'run_id': run_id,
+            'dataset': group_config['dataset'],
+            'table': group_config['table'],
+            'group_by_columns': canonical_group_by(group_config['columns']),
+            'group_key': key,
+            'group_values': group_values_json,
+            'row_count': int(row_count),
+            'filter_condition': group_config.get('filter'),
+            'timestamp': timestamp
+        }
+        for group_values_json, key, row_count in zip(group_values_jsons, group_keys, row_counts)
+    ])
+
+def collect_and_store_current_counts(group_configs, run_id, max_concurrency=1, client=None,
+                                     cache=None, sink=None, telemetry=None):
+    """Collect current row counts per group and store in BigQuery.
+
+    Rows are buffered in the run's sink when one is given and written when it is
+    flushed; otherwise they are written before returning.
+    """
+    if client is None:
+        client = bigquery.Client()
+    owns_sink = sink is None
+    if owns_sink:
+        sink = BigQuerySink(client)
+
+    def collect(group):
+        query = generate_group_count_query(group['dataset'], group['table'], group['columns'],
+                                           group.get('filter'), client_dialect(client))
         try:
-            result_df = execute_query_with_retries(query)
-            # Prepare rows for insertion
-            rows_to_insert = []
-            for index, row in result_df.iterrows():
-                group_values = {col: row[col] for col in columns}
-                rows_to_insert.append({
-                    'run_id': run_id,
-                    'dataset': dataset,
-                    'table': table,
-                    'group_by_columns': ','.join(columns),
-                    'group_values': json.dumps(group_values),
-                    'row_count': row['row_count'],
-                    'filter_condition': filter_condition,
-                    'timestamp': datetime.utcnow()
-                })
-            # Insert into BigQuery
-            errors.extend(client.insert_rows_json(table_id, rows_to_insert))
+            result_df = execute_query_with_retries(query, client=client, cache=cache,
+                                                   telemetry=telemetry,
+                                                   max_rows=group.get('max_groups'))
+            group_values_jsons, group_keys = serialize_groups(
+                group['columns'], [result_df[col].tolist() for col in group['columns']]
+            )
+            store_group_counts(group, run_id, group_values_jsons, group_keys,
+                               result_df['row_count'].tolist(), sink)
         except Exception as e:
-            logging.error(f"Failed to collect/store counts for {table}: {e}")
-    if errors:
-        logging.error(f"Errors occurred during insertion: {errors}")
+            logging.error(f"Failed to collect/store counts for {group['table']}: {e}")
 
-def get_historical_counts(dataset, table, group_by_columns, group_values,
-                          historical_data_points):
-    """Retrieve historical counts for a specific group."""
-    client = bigquery.Client()
+    map_concurrently(collect, group_configs, max_concurrency)
+    if owns_sink:
+        errors = sink.flush()
+        if errors:
+            logging.error(f"Errors occurred during insertion: {errors}")
+
+def get_historical_counts_for_groups(dataset, table, group_by_columns,
+                                     historical_data_points, client=None,
+                                     exclude_run_id=None, telemetry=None, filter_condition=None):
+    """Retrieve historical counts for every group value of a grouping in one query.
+
+    Returns a dict mapping group keys to their most recent counts, newest
+    first. Counts recorded by exclude_run_id are ignored so the current run is
+    never compared against itself.
+    """
     table_id = 'your_project.your_dataset.row_count_history'  # Update this
-    group_values_json = json.dumps(group_values)
+    dialect = client_dialect(client)
+    run_clause = f"AND run_id != {quote_string(exclude_run_id, dialect)}" if exclude_run_id else ""
     query = f"""
     SELECT
+      group_key,
       row_count
-    FROM `{table_id}`
-    WHERE dataset = '{dataset}'
-      AND table = '{table}'
-      AND group_by_columns = '{','.join(group_by_columns)}'
-      AND group_values = '{group_values_json}'
-    ORDER BY timestamp DESC
-    LIMIT {historical_data_points};
-    """
-    result_df = execute_query_with_retries(query)
-    return result_df['row_count'].tolist()
-
-def analyze_group_anomalies(group_config, run_id):
+    FROM (
+      SELECT
+        group_key,
+        row_count,
+        ROW_NUMBER() OVER (PARTITION BY group_key ORDER BY timestamp DESC) AS recency
+      FROM {table_reference(table_id, dialect)}
+      WHERE {history_grouping(dataset, table, group_by_columns, filter_condition, dialect)}
+        {run_clause}
+    )
+    WHERE recency <= {historical_data_points}
+    ORDER BY group_key, recency;
+    """
+    if telemetry is not None:
+        telemetry = telemetry.labelled(query_kind='history')
+    rows = execute_query_with_retries(query, client=client, as_dataframe=False,
+                                      telemetry=telemetry)
+    historical_counts = {}
+    for row in rows:
+        historical_counts.setdefault(row['group_key'], []).append(row['row_count'])
+    return historical_counts
+
+def get_history_summaries(dataset, table, group_by_columns, historical_data_points, client=None,
+                          telemetry=None, filter_condition=None, exclude_run_id=None):
+    """Rolling count statistics of every group of a grouping, one row per group.
+
+    Reads row_count_summary as of its last refresh. Returns a dict mapping group
+    keys to (point_count, count_sum, count_sum_squares) over each group's last
+    historical_data_points counts. It is empty when the grouping has never been
+    summarised at that depth, or when the summary is not the grouping's history
+    before exclude_run_id: its newest point differs from the history's newest
+    point of another run, or it includes a count of exclude_run_id itself.
+    """
+    summary_table_id = 'your_project.your_dataset.row_count_summary'  # Update this
+    history_table_id = 'your_project.your_dataset.row_count_history'  # Update this
+    dialect = client_dialect(client)
+    grouping = history_grouping(dataset, table, group_by_columns, filter_condition, dialect)
+    run_clause = f"AND run_id != {quote_string(exclude_run_id, dialect)}" if exclude_run_id else ""
+    query = f"""
+    WITH latest AS (
+      SELECT
+        MAX(timestamp) AS history_timestamp
+      FROM {table_reference(history_table_id, dialect)}
+      WHERE {grouping}
+        {run_clause}
+    )
+    SELECT
+      summary.group_key,
+      summary.point_count,
+      summary.count_sum,
+      summary.count_sum_squares,
+      summary.last_timestamp,
+      summary.last_run_id,
+      latest.history_timestamp
+    FROM {table_reference(summary_table_id, dialect)} AS summary
+    CROSS JOIN latest
+    WHERE {grouping}
+      AND history_depth = {historical_data_points};
+    """
+    if telemetry is not None:
+        telemetry = telemetry.labelled(query_kind='history_summary')
+    rows = list(execute_query_with_retries(query, client=client, as_dataframe=False,
+                                           telemetry=telemetry))
+    if not rows:
+        return {}
+    # A refresh covers a whole grouping, so its newest point is the history's newest
+    if (max(row['last_timestamp'] for row in rows) != rows[0]['history_timestamp']
+            or any(row['last_run_id'] == exclude_run_id for row in rows if exclude_run_id)):
+        logging.info(f"Rolling summary of {dataset}.{table} by {canonical_group_by(group_by_columns)} "
+                     f"is out of date; reading its history")
+        return {}
+    return {row['group_key']: (row['point_count'], row['count_sum'], row['count_sum_squares'])
+            for row in rows}
+
+def generate_history_summary_refresh(group_configs, dialect='bigquery'):
+    """SQL transaction recomputing row_count_summary for the given groupings.
+
+    Each grouping's summary rows at its history depth are replaced by the
+    count, sum and sum of squares of every group's last historical_data_points
+    counts in row_count_history, with the time and run of the newest one.
+    """
+    summary_table_id = 'your_project.your_dataset.row_count_summary'  # Update this
+    history_table_id = 'your_project.your_dataset.row_count_history'  # Update this
+    summary_table = table_reference(summary_table_id, dialect)
+    history_table = table_reference(history_table_id, dialect)
+    table_column = quote_identifier('table', dialect)
+    statements = []
+    for group_config in group_configs:
+        filter_condition = group_config.get('filter')
+        grouping = history_grouping(group_config['dataset'], group_config['table'],
+                                    group_config['columns'], filter_condition, dialect)
+        filter_value = quote_string(filter_condition, dialect) if filter_condition else 'NULL'
+        depth = group_config.get('historical_data_points', 7)
+        statements.append(f"""
+    DELETE FROM {summary_table}
+    WHERE {grouping}
+      AND history_depth = {depth};
+
+    INSERT INTO {summary_table}
+      (dataset, {table_column}, group_by_columns, filter_condition, group_key, group_values,
+       history_depth, point_count, count_sum, count_sum_squares, last_timestamp, last_run_id,
+       updated_at)
+    SELECT
+      dataset,
+      {table_column},
+      group_by_columns,
+      {filter_value},
+      group_key,
+      MAX(group_values),
+      {depth},
+      COUNT(*),
+      SUM(row_count),
+      SUM(POW(row_count, 2)),
+      MAX(timestamp),
+      MAX(CASE WHEN recency = 1 THEN run_id END),
+      CURRENT_TIMESTAMP
+    FROM (
+      SELECT
+        *,
+        ROW_NUMBER() OVER (PARTITION BY group_key ORDER BY timestamp DESC) AS recency
+      FROM {history_table}
+      WHERE {grouping}
+    )
+    WHERE recency <= {depth}
+    GROUP BY dataset, {table_column}, group_by_columns, group_key;
+""")
+    return "\n    BEGIN TRANSACTION;\n" + ''.join(statements) + "\n    COMMIT TRANSACTION;\n"
+
+def refresh_history_summaries(group_configs, client=None, telemetry=None):
+    """Recompute row_count_summary for the groupings scored from it, in one transaction.
+
+    Run after a run's group counts are written, so the next run reads each
+    group's rolling statistics instead of its history points. Groupings whose
+    model needs the individual points are left out. Returns the number of
+    groupings refreshed.
+    """
+    # One summary per grouping and depth, however many configs share it
+    groupings = {}
+    for group_config in group_configs:
+        if group_config.get('model', 'mean') in SUMMARY_MODELS:
+            key = grouping_key(group_config) + (group_config.get('historical_data_points', 7),)
+            groupings.setdefault(key, group_config)
+    if not groupings:
+        return 0
+    if client is None:
+        client = bigquery.Client()
+    if telemetry is not None:
+        telemetry = telemetry.labelled(query_kind='history_summary')
+    execute_query_with_retries(generate_history_summary_refresh(groupings.values(),
+                                                                client_dialect(client)),
+                               client=client, as_dataframe=False, telemetry=telemetry)
+    return len(groupings)
+
+def get_completed_checks(run_id, client=None):
+    """Ids of the checks of a run that already have a result other than an error.
+
+    Checks skipped over budget count as not completed, so a resumed run tries
+    them again.
+    """
+    table_id = 'your_project.your_dataset.data_quality_results'  # Update this
+    dialect = client_dialect(client)
+    query = f"""
+    SELECT DISTINCT
+      check_id
+    FROM {table_reference(table_id, dialect)}
+    WHERE run_id = {quote_string(run_id, dialect)}
+      AND check_id IS NOT NULL
+      AND status NOT IN ('error', 'skipped_budget');
+    """
+    rows = execute_query_with_retries(query, client=client, as_dataframe=False)
+    return {row['check_id'] for row in rows}
+
+def get_stored_groupings(run_id, client=None):
+    """Groupings that already have counts in row_count_history for a run.
+
+    Returned as (dataset, table, group_by_columns, filter_condition) tuples, so
+    a resumed run does not store a grouping's counts a second time.
+    """
+    table_id = 'your_project.your_dataset.row_count_history'  # Update this
+    dialect = client_dialect(client)
+    table_column = quote_identifier('table', dialect)
+    query = f"""
+    SELECT DISTINCT
+      dataset,
+      {table_column},
+      group_by_columns,
+      filter_condition
+    FROM {table_reference(table_id, dialect)}
+    WHERE run_id = {quote_string(run_id, dialect)};
+    """
+    rows = execute_query_with_retries(query, client=client, as_dataframe=False)
+    return {(row['dataset'], row['table'], row['group_by_columns'], row['filter_condition'])
+            for row in rows}
+
+def grouping_key(group_config):
+    """A grouping's identity in row_count_history, as returned by get_stored_groupings."""
+    return (group_config['dataset'], group_config['table'],
+            canonical_group_by(group_config['columns']), group_config.get('filter'))
+
+def anomaly_result_fields(run_id, group_config, query):
+    """Columns shared by every data_quality_results row of an anomaly detection config."""
+    columns = group_config['columns']
+    return {
+        'run_id': run_id,
+        'check_id': check_id('anomaly_detection', group_config),
+        'dataset': group_config['dataset'],
+        'table': group_config['table'],
+        'check_type': 'anomaly_detection',
+        'check_name': f"Anomaly detection on {', '.join(columns)}",
+        'group_by_columns': ', '.join(columns),
+        'threshold': group_config['anomaly_threshold'],
+        'metric_name': 'row_count',
+        'filter_condition': group_config.get('filter'),
+        'generated_sql': query,
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    }
+
+def build_anomaly_result(run_id, group_config, query, group_values_json=None,
+                         current_count=None, expected_count=None, status='error',
+                         error_message=None):
+    """Build a data_quality_results row for one group of an anomaly detection config."""
+    return CheckResult(group_values=group_values_json, metric_value=current_count,
+                       expected_value=expected_count, status=status, error_message=error_message,
+                       **anomaly_result_fields(run_id, group_config, query))
+
+def analyze_group_anomalies(group_config, run_id, client=None, cache=None, telemetry=None):
     """Analyze anomalies for a specific group configuration."""
     dataset = group_config['dataset']
     table = group_config['table']
     columns = group_config['columns']
-    anomaly_threshold = group_config['anomaly_threshold']
     historical_data_points = group_config.get('historical_data_points', 7)
-    minimum_data_points = group_config.get('minimum_data_points', 5)
     filter_condition = group_config.get('filter')
 
     # Get current counts
-    query = generate_group_count_query(dataset, table, columns, filter_condition)
+    query = generate_group_count_query(dataset, table, columns, filter_condition,
+                                       client_dialect(client))
     try:
-        current_counts_df = execute_query_with_retries(query)
+        current_counts_df = execute_query_with_retries(query, client=client, cache=cache,
+                                                       telemetry=telemetry,
+                                                       max_rows=group_config.get('max_groups'))
+    except RowLimitExceeded as e:
+        # Too many groups to load at once; recorded so the grouping is not silently skipped
+        logging.error(f"Anomaly detection on {dataset}.{table} exceeds max_groups: {e}")
+        return [build_anomaly_result(run_id, group_config, query,
+                                     error_message=f"{e}; set streaming: true or raise max_groups")]
     except Exception as e:
         logging.error(f"Failed to get current counts for anomaly detection: {e}")
         # Handle error appropriately
         return []
 
-    results = []
-    for index, row in current_counts_df.iterrows():
-        group_values = {col: row[col] for col in columns}
-        current_count = row['row_count']
-        # Retrieve historical counts
-        historical_counts = get_historical_counts(
-            dataset,
-            table,
-            columns,
-            group_values,
+    # Read one summary row per group when the model allows, else every group's history at once
+    historical_counts_by_group = history_summaries = None
+    try:
+        if group_config.get('model', 'mean') in SUMMARY_MODELS:
+            history_summaries = get_history_summaries(dataset, table, columns,
+                                                      historical_data_points, client, telemetry,
+                                                      filter_condition=filter_condition,
+                                                      exclude_run_id=run_id)
+        if not history_summaries:
+            history_summaries = None
+            historical_counts_by_group = get_historical_counts_for_groups(
+                dataset,
+                table,
+                columns,
+                historical_data_points,
+                client,
+                exclude_run_id=run_id,
+                telemetry=telemetry,
+                filter_condition=filter_condition
+            )
+    except Exception as e:
+        logging.error(f"Failed to get historical counts for anomaly detection: {e}")
+        return []
+
+    group_values_jsons, group_keys = serialize_groups(
+        columns, [current_counts_df[col].tolist() for col in columns]
+    )
+    return score_group_anomalies(group_config, run_id, query, group_values_jsons, group_keys,
+                                 current_counts_df['row_count'].tolist(),
+                                 historical_counts_by_group, history_summaries)
+
+def score_group_anomalies(group_config, run_id, query, group_values_jsons, group_keys,
+                          current_counts, historical_counts_by_group=None, history_summaries=None):
+    """Score every group's current count against its history and build the result rows.
+
+    History is either each group's counts (historical_counts_by_group) or its
+    rolling statistics (history_summaries), both keyed by group key. The rows
+    are returned as one ResultBatch sharing the config's columns and query
+    text, so a config with many groups costs little more than its values.
+    """
+    historical_data_points = group_config.get('historical_data_points', 7)
+    if history_summaries is not None:
+        summaries = [history_summaries.get(key, (0, 0.0, 0.0)) for key in group_keys]
+        expected_counts, scores, statuses = score_anomalies_from_summary(
+            current_counts,
+            [summary[0] for summary in summaries],
+            [summary[1] for summary in summaries],
+            [summary[2] for summary in summaries],
+            group_config.get('model', 'mean'),
+            group_config['anomaly_threshold'],
+            group_config.get('minimum_data_points', 5)
+        )
+    else:
+        # Score all groups at once against a (groups x history) matrix
+        history = build_history_matrix(
+            [historical_counts_by_group.get(key, []) for key in group_keys],
             historical_data_points
         )
-        # Determine status
-        if len(historical_counts) < minimum_data_points:
-            status = 'insufficient_data'
-            expected_count = None
-        else:
-            expected_count = sum(historical_counts) / len(historical_counts)
-            change = abs(current_count - expected_count) / expected_count
-            status = 'anomaly' if change >= anomaly_threshold else 'normal'
-        # Prepare result
-        check_name = f"Anomaly detection on {', '.join(columns)}"
-        result = {
-            'run_id': run_id,
-            'dataset': dataset,
-            'table': table,
-            'check_type': 'anomaly_detection',
-            'check_name': check_name,
-            'columns': None,
-            'condition': None,
-            'group_by_columns': ', '.join(columns),
-            'group_values': json.dumps(group_values),
-            'threshold': anomaly_threshold,
-            'metric_name': 'row_count',
-            'metric_value': current_count,
-            'expected_value': expected_count,
-            'total_rows': None,
-            'status': status,
-            'filter_condition': filter_condition,
-            'generated_sql': query,
-            'error_message': None,
-            'timestamp': datetime.utcnow().isoformat() + 'Z'
-        }
-        results.append(result)
+        expected_counts, scores, statuses = score_anomalies(
+            current_counts,
+            history,
+            group_config.get('model', 'mean'),
+            group_config['anomaly_threshold'],
+            group_config.get('minimum_data_points', 5),
+            group_config.get('ewma_alpha', 0.3)
+        )
+
+    results = ResultBatch()
+    results.add_rows(
+        len(group_values_jsons),
+        group_values=list(group_values_jsons),
+        metric_value=[int(current_count) for current_count in current_counts],
+        expected_value=[None if math.isnan(expected_count) else expected_count
+                        for expected_count in expected_counts.tolist()],
+        status=statuses.tolist(),
+        **anomaly_result_fields(run_id, group_config, query)
+    )
+    return results
+
+def generate_streamed_history_query(group_config, run_id, dialect='bigquery'):
+    """SQL pairing each group count stored by a run with the group's earlier counts.
+
+    Rows are ordered by group key and recency (1 is the newest earlier count,
+    NULL for a group without history), so they can be scored a page of groups
+    at a time.
+    """
+    table_id = 'your_project.your_dataset.row_count_history'  # Update this
+    grouping = history_grouping(group_config['dataset'], group_config['table'],
+                                group_config['columns'], group_config.get('filter'), dialect)
+    query = f"""
+    WITH current_counts AS (
+      SELECT
+        group_key,
+        group_values,
+        row_count
+      FROM (
+        SELECT
+          group_key,
+          group_values,
+          row_count,
+          ROW_NUMBER() OVER (PARTITION BY group_key ORDER BY timestamp DESC) AS latest
+        FROM {table_reference(table_id, dialect)}
+        WHERE {grouping}
+          AND run_id = {quote_string(run_id, dialect)}
+      )
+      WHERE latest = 1
+    ),
+    history AS (
+      SELECT
+        group_key,
+        row_count,
+        ROW_NUMBER() OVER (PARTITION BY group_key ORDER BY timestamp DESC) AS recency
+      FROM {table_reference(table_id, dialect)}
+      WHERE {grouping}
+        AND run_id != {quote_string(run_id, dialect)}
+    )
+    SELECT
+      current_counts.group_key,
+      current_counts.group_values,
+      current_counts.row_count AS current_count,
+      history.row_count AS historical_count
+    FROM current_counts
+    LEFT JOIN history
+      ON history.group_key = current_counts.group_key
+      AND history.recency <= {group_config.get('historical_data_points', 7)}
+    ORDER BY current_counts.group_key, history.recency;
+    """
+    return query
+
+def write_sink(sink):
+    """Flush a sink, raising if any row could not be written."""
+    errors = sink.flush()
+    if errors:
+        raise Exception(f"Insertion errors: {errors}")
+
+def stream_group_anomalies(group_config, run_id, client=None, sink=None, telemetry=None,
+                           estimated_bytes=None, store_counts=True):
+    """Collect, store and score a grouping's counts a page of groups at a time.
+
+    For groupings with too many groups to hold in memory. Current counts are
+    streamed in pages of page_size groups and written to row_count_history as
+    they arrive. The stored counts are then streamed back, joined with each
+    group's history in the warehouse, then scored and written page by page.
+    Memory depends on the page size, not the number of groups. Pages are
+    written through a sink of the grouping's own, spawned from sink, so only
+    this grouping's rows are flushed with them; the sink must be one queries
+    can read back. With
+    store_counts=False the counts an earlier attempt of the run stored are
+    scored instead of being collected again. Returns the number of result
+    rows written or buffered.
+    """
+    if client is None:
+        client = bigquery.Client()
+    owns_sink = sink is None
+    if owns_sink:
+        sink = BigQuerySink(client)
+    page_sink = sink.spawn()
+    dialect = client_dialect(client)
+    dataset = group_config['dataset']
+    table = group_config['table']
+    columns = group_config['columns']
+    page_size = group_config.get('page_size') or GROUP_PAGE_SIZE
+    query = generate_group_count_query(dataset, table, columns, group_config.get('filter'), dialect)
+    written = 0
+    try:
+        if not page_sink.queryable:
+            raise ValueError("Streaming anomaly detection reads stored counts back and needs "
+                             "a sink that writes to the warehouse")
+        pages = execute_query_pages(query, page_size, client=client, telemetry=telemetry,
+                                    max_rows=group_config.get('max_groups')) if store_counts else []
+        for page in pages:
+            group_values_jsons, group_keys = serialize_groups(
+                columns, [page[col].tolist() for col in columns]
+            )
+            store_group_counts(group_config, run_id, group_values_jsons, group_keys,
+                               page['row_count'].tolist(), page_sink)
+            write_sink(page_sink)
+
+        def score_page(group_values_jsons, group_keys, current_counts, histories):
+            results = score_group_anomalies(group_config, run_id, query, group_values_jsons,
+                                            group_keys, current_counts,
+                                            dict(zip(group_keys, histories)))
+            results.fill('estimated_bytes', estimated_bytes)
+            insert_results_into_bigquery(results, client, page_sink)
+            write_sink(page_sink)
+            return len(results)
+
+        history_query = generate_streamed_history_query(group_config, run_id, dialect)
+        if telemetry is not None:
+            telemetry = telemetry.labelled(query_kind='history')
+        group_values_jsons, group_keys, current_counts, histories = [], [], [], []
+        for page in execute_query_pages(history_query, page_size, client=client, telemetry=telemetry):
+            # Groups without history come back with a NULL count (None, NaN or pd.NA)
+            for key, group_values_json, current_count, historical_count, has_history in zip(
+                    page['group_key'].tolist(), page['group_values'].tolist(),
+                    page['current_count'].tolist(), page['historical_count'].tolist(),
+                    page['historical_count'].notna().tolist()):
+                if not group_keys or group_keys[-1] != key:
+                    # A group's rows may span pages, so pages are only scored between groups
+                    if len(group_keys) >= page_size:
+                        written += score_page(group_values_jsons, group_keys, current_counts,
+                                              histories)
+                        group_values_jsons, group_keys, current_counts, histories = [], [], [], []
+                    group_values_jsons.append(group_values_json)
+                    group_keys.append(key)
+                    current_counts.append(current_count)
+                    histories.append([])
+                if has_history:
+                    histories[-1].append(historical_count)
+        if group_keys:
+            written += score_page(group_values_jsons, group_keys, current_counts, histories)
+        logging.info(f"Streamed anomaly detection on {dataset}.{table} scored {written} groups")
+    except Exception as e:
+        logging.error(f"Streaming anomaly detection on {dataset}.{table} failed: {e}")
+        # Pages already written stay; the error row shows the grouping is incomplete
+        insert_results_into_bigquery([build_anomaly_result(run_id, group_config, query,
+                                                           error_message=str(e))], client, sink)
+        written += 1
+        if owns_sink:
+            errors = sink.flush()
+            if errors:
+                logging.error(f"Errors occurred during insertion: {errors}")
+    return written
+
+def build_execution_tasks(table_scans, sketch_checks, group_configs, run_id, dialect='bigquery'):
+    """List the units of work of a run, each driven by one table-scanning query."""
+    tasks = []
+    for plan in table_scans:
+        tasks.append({
+            'task_type': 'table_scan',
+            'dataset': plan['dataset'],
+            'table': plan['table'],
+            'query': plan['query'],
+            'payload': plan,
+            'estimated_bytes': None
+        })
+    for check in sketch_checks:
+        tasks.append({
+            'task_type': 'sketch_uniqueness',
+            'dataset': check['dataset'],
+            'table': check['table'],
+            'query': generate_sketch_uniqueness_query(
+                check['dataset'], check['table'], check['columns'],
+                check['partition_column'], run_id, check.get('filter')
+            ),
+            'payload': check,
+            'estimated_bytes': None
+        })
+    for group in group_configs:
+        tasks.append({
+            'task_type': 'group_anomaly',
+            'dataset': group['dataset'],
+            'table': group['table'],
+            'query': generate_group_count_query(
+                group['dataset'], group['table'], group['columns'], group.get('filter'), dialect
+            ),
+            'payload': group,
+            'estimated_bytes': None
+        })
+    return tasks
+
+def estimate_query_bytes(query, client=None, telemetry=None):
+    """Dry-run a query and return the number of bytes it would process."""
+    if client is None:
+        client = bigquery.Client()
+    started = time.perf_counter()
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    query_job = client.query(query, job_config=job_config)
+    if telemetry is not None:
+        telemetry.labelled(query_kind='dry_run').record(
+            query, query_job, duration_seconds=time.perf_counter() - started
+        )
+    return query_job.total_bytes_processed
+
+def task_telemetry(task, telemetry):
+    """A view of a run's telemetry labelled with the task and the checks it covers."""
+    if telemetry is None:
+        return None
+    return telemetry.labelled(task_type=task['task_type'], dataset=task['dataset'],
+                              table=task['table'], checks=task_checks(task))
+
+def estimate_task_costs(tasks, max_concurrency=1, client=None, telemetry=None):
+    """Dry-run every task's query and record its estimated bytes on the task."""
+    def estimate(task):
+        try:
+            task['estimated_bytes'] = estimate_query_bytes(task['query'], client,
+                                                           task_telemetry(task, telemetry))
+        except Exception as e:
+            logging.warning(f"Dry run failed for {task['dataset']}.{task['table']}: {e}")
+
+    map_concurrently(estimate, tasks, max_concurrency)
+    return tasks
+
+def execute_task(task, run_id, client=None, cache=None, sink=None, telemetry=None):
+    """Execute one planned task and return its result rows as a ResultBatch."""
+    task_type = task['task_type']
+    telemetry = task_telemetry(task, telemetry)
+    if task_type == 'table_scan':
+        results = execute_table_scan(task['payload'], run_id, client, telemetry, cache)
+    elif task_type == 'sketch_uniqueness':
+        results = [execute_sketch_uniqueness_check(task['payload'], run_id, client, telemetry)]
+    elif task_type == 'group_anomaly' and task['payload'].get('streaming'):
+        # Streamed results are written page by page as they are scored
+        task['results_written'] = stream_group_anomalies(task['payload'], run_id, client, sink,
+                                                         telemetry, task['estimated_bytes'],
+                                                         not task.get('counts_stored'))
+        results = []
+    elif task_type == 'group_anomaly':
+        # A resumed run keeps the counts its earlier attempt stored
+        if not task.get('counts_stored'):
+            collect_and_store_current_counts([task['payload']], run_id, client=client, cache=cache,
+                                             sink=sink, telemetry=telemetry)
+        results = analyze_group_anomalies(task['payload'], run_id, client, cache, telemetry)
+    else:
+        raise ValueError(f"Unsupported task type: {task_type}")
+    if not isinstance(results, ResultBatch):
+        results = ResultBatch(results)
+    results.fill('estimated_bytes', task['estimated_bytes'])
+    results.fill('cached', task.get('cached_rows') is not None)
+    return results
+
+def build_skipped_results(task, run_id):
+    """Build skipped_budget result rows for every check covered by a task."""
+    reason = task.get('skip_reason')
+    if task['task_type'] == 'table_scan':
+        results = [build_check_result(run_id, entry['check_type'], entry['check'], task['query'],
+                                      status='skipped_budget', error_message=reason)
+                   for entry in task['payload']['checks']]
+    elif task['task_type'] == 'sketch_uniqueness':
+        results = [build_check_result(run_id, 'uniqueness_check', task['payload'], task['query'],
+                                      status='skipped_budget', error_message=reason)]
+    else:
+        results = [build_anomaly_result(run_id, task['payload'], task['query'],
+                                        status='skipped_budget', error_message=reason)]
+    for result in results:
+        result['estimated_bytes'] = task['estimated_bytes']
     return results
 
-def insert_results_into_bigquery(results):
-    """Insert the results into a unified BigQuery table."""
-    client = bigquery.Client()
+def insert_results_into_bigquery(results, client=None, sink=None):
+    """Insert the results into a unified BigQuery table.
+
+    With a sink the results are only buffered; the caller flushes the sink and
+    handles its errors.
+    """
     table_id = 'your_project.your_dataset.data_quality_results'  # Update this
-    errors = client.insert_rows_json(table_id, results)
+    if not isinstance(results, ResultBatch):
+        results = ResultBatch(results)
+    if sink is not None:
+        sink.add(table_id, results)
+        return
+    if client is None:
+        client = bigquery.Client()
+    sink = BigQuerySink(client)
+    sink.add(table_id, results)
+    errors = sink.flush()
     if errors:
         logging.error(f"Failed to insert results into BigQuery: {errors}")
         raise Exception(f"Insertion errors: {errors}")
-    else:
-        logging.info(f"Results successfully inserted into {table_id}.")
 
-def record_run_metadata(run_id, start_time, end_time, status, error_message=None):
-    """Record metadata about the run in BigQuery."""
-    client = bigquery.Client()
+def get_historical_task_durations(before, lookback_days=14, client=None):
+    """Average query seconds per task over recent runs, keyed like query_planner.task_key.
+
+    Only telemetry recorded before the given time is used, so every shard of a
+    run sees the same history. Returns {} when there is no usable history.
+    """
+    table_id = 'your_project.your_dataset.query_telemetry'  # Update this
+    dialect = client_dialect(client)
+    since = before - timedelta(days=lookback_days)
+    query = f"""
+    SELECT
+      checks,
+      SUM(duration_ms) / COUNT(DISTINCT run_id) / 1000 AS seconds
+    FROM {table_reference(table_id, dialect)}
+    WHERE timestamp >= {quote_string(since.isoformat(), dialect)}
+      AND timestamp < {quote_string(before.isoformat(), dialect)}
+      AND query_kind != 'dry_run'
+      AND status = 'success'
+      AND checks IS NOT NULL
+    GROUP BY checks;
+    """
+    try:
+        rows = execute_query_with_retries(query, client=client, as_dataframe=False)
+    except Exception as e:
+        logging.warning(f"No task duration history, balancing shards by task count: {e}")
+        return {}
+    return {row['checks']: float(row['seconds']) for row in rows}
+
+def record_run_metadata(run_id, start_time, end_time, status, error_message=None,
+                        client=None, sink=None, telemetry=None, shard=None, totals=None):
+    """Record metadata about the run in BigQuery, flushing any rows still buffered in the sink.
+
+    With a QueryTelemetry collector, its records are written to query_telemetry
+    and the run's query totals to data_quality_runs. A shard of a sharded run,
+    given as (shard_index, shard_count), records itself in data_quality_run_shards
+    instead; finalize_sharded_run combines the shards into one run and passes
+    their summed query totals.
+    """
+    if sink is None:
+        if client is None:
+            client = bigquery.Client()
+        sink = BigQuerySink(client)
     table_id = 'your_project.your_dataset.data_quality_runs'  # Update this
     row = {
         'run_id': run_id,
@@ -412,8 +1189,55 @@ def record_run_metadata(run_id, start_time, end_time, status, error_message=None
         'status': status,
         'error_message': error_message
     }
-    errors = client.insert_rows_json(table_id, [row])
+    if shard is not None:
+        table_id = 'your_project.your_dataset.data_quality_run_shards'  # Update this
+        row['shard_index'], row['shard_count'] = shard
+    if telemetry is not None:
+        row.update(telemetry.totals())
+        store_query_telemetry(telemetry, sink)
+    if totals is not None:
+        row.update(totals)
+    sink.add(table_id, [row])
+    errors = sink.flush()
     if errors:
         logging.error(f"Failed to record run metadata: {errors}")
     else:
         logging.info(f"Run metadata recorded for run ID: {run_id}")
+
+def finalize_sharded_run(run_id, shard_count, client=None, sink=None):
+    """Record a sharded run as one data_quality_runs row built from its shards.
+
+    The latest attempt of each shard counts. The run succeeds only if every
+    shard succeeded; missing shards fail it. Returns the recorded status.
+    """
+    table_id = 'your_project.your_dataset.data_quality_run_shards'  # Update this
+    dialect = client_dialect(client)
+    query = f"""
+    SELECT
+      *
+    FROM (
+      SELECT
+        *,
+        ROW_NUMBER() OVER (PARTITION BY shard_index ORDER BY end_time DESC) AS recency
+      FROM {table_reference(table_id, dialect)}
+      WHERE run_id = {quote_string(run_id, dialect)}
+    )
+    WHERE recency = 1;
+    """
+    shards = {row['shard_index']: row
+              for row in execute_query_with_retries(query, client=client, as_dataframe=False)}
+    problems = [f"shard {index} did not report" for index in range(shard_count)
+                if index not in shards]
+    problems.extend(f"shard {index} {row['status']}: {row['error_message']}"
+                    for index, row in sorted(shards.items()) if row['status'] != 'success')
+    totals = {}
+    for row in shards.values():
+        for column, value in row.items():
+            if column.startswith('total_') and value is not None:
+                totals[column] = totals.get(column, 0) + value
+    start_time = min((row['start_time'] for row in shards.values()), default=datetime.utcnow())
+    end_time = max((row['end_time'] for row in shards.values()), default=datetime.utcnow())
+    status = 'failure' if problems else 'success'
+    record_run_metadata(run_id, start_time, end_time, status, '; '.join(problems) or None,
+                        client, sink, totals=totals)
+    return status
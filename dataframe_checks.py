@@ -0,0 +1,258 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config_compiler import compile_config
+from data_quality_checks import (
+    build_anomaly_result,
+    build_check_result,
+    compute_check_metric,
+    evaluate_threshold,
+    get_historical_counts_for_groups,
+    score_group_anomalies,
+    store_group_counts
+)
+from group_keys import as_dates, serialize_groups
+from sql_expressions import column_accessor, evaluate_negated_predicate, evaluate_predicate
+
+# Multiplier mixing per-column hashes into one row hash (64-bit FNV prime)
+HASH_MULTIPLIER = np.uint64(0x100000001B3)
+
+def _series_getter(data):
+    """Column lookup for a pandas DataFrame or pyarrow Table.
+
+    DataFrame columns are used as they are; Arrow columns are converted to
+    pandas only when a check references them (zero-copy for primitive columns
+    without nulls).
+    """
+    if isinstance(data, pd.DataFrame):
+        return lambda name: data[name]
+    if hasattr(data, 'column') and hasattr(data, 'num_rows'):
+        return lambda name: data.column(name).to_pandas()
+    raise TypeError(f"Unsupported data type for in-process checks: {type(data).__name__}")
+
+def _row_count(data):
+    return data.num_rows if hasattr(data, 'num_rows') else len(data)
+
+class DataFrameContext:
+    """Columns, null masks and filter masks of one input, each computed at most once."""
+
+    def __init__(self, data):
+        self.row_count = _row_count(data)
+        self.columns = column_accessor(_series_getter(data))
+        self._filters = {}
+
+    def filter_mask(self, filter_condition):
+        """Rows selected by a filter, or None for every row."""
+        if not filter_condition:
+            return None
+        if filter_condition not in self._filters:
+            self._filters[filter_condition] = evaluate_predicate(filter_condition, self.columns,
+                                                                 self.row_count)
+        return self._filters[filter_condition]
+
+    def count(self, mask, filter_mask):
+        """Number of rows set in mask (a bool array or scalar) within the filter."""
+        if filter_mask is not None:
+            mask = np.logical_and(mask, filter_mask)
+        if np.ndim(mask) == 0:
+            return self.row_count if mask else 0
+        return int(np.count_nonzero(mask))
+
+def _hash_values(values):
+    """64-bit hash of each value of a column."""
+    return pd.util.hash_array(values)
+
+def _row_keys(context, columns):
+    """One sortable key per row over the values of columns, the rows with any NULL, and
+    whether the keys are hashes.
+
+    A single numeric or datetime column is its own key; otherwise each row's
+    values are combined into a 64-bit hash, so different rows can share a key.
+    """
+    if len(columns) == 1:
+        series, nulls = context.columns(columns[0])
+        if series.dtype.kind in 'biufmM':
+            return series.to_numpy(), nulls, False
+    hashes = None
+    nulls = False
+    for column in columns:
+        series, column_nulls = context.columns(column)
+        column_hashes = _hash_values(series.to_numpy())
+        hashes = column_hashes if hashes is None else (hashes * HASH_MULTIPLIER) ^ column_hashes
+        if column_nulls is not False:
+            nulls = column_nulls if nulls is False else np.logical_or(nulls, column_nulls)
+    return hashes, nulls, True
+
+def count_distinct_keys(keys):
+    """Number of distinct values in a key array.
+
+    Sorting is vectorised and several times faster than a hash table over
+    this many random keys.
+    """
+    if len(keys) == 0:
+        return 0
+    keys = np.sort(keys)
+    return 1 + int(np.count_nonzero(keys[1:] != keys[:-1]))
+
+def count_distinct_hashed_rows(context, columns, keys, rows):
+    """Number of distinct value combinations of columns among rows, given their row hashes.
+
+    Distinct hashes are counted with a sort; rows sharing a hash are then
+    compared on their values, so a hash collision never hides a distinct row.
+    """
+    if len(keys) == 0:
+        return 0
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.ones(len(sorted_keys), dtype=bool)
+    starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    distinct = int(np.count_nonzero(starts))
+    # Rows whose hash is not unique: those not starting a run of length one
+    shared = np.logical_not(np.logical_and(starts, np.append(starts[1:], True)))
+    if shared.any():
+        shared_rows = rows[order[shared]]
+        values = pd.DataFrame({str(index): context.columns(column)[0].to_numpy()[shared_rows]
+                               for index, column in enumerate(columns)})
+        shared_keys = int(np.count_nonzero(starts[shared]))
+        distinct += len(values.drop_duplicates()) - shared_keys
+    return distinct
+
+def evaluate_null_check(context, check, run_id):
+    """Count NULLs of a column within the check's filter."""
+    filter_mask = context.filter_mask(check.get('filter'))
+    _, nulls = context.columns(check['column'])
+    total_rows = context.count(True, filter_mask)
+    null_count = context.count(nulls, filter_mask)
+    status = evaluate_threshold(null_count, check['threshold'])
+    return build_check_result(run_id, 'null_check', check, None, null_count, total_rows, status)
+
+def evaluate_uniqueness_check(context, check, run_id):
+    """Count duplicate rows over columns from sorted per-row keys.
+
+    Like COUNT(DISTINCT CONCAT(...)), rows with a NULL in any column are not
+    counted as distinct values. Counts are exact, hash collisions included;
+    approximate is ignored.
+    """
+    filter_mask = context.filter_mask(check.get('filter'))
+    keys, nulls, hashed = _row_keys(context, check['columns'])
+    valid = np.broadcast_to(np.logical_not(nulls), (context.row_count,))
+    if filter_mask is not None:
+        valid = np.logical_and(valid, filter_mask)
+    rows = np.flatnonzero(valid)
+    keys = keys[rows]
+    if hashed:
+        unique_count = count_distinct_hashed_rows(context, check['columns'], keys, rows)
+    else:
+        unique_count = count_distinct_keys(keys)
+    total_rows = context.count(True, filter_mask)
+    duplicates = compute_check_metric('uniqueness_check', total_rows, unique_count)
+    status = evaluate_threshold(duplicates, check['threshold'])
+    return build_check_result(run_id, 'uniqueness_check', check, None, duplicates, total_rows, status)
+
+def evaluate_conditional_check(context, check, run_id):
+    """Count rows failing a condition (FALSE, not NULL) within the check's filter."""
+    filter_mask = context.filter_mask(check.get('filter'))
+    failures = evaluate_negated_predicate(check['condition'], context.columns, context.row_count)
+    total_rows = context.count(True, filter_mask)
+    failure_count = context.count(failures, filter_mask)
+    status = evaluate_threshold(failure_count, check['threshold'])
+    return build_check_result(run_id, 'conditional_check', check, None, failure_count, total_rows,
+                              status)
+
+def _group_value(value):
+    """A group key value as stored in group_values, with NaN/NaT keys as NULL."""
+    return None if pd.isna(value) else value
+
+def count_groups(context, group_config):
+    """Row count per group within the group's filter, as (group_values_jsons, group_keys, counts)."""
+    columns = group_config['columns']
+    filter_mask = context.filter_mask(group_config.get('filter'))
+    keys = {}
+    for column in columns:
+        series, _ = context.columns(column)
+        keys[column] = series.to_numpy() if filter_mask is None else series.to_numpy()[filter_mask]
+    counts = pd.DataFrame(keys).groupby(columns, dropna=False, sort=False).size()
+    index = counts.index.to_frame(index=False)
+    column_values = []
+    for column in columns:
+        values = [_group_value(value) for value in index[column].tolist()]
+        # DATE columns held as datetime64 are keyed by date, as the warehouse returns them
+        if index[column].dtype.kind == 'M':
+            values = as_dates(values)
+        column_values.append(values)
+    group_values_jsons, group_keys = serialize_groups(columns, column_values)
+    return group_values_jsons, group_keys, counts.tolist()
+
+def evaluate_group_anomalies(context, group_config, run_id, client=None, sink=None):
+    """Score the current group counts against row_count_history.
+
+    History is read through client when one is given (any backend); otherwise
+    every group has insufficient data. With a sink, the counts are also
+    buffered for row_count_history.
+    """
+    group_values_jsons, group_keys, counts = count_groups(context, group_config)
+    historical_counts_by_group = {}
+    if client is not None:
+        historical_counts_by_group = get_historical_counts_for_groups(
+            group_config['dataset'],
+            group_config['table'],
+            group_config['columns'],
+            group_config.get('historical_data_points', 7),
+            client,
+            exclude_run_id=run_id
+        )
+    if sink is not None:
+        store_group_counts(group_config, run_id, group_values_jsons, group_keys, counts, sink)
+    return score_group_anomalies(group_config, run_id, None, group_values_jsons, group_keys, counts,
+                                 historical_counts_by_group)
+
+CHECK_EVALUATORS = {
+    'null_check': evaluate_null_check,
+    'uniqueness_check': evaluate_uniqueness_check,
+    'conditional_check': evaluate_conditional_check
+}
+
+def run_dataframe_checks(data, config, dataset, table, run_id=None, checks='all', client=None,
+                         sink=None):
+    """Evaluate the config.yaml checks of dataset.table on a pandas DataFrame or Arrow table.
+
+    Checks run in-process with vectorised column operations and return rows
+    with the data_quality_results schema (generated_sql is NULL), ready for
+    insert_results_into_bigquery.
+    """
+    if run_id is None:
+        run_id = f"run_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    context = DataFrameContext(data)
+
+    # Filters and conditions stay in BigQuery SQL, which sql_expressions evaluates
+    compiled = compile_config(config, checks)
+
+    def for_table(compiled_checks):
+        return [check for check in compiled_checks
+                if check['dataset'] == dataset and check['table'] == table]
+
+    check_lists = [
+        ('null_check', compiled.null_checks),
+        ('uniqueness_check', compiled.uniqueness_checks),
+        ('conditional_check', compiled.conditional_checks)
+    ]
+    results = []
+    for check_type, compiled_checks in check_lists:
+        for check in for_table(compiled_checks):
+            try:
+                results.append(CHECK_EVALUATORS[check_type](context, check, run_id))
+            except Exception as e:
+                logging.error(f"In-process {check_type} failed for {dataset}.{table}: {e}")
+                results.append(build_check_result(run_id, check_type, check, None,
+                                                  error_message=str(e)))
+
+    for group_config in for_table(compiled.group_configs):
+        try:
+            results.extend(evaluate_group_anomalies(context, group_config, run_id, client, sink))
+        except Exception as e:
+            logging.error(f"In-process anomaly detection failed for {dataset}.{table}: {e}")
+            results.append(build_anomaly_result(run_id, group_config, None, error_message=str(e)))
+    return results
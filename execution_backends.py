@@ -0,0 +1,231 @@
+# A backend is a client exposing the part of google.cloud.bigquery.Client the
+# framework uses: query(sql, job_config) returning a job whose result() rows
+# support items() and to_dataframe(), insert_rows_json and load_table_from_file.
+# A client's dialect attribute selects how SQL is generated for it (see
+# sql_dialects.py); clients without one are treated as BigQuery.
+import glob
+import io
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+from sql_dialects import quote_identifier, quote_string, table_reference, translate_bigquery_sql
+
+ENGINES = ('bigquery', 'duckdb')
+
+# Result table definitions, loaded into local databases
+RESULT_SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_results_shema')
+
+LOCAL_FILE_READERS = {
+    '.parquet': 'read_parquet',
+    '.csv': 'read_csv_auto',
+    '.json': 'read_json_auto',
+    '.ndjson': 'read_json_auto'
+}
+
+class DuckDBRowIterator(list):
+    """Query result rows as dicts, with the to_dataframe() of a BigQuery RowIterator."""
+
+    def __init__(self, dataframe):
+        super().__init__(dataframe.to_dict('records'))
+        self._dataframe = dataframe
+        self.total_rows = len(dataframe)
+        self.page_size = None
+
+    def to_dataframe(self, **kwargs):
+        return self._dataframe
+
+    def to_dataframe_iterable(self, bqstorage_client=None, **kwargs):
+        """The rows as DataFrames of at most page_size rows, like a paged RowIterator."""
+        page_size = self.page_size or max(len(self._dataframe), 1)
+        for start in range(0, len(self._dataframe), page_size):
+            yield self._dataframe.iloc[start:start + page_size]
+
+class DuckDBQueryJob:
+    """A query run on DuckDB, with the attributes of a BigQuery QueryJob."""
+
+    def __init__(self, client, query, job_config=None):
+        self.client = client
+        self.query = query
+        self.job_id = f"duckdb_{uuid.uuid4().hex}"
+        self.dry_run = bool(job_config is not None and getattr(job_config, 'dry_run', False))
+        # DuckDB does not meter scanned bytes or slots
+        self.total_bytes_processed = None
+        self.total_bytes_billed = None
+        self.slot_millis = None
+        self.cache_hit = False
+        self.created = datetime.utcnow()
+        self.started = None
+        self.ended = None
+        self.state = 'PENDING'
+        self._result = None
+
+    def result(self, page_size=None, **kwargs):
+        if self._result is None:
+            self.started = datetime.utcnow()
+            self._result = self.client.run_query(self.query, self.dry_run)
+            self.ended = datetime.utcnow()
+            self.state = 'DONE'
+        self._result.page_size = page_size
+        return self._result
+
+    def done(self, **kwargs):
+        return self.state == 'DONE'
+
+class DuckDBLoadJob:
+    """A completed load into DuckDB, with the result() of a BigQuery LoadJob."""
+
+    def __init__(self, errors):
+        self.errors = errors or None
+        self.job_id = f"duckdb_{uuid.uuid4().hex}"
+        self.state = 'DONE'
+
+    def result(self, **kwargs):
+        if self.errors:
+            raise Exception(f"Load job failed: {self.errors}")
+        return self
+
+class DuckDBClient:
+    """Run the framework's SQL on an embedded DuckDB database.
+
+    BigQuery datasets map to DuckDB schemas, so `project.dataset.table`
+    becomes "dataset"."table". Source tables are registered from local
+    Parquet/CSV/JSON files or created by running the BigQuery test_generator
+    scripts, which are translated to DuckDB SQL first.
+    """
+
+    dialect = 'duckdb'
+
+    def __init__(self, database=':memory:', schema_dir=RESULT_SCHEMA_DIR):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("The duckdb engine requires the duckdb package (pip install duckdb)")
+        self.database = database
+        self.connection = duckdb.connect(database)
+        self._lock = threading.Lock()
+        if schema_dir:
+            for path in sorted(glob.glob(os.path.join(schema_dir, '*.sql'))):
+                self.run_sql_file(path, replace=False)
+
+    def _cursor(self):
+        """A connection for the calling thread; DuckDB connections are not thread-safe."""
+        with self._lock:
+            return self.connection.cursor()
+
+    def run_query(self, query, dry_run=False):
+        """Execute SQL and return its rows; a dry run only plans the query."""
+        import pandas as pd
+
+        cursor = self._cursor()
+        try:
+            if dry_run:
+                cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}")
+                return DuckDBRowIterator(pd.DataFrame())
+            cursor.execute(query)
+            if cursor.description is None:
+                return DuckDBRowIterator(pd.DataFrame())
+            dataframe = cursor.fetchdf()
+            # DATE columns come back as dates, as from BigQuery, not as datetime64 midnights
+            for name, type_code, *_ in cursor.description:
+                if str(type_code) == 'DATE':
+                    dataframe[name] = pd.Series([None if pd.isna(value) else value.date()
+                                                 for value in dataframe[name]],
+                                                index=dataframe.index, dtype=object)
+            return DuckDBRowIterator(dataframe)
+        finally:
+            cursor.close()
+
+    def query(self, query, job_config=None, **kwargs):
+        return DuckDBQueryJob(self, query, job_config)
+
+    def create_schemas(self, sql):
+        """Create the schemas of every table a DuckDB statement creates."""
+        for schema in set(re.findall(r'CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"([^"]+)"\.',
+                                     sql, re.IGNORECASE)):
+            self.connection.execute(f"CREATE SCHEMA IF NOT EXISTS {quote_identifier(schema, self.dialect)}")
+
+    def run_sql_file(self, path, replace=True):
+        """Run a BigQuery SQL script (e.g. a test_generator fixture) on DuckDB.
+
+        With replace=False, CREATE TABLE statements leave existing tables alone,
+        so result tables in a persistent database keep their history.
+        """
+        with open(path, 'r') as file:
+            sql = translate_bigquery_sql(file.read(), self.dialect)
+        if not replace:
+            sql = re.sub(r'CREATE\s+TABLE\s+(?!IF\s+NOT\s+EXISTS)', 'CREATE TABLE IF NOT EXISTS ',
+                         sql, flags=re.IGNORECASE)
+        self.create_schemas(sql)
+        with self._lock:
+            self.connection.execute(sql)
+        logging.info(f"Loaded {path} into DuckDB.")
+
+    def register_file(self, dataset, table, path):
+        """Expose a local Parquet/CSV/JSON file as dataset.table."""
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in LOCAL_FILE_READERS:
+            raise ValueError(f"Unsupported local file type: {path}")
+        with self._lock:
+            self.connection.execute(f"CREATE SCHEMA IF NOT EXISTS {quote_identifier(dataset, self.dialect)}")
+            self.connection.execute(
+                f"CREATE OR REPLACE VIEW {table_reference(f'{dataset}.{table}', self.dialect)} AS "
+                f"SELECT * FROM {LOCAL_FILE_READERS[extension]}({quote_string(path, self.dialect)})"
+            )
+        logging.info(f"Registered {path} as {dataset}.{table}.")
+
+    def register_directory(self, directory):
+        """Register every DIRECTORY/<dataset>/<table>.<parquet|csv|json> file."""
+        for path in sorted(glob.glob(os.path.join(directory, '*', '*'))):
+            table, extension = os.path.splitext(os.path.basename(path))
+            if extension.lower() in LOCAL_FILE_READERS:
+                self.register_file(os.path.basename(os.path.dirname(path)), table, path)
+
+    def insert_rows_json(self, table_id, json_rows, **kwargs):
+        """Insert rows by column name, returning BigQuery-style per-row errors."""
+        import pandas as pd
+
+        if not json_rows:
+            return []
+        cursor = self._cursor()
+        try:
+            cursor.register('json_rows', pd.DataFrame(list(json_rows)))
+            cursor.execute(f"INSERT INTO {table_reference(table_id, self.dialect)} BY NAME "
+                           f"SELECT * FROM json_rows")
+        except Exception as e:
+            return [{'index': index, 'errors': [{'reason': 'invalid', 'message': str(e)}]}
+                    for index in range(len(json_rows))]
+        finally:
+            cursor.close()
+        return []
+
+    def load_table_from_file(self, file_obj, destination, job_config=None, **kwargs):
+        """Append newline-delimited JSON rows to a table."""
+        data = file_obj.read()
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        rows = [json.loads(line) for line in io.StringIO(data) if line.strip()]
+        return DuckDBLoadJob(self.insert_rows_json(str(destination), rows))
+
+def create_duckdb_client(database=':memory:', data_dir=None, sql_files=None):
+    """Create a DuckDB client with local source tables registered."""
+    client = DuckDBClient(database)
+    if data_dir:
+        client.register_directory(data_dir)
+    for path in sql_files or []:
+        client.run_sql_file(path)
+    return client
+
+def create_execution_client(engine='bigquery', max_concurrency=1, database=':memory:',
+                            data_dir=None, sql_files=None):
+    """Create the client for an execution engine."""
+    if engine == 'bigquery':
+        from data_quality_checks import create_bigquery_client
+        return create_bigquery_client(max_concurrency)
+    if engine == 'duckdb':
+        return create_duckdb_client(database, data_dir, sql_files)
+    raise ValueError(f"Unsupported execution engine: {engine}")
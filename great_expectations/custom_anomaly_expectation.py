@@ -1,23 +1,184 @@
-from great_expectations.execution_engine import ExecutionEngine
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from great_expectations.core.metric_domain_types import MetricDomainTypes
+from great_expectations.execution_engine import PandasExecutionEngine, SqlAlchemyExecutionEngine
 from great_expectations.expectations.metrics import MetricProvider, metric_value
 from great_expectations.expectations.expectation import ColumnAggregateExpectation
-from great_expectations.validator.validator import Validator
-import pandas as pd
+
+# Scoring and group keys are shared with the pipeline; the repository root must be on PYTHONPATH
+from anomaly_scoring import SUMMARY_MODELS, build_history_matrix, score_anomalies, score_anomalies_from_summary
+from group_keys import as_dates, canonical_group_by, group_key
+from sql_expressions import column_accessor, evaluate_predicate
+
+HISTORY_SCHEMA = 'your_dataset'  # Update this
+
+# Engines for history_connection_string values, created once per process
+_history_engines = {}
+
+def history_engine(metric_value_kwargs, execution_engine=None):
+    """SQLAlchemy engine holding row_count_history: the configured one, else the checked database's.
+
+    Batches not read through SQLAlchemy (Pandas) have no database of their
+    own, so without history_connection_string they raise a ValueError rather
+    than pass for lack of history.
+    """
+    connection_string = metric_value_kwargs.get('history_connection_string')
+    if connection_string:
+        if connection_string not in _history_engines:
+            _history_engines[connection_string] = sa.create_engine(connection_string)
+        return _history_engines[connection_string]
+    if execution_engine is None:
+        raise ValueError("history_connection_string is required to read row_count_history "
+                         "for batches outside a SQLAlchemy database")
+    return execution_engine.engine
+
+def history_tables():
+    """row_count_history and row_count_summary as SQLAlchemy tables; table is quoted per dialect."""
+    grouping = ('dataset', 'table', 'group_by_columns', 'filter_condition', 'group_key')
+    history = sa.table('row_count_history',
+                       *[sa.column(name) for name in grouping + ('row_count', 'timestamp')],
+                       schema=HISTORY_SCHEMA)
+    summary = sa.table('row_count_summary',
+                       *[sa.column(name) for name in grouping + ('history_depth', 'point_count',
+                                                                 'count_sum', 'count_sum_squares',
+                                                                 'last_timestamp')],
+                       schema=HISTORY_SCHEMA)
+    return history, summary
+
+def score_column_groups(column, values, counts, metric_value_kwargs, engine):
+    """Largest anomaly score of a column's per-value row counts against their history.
+
+    Groups are keyed as the pipeline keys a grouping on this column alone with
+    the same filter_condition, so its history is shared; values must be as
+    the warehouse returns them (None
+    for NULL, dates for DATE columns). The mean and zscore models read one
+    row_count_summary row per group; other models, and groupings without an
+    up-to-date summary, read the last historical_data_points counts of each
+    group.
+    Returns None when no group has enough history.
+    """
+    depth = metric_value_kwargs['historical_data_points']
+    model = metric_value_kwargs['model']
+    minimum_data_points = metric_value_kwargs['minimum_data_points']
+    keys = [group_key({column: value}) for value in values]
+    if not keys:
+        return None
+    history, summary = history_tables()
+
+    def grouping(table):
+        return sa.and_(table.c.dataset == metric_value_kwargs['dataset'],
+                       table.c.table == metric_value_kwargs['table_name'],
+                       table.c.group_by_columns == canonical_group_by([column]),
+                       sa.func.coalesce(table.c.filter_condition, '') ==
+                       (metric_value_kwargs.get('filter_condition') or ''))
+
+    with engine.connect() as connection:
+        summaries = {}
+        if model in SUMMARY_MODELS:
+            query = sa.select(summary.c.group_key, summary.c.point_count, summary.c.count_sum,
+                              summary.c.count_sum_squares, summary.c.last_timestamp).where(
+                sa.and_(grouping(summary), summary.c.history_depth == depth))
+            rows = connection.execute(query).fetchall()
+            # A summary behind the history (not yet refreshed) is not used
+            latest = connection.execute(
+                sa.select(sa.func.max(history.c.timestamp)).where(grouping(history))).scalar()
+            if rows and max(row[4] for row in rows) == latest:
+                summaries = {row[0]: row[1:4] for row in rows}
+        if summaries:
+            stats = [summaries.get(key, (0, 0.0, 0.0)) for key in keys]
+            _, scores, _ = score_anomalies_from_summary(
+                counts, [stat[0] for stat in stats], [stat[1] for stat in stats],
+                [stat[2] for stat in stats], model, minimum_data_points=minimum_data_points)
+        else:
+            recency = sa.func.row_number().over(partition_by=history.c.group_key,
+                                                order_by=history.c.timestamp.desc())
+            ranked = sa.select(history.c.group_key, history.c.row_count,
+                               recency.label('recency')).where(grouping(history)).subquery()
+            query = sa.select(ranked.c.group_key, ranked.c.row_count).where(
+                ranked.c.recency <= depth).order_by(ranked.c.group_key, ranked.c.recency)
+            historical_counts = {}
+            for key, row_count in connection.execute(query):
+                historical_counts.setdefault(key, []).append(row_count)
+            _, scores, _ = score_anomalies(
+                counts, build_history_matrix([historical_counts.get(key, []) for key in keys], depth),
+                model, minimum_data_points=minimum_data_points)
+    if np.isnan(scores).all():
+        return None
+    return float(np.nanmax(scores))
 
 class ColumnAnomalyScore(MetricProvider):
+    """Largest relative change (or z-score) of the row count of any value of a column.
+
+    Row counts per value are aggregated where the data lives: a GROUP BY
+    pushed down to the database for SqlAlchemy, value_counts for Pandas.
+    Only one row per distinct value reaches the worker. A filter_condition
+    counts only the rows it selects: a WHERE clause in the database, or the
+    pipeline's in-process SQL evaluator for Pandas.
+    """
+
     metric_name = "column.anomaly_score"
+    domain_keys = ("batch_id", "table", "column", "row_condition", "condition_parser")
+    value_keys = ("dataset", "table_name", "historical_data_points", "minimum_data_points", "model",
+                  "history_connection_string", "filter_condition")
+
+    @metric_value(engine=SqlAlchemyExecutionEngine)
+    def _sqlalchemy(cls, execution_engine, metric_domain_kwargs, metric_value_kwargs, metrics,
+                    runtime_configuration):
+        selectable, _, accessor_domain_kwargs = execution_engine.get_compute_domain(
+            metric_domain_kwargs, domain_type=MetricDomainTypes.COLUMN
+        )
+        column = accessor_domain_kwargs['column']
+        query = sa.select(sa.column(column), sa.func.count().label('row_count')).select_from(
+            selectable)
+        if metric_value_kwargs.get('filter_condition'):
+            query = query.where(sa.text(metric_value_kwargs['filter_condition']))
+        query = query.group_by(sa.column(column))
+        with execution_engine.engine.connect() as connection:
+            rows = connection.execute(query).fetchall()
+        return score_column_groups(column, [row[0] for row in rows], [row[1] for row in rows],
+                                   metric_value_kwargs,
+                                   history_engine(metric_value_kwargs, execution_engine))
 
-    @metric_value(engine=ExecutionEngine)
-    def _compute_anomaly_score(cls, engine, metric_domain_kwargs, metric_value_kwargs, runtime_configuration):
-        # Implement anomaly detection logic here
-        pass
+    @metric_value(engine=PandasExecutionEngine)
+    def _pandas(cls, execution_engine, metric_domain_kwargs, metric_value_kwargs, metrics,
+                runtime_configuration):
+        df, _, accessor_domain_kwargs = execution_engine.get_compute_domain(
+            metric_domain_kwargs, domain_type=MetricDomainTypes.COLUMN
+        )
+        column = accessor_domain_kwargs['column']
+        engine = history_engine(metric_value_kwargs)
+        if metric_value_kwargs.get('filter_condition'):
+            df = df[evaluate_predicate(metric_value_kwargs['filter_condition'],
+                                       column_accessor(lambda name: df[name]), len(df))]
+        counts = df[column].value_counts(dropna=False, sort=False)
+        values = [None if pd.isna(value) else value for value in counts.index.tolist()]
+        # DATE columns held as datetime64 are keyed by date, as the warehouse returns them
+        if counts.index.dtype.kind == 'M':
+            values = as_dates(values)
+        return score_column_groups(column, values, counts.tolist(), metric_value_kwargs, engine)
 
 class ExpectColumnAnomalyScoreToBeBelowThreshold(ColumnAggregateExpectation):
+    """Expect the row count of every value of a column to stay close to its history.
+
+    dataset and table_name identify the checked table in row_count_history,
+    which is read through the checked database or history_connection_string;
+    Pandas batches need history_connection_string. filter_condition is the
+    filter of the grouping whose history is compared, as stored in
+    row_count_history; only the rows it selects are counted.
+    """
+
     metric_dependencies = ("column.anomaly_score",)
-    success_keys = ("threshold",)
+    success_keys = ("threshold", "dataset", "table_name", "historical_data_points",
+                    "minimum_data_points", "model", "history_connection_string", "filter_condition")
 
     default_kwarg_values = {
         "threshold": 0.05,
+        "historical_data_points": 7,
+        "minimum_data_points": 5,
+        "model": "mean",
+        "history_connection_string": None,
+        "filter_condition": None,
         "result_format": "SUMMARY",
     }
 
@@ -25,12 +186,15 @@ class ExpectColumnAnomalyScoreToBeBelowThreshold(ColumnAggregateExpectation):
         super().validate_configuration(configuration)
         threshold = configuration["kwargs"].get("threshold")
         assert threshold is not None, "A threshold must be provided"
+        for key in ("dataset", "table_name"):
+            assert configuration["kwargs"].get(key), f"{key} must name the table in row_count_history"
         return True
 
     def _validate(self, configuration, metrics, runtime_configuration, execution_engine):
         anomaly_score = metrics["column.anomaly_score"]
         threshold = configuration["kwargs"]["threshold"]
-        success = anomaly_score < threshold
+        # Without enough history there is nothing to compare against
+        success = anomaly_score is None or anomaly_score < threshold
         return {
             "success": success,
             "result": {"observed_value": anomaly_score},
@@ -1,9 +1,13 @@
+import hashlib
+import json
 import yaml
 import re
-from great_expectations.core.batch import BatchRequest
+from great_expectations.core.expectation_configuration import ExpectationConfiguration
 from great_expectations.data_context import DataContext
 from great_expectations.exceptions import DataContextError
 
+CHECK_KINDS = ('null_checks', 'uniqueness_checks', 'conditional_checks')
+
 def sanitize_name(name):
     """Sanitize names to be used as expectation suite names."""
     return re.sub(r'[^a-zA-Z0-9_]', '_', name)
@@ -13,105 +17,115 @@ def load_config(config_file):
     with open(config_file, 'r') as file:
         return yaml.safe_load(file)
 
-def generate_expectations_from_config(config):
-    context = DataContext()
-
-    datasource_name = "my_bigquery_datasource"  # Update if necessary
-
+def config_section_hash(table_config):
+    """Hash of the parts of a table's configuration section its suites are built from."""
+    section = {key: table_config.get(key) for key in ('dataset', 'table', 'checks')}
+    content = json.dumps(section, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def suite_name_for(dataset, table, filter_condition=None):
+    """Suite holding a table's checks with one filter; unfiltered checks keep the table's suite name."""
+    name = f"{dataset}_{table}_suite"
+    if filter_condition:
+        name += '_' + hashlib.sha256(filter_condition.encode('utf-8')).hexdigest()[:8]
+    return sanitize_name(name)
+
+def table_suites(table_config):
+    """A table's checks grouped into one suite per filter, as {suite_name: (filter, checks)}.
+
+    Checks sharing a filter are validated together against one filtered batch.
+    """
+    suites = {}
+    checks = table_config.get('checks') or {}
+    for kind in CHECK_KINDS:
+        for check in checks.get(kind) or []:
+            filter_condition = check.get('filter')
+            suite_name = suite_name_for(table_config['dataset'], table_config['table'], filter_condition)
+            suite_checks = suites.setdefault(suite_name, (filter_condition, {}))[1]
+            suite_checks.setdefault(kind, []).append(check)
+    return suites
+
+def build_expectations(checks):
+    """Expectation configurations for one suite's checks, grouped by check kind."""
+    expectations = []
+
+    # Apply null checks
+    for check in checks.get('null_checks', []):
+        mostly = 1.0 - check.get('threshold', 0.0)
+        expectations.append(ExpectationConfiguration(
+            expectation_type="expect_column_values_to_not_be_null",
+            kwargs={"column": check['column'], "mostly": mostly}
+        ))
+
+    # Apply uniqueness checks
+    for check in checks.get('uniqueness_checks', []):
+        columns = check['columns']
+        mostly = 1.0 - check.get('threshold', 0.0)
+        if len(columns) == 1:
+            expectations.append(ExpectationConfiguration(
+                expectation_type="expect_column_values_to_be_unique",
+                kwargs={"column": columns[0], "mostly": mostly}
+            ))
+        else:
+            expectations.append(ExpectationConfiguration(
+                expectation_type="expect_compound_columns_to_be_unique",
+                kwargs={"column_list": columns}
+            ))
+
+    # Apply conditional checks
+    for check in checks.get('conditional_checks', []):
+        mostly = 1.0 - check.get('threshold', 0.0)
+        expectations.append(ExpectationConfiguration(
+            expectation_type="expect_condition_to_be_true",
+            kwargs={"condition": check['condition'], "mostly": mostly, "result_format": "SUMMARY"},
+            meta={"description": check.get('description', '')}
+        ))
+    return expectations
+
+def suite_is_current(context, suite_name, config_hash):
+    """Whether a stored suite was generated from the same configuration section."""
+    try:
+        suite = context.get_expectation_suite(suite_name)
+    except DataContextError:
+        return False
+    return (suite.meta or {}).get('config_hash') == config_hash
+
+def generate_expectations_from_config(config, context=None):
+    """Write one expectation suite per table and filter, skipping unchanged table sections.
+
+    Expectations are built from the configuration without loading a batch;
+    each suite records the hash of its table's section, and suites whose
+    filter no longer appears in the configuration are removed. Returns the
+    names of the suites written.
+    """
+    if context is None:
+        context = DataContext()
+
+    existing_suites = set(context.list_expectation_suite_names())
+    written = []
     for table_config in config['tables']:
         dataset = table_config['dataset']
         table = table_config['table']
-        checks = table_config.get('checks', {})
-
-        data_asset_name = f"{dataset}.{table}"
-        suite_name = sanitize_name(f"{dataset}_{table}_suite")
-        
-        # Create or load the expectation suite
-        try:
+        config_hash = config_section_hash(table_config)
+        suites = table_suites(table_config)
+
+        # Drop suites of filters that were removed from the section
+        table_suite_pattern = re.escape(suite_name_for(dataset, table)) + r'(_[0-9a-f]{8})?'
+        for suite_name in existing_suites:
+            if re.fullmatch(table_suite_pattern, suite_name) and suite_name not in suites:
+                context.delete_expectation_suite(suite_name)
+
+        for suite_name, (filter_condition, checks) in suites.items():
+            if suite_is_current(context, suite_name, config_hash):
+                continue
             suite = context.create_expectation_suite(suite_name, overwrite_existing=True)
-        except DataContextError:
-            suite = context.get_expectation_suite(suite_name)
-        
-        # Define the batch request
-        batch_request = BatchRequest(
-            datasource_name=datasource_name,
-            data_connector_name="default_inferred_data_connector_name",
-            data_asset_name=data_asset_name,
-        )
-        
-        # Get a validator
-        validator = context.get_validator(
-            batch_request=batch_request,
-            expectation_suite_name=suite_name,
-        )
-
-        # Apply null checks
-        for check in checks.get('null_checks', []):
-            column = check['column']
-            threshold = check.get('threshold', 0.0)
-            mostly = 1.0 - threshold
-            filter_condition = check.get('filter')
-
-            if filter_condition:
-                # Apply filter using a custom SQL query
-                validator.execution_engine.engine.execute(f"SET @@session.max_execution_time=10000")
-                validator = validator.clone_with_new_batch_request(
-                    batch_request=batch_request,
-                    custom_sql=f"SELECT * FROM `{data_asset_name}` WHERE {filter_condition}"
-                )
-
-            validator.expect_column_values_to_not_be_null(
-                column,
-                mostly=mostly
-            )
-
-        # Apply uniqueness checks
-        for check in checks.get('uniqueness_checks', []):
-            columns = check['columns']
-            threshold = check.get('threshold', 0.0)
-            mostly = 1.0 - threshold
-            filter_condition = check.get('filter')
-
-            if filter_condition:
-                validator.execution_engine.engine.execute(f"SET @@session.max_execution_time=10000")
-                validator = validator.clone_with_new_batch_request(
-                    batch_request=batch_request,
-                    custom_sql=f"SELECT * FROM `{data_asset_name}` WHERE {filter_condition}"
-                )
-
-            if len(columns) == 1:
-                validator.expect_column_values_to_be_unique(
-                    column=columns[0],
-                    mostly=mostly
-                )
-            else:
-                validator.expect_compound_columns_to_be_unique(
-                    column_list=columns
-                )
-
-        # Apply conditional checks
-        for check in checks.get('conditional_checks', []):
-            condition = check['condition']
-            threshold = check.get('threshold', 0.0)
-            mostly = 1.0 - threshold
-            description = check.get('description', '')
-            filter_condition = check.get('filter')
-
-            if filter_condition:
-                validator.execution_engine.engine.execute(f"SET @@session.max_execution_time=10000")
-                validator = validator.clone_with_new_batch_request(
-                    batch_request=batch_request,
-                    custom_sql=f"SELECT * FROM `{data_asset_name}` WHERE {filter_condition}"
-                )
-
-            validator.expect_condition_to_be_true(
-                condition=condition,
-                mostly=mostly,
-                result_format="SUMMARY"
-            )
-
-        # Save the expectation suite
-        validator.save_expectation_suite()
+            for expectation in build_expectations(checks):
+                suite.add_expectation(expectation)
+            suite.meta['config_hash'] = config_hash
+            suite.meta['filter'] = filter_condition
+            context.save_expectation_suite(suite)
+            written.append(suite_name)
+    return written
 
 if __name__ == "__main__":
     config = load_config('data_quality_config.yaml')
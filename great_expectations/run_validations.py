@@ -1,19 +1,62 @@
 import os
+import threading
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from great_expectations.data_context import DataContext
 
+from generate_expectations import table_suites
+
+DATASOURCE_NAME = "my_bigquery_datasource"  # Update if necessary
+MAX_WORKERS = 4
+
 def load_config(config_file):
     with open(config_file, 'r') as file:
         return yaml.safe_load(file)
 
-def run_validations(config):
-    context = DataContext()
+def build_validation(data_asset_name, suite_name, filter_condition):
+    """Validation of one suite, against the table or one filtered batch shared by the suite's checks."""
+    if not filter_condition:
+        batch_request = {
+            "datasource_name": DATASOURCE_NAME,
+            "data_connector_name": "default_inferred_data_connector_name",
+            "data_asset_name": data_asset_name,
+        }
+    else:
+        batch_request = {
+            "datasource_name": DATASOURCE_NAME,
+            "data_connector_name": "default_runtime_data_connector_name",
+            "data_asset_name": suite_name,
+            "runtime_parameters": {
+                "query": f"SELECT * FROM `{data_asset_name}` WHERE {filter_condition}"
+            },
+            "batch_identifiers": {"default_identifier_name": suite_name},
+        }
+    return {"batch_request": batch_request, "expectation_suite_name": suite_name}
+
+def run_validations(config, context=None, max_workers=MAX_WORKERS, context_factory=DataContext):
+    """Run one checkpoint per table, with up to max_workers tables validated at once.
 
+    Checkpoints are registered on context one after another, then run on a
+    bounded thread pool; tables are independent, so their order does not
+    matter. A DataContext is not thread-safe, so each worker runs its
+    checkpoints on its own context from context_factory, which must read the
+    checkpoint store context writes to. With one worker they run on context.
+    Returns {data_asset_name: success}.
+    """
+    if context is None:
+        context = context_factory()
+
+    checkpoint_names = {}
     for table_config in config['tables']:
         dataset = table_config['dataset']
         table = table_config['table']
         data_asset_name = f"{dataset}.{table}"
-        expectation_suite_name = f"{dataset}_{table}_suite".replace('.', '_')
+        validations = [
+            build_validation(data_asset_name, suite_name, filter_condition)
+            for suite_name, (filter_condition, _) in table_suites(table_config).items()
+        ]
+        if not validations:
+            continue
 
         # Render the checkpoint configuration
         checkpoint_config = {
@@ -21,30 +64,37 @@ def run_validations(config):
             "config_version": 1.0,
             "class_name": "SimpleCheckpoint",
             "run_name_template": "%Y%m%d-%H%M%S-my-run-name-template",
-            "validations": [
-                {
-                    "batch_request": {
-                        "datasource_name": "my_bigquery_datasource",
-                        "data_connector_name": "default_inferred_data_connector_name",
-                        "data_asset_name": data_asset_name,
-                    },
-                    "expectation_suite_name": expectation_suite_name,
-                }
-            ],
+            "validations": validations,
         }
 
         # Add the checkpoint to the context
         context.add_checkpoint(**checkpoint_config)
+        checkpoint_names[data_asset_name] = checkpoint_config["name"]
+
+    workers = max(1, min(max_workers, len(checkpoint_names)))
+    worker_state = threading.local()
 
-        # Run the checkpoint
-        results = context.run_checkpoint(checkpoint_name=checkpoint_config["name"])
+    def worker_context():
+        if workers == 1:
+            return context
+        if not hasattr(worker_state, 'context'):
+            worker_state.context = context_factory()
+        return worker_state.context
+
+    def run_checkpoint(data_asset_name):
+        results = worker_context().run_checkpoint(checkpoint_name=checkpoint_names[data_asset_name])
 
         # Handle the results as needed
         if not results["success"]:
             print(f"Validation failed for {data_asset_name}")
         else:
             print(f"Validation passed for {data_asset_name}")
+        return results["success"]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        successes = list(executor.map(run_checkpoint, checkpoint_names))
+    return dict(zip(checkpoint_names, successes))
 
 if __name__ == "__main__":
     config = load_config('data_quality_config.yaml')
-    run_validations(config)
+    run_validations(config, max_workers=int(os.environ.get('GE_MAX_WORKERS', MAX_WORKERS)))
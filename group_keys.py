@@ -0,0 +1,54 @@
+import hashlib
+import json
+from datetime import datetime, time
+
+# Group values and keys of row_count_history, shared by the pipeline, the
+# in-process checks and the Great Expectations metric. Only the standard
+# library is used, so any of them can import this module.
+
+def json_default(value):
+    """Serialise dates and numpy scalars that json cannot handle natively."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def serialize_group_values(group_values):
+    """Serialise group values to the JSON string stored in row_count_history."""
+    return json.dumps(group_values, default=json_default)
+
+def canonical_group_by(columns):
+    """Grouping columns as stored in row_count_history, sorted so config order does not matter."""
+    return ','.join(sorted(columns))
+
+def group_key(group_values):
+    """Stable INT64 key of a group's values, the history tables' clustering key.
+
+    Hashed from canonical JSON (sorted keys, no whitespace) in Python rather
+    than by the warehouse, so every backend and the history migration agree.
+    """
+    canonical = json.dumps(group_values, sort_keys=True, separators=(',', ':'), default=json_default)
+    return int.from_bytes(hashlib.sha256(canonical.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+def serialize_groups(columns, column_values):
+    """Serialised group values and group keys of groups given as one value list per column."""
+    group_values_jsons, group_keys = [], []
+    for values in zip(*column_values):
+        group_values = dict(zip(columns, values))
+        group_values_jsons.append(serialize_group_values(group_values))
+        group_keys.append(group_key(group_values))
+    return group_values_jsons, group_keys
+
+def as_dates(values):
+    """A datetime column's values as dates when every one is a naive midnight.
+
+    pandas holds DATE columns as datetime64 midnights, while the warehouse
+    returns dates, which serialise (and so key) differently. NULLs (None) are
+    kept; any other column is returned unchanged.
+    """
+    present = [value for value in values if value is not None]
+    if not present or not all(isinstance(value, datetime) and value.tzinfo is None
+                              and value.time() == time() for value in present):
+        return list(values)
+    return [None if value is None else value.date() for value in values]
@@ -1,80 +1,277 @@
 import argparse
+import json
 import logging
+import sys
+import time
 from datetime import datetime
 
-from config_loader import (
-    load_config,
-    parse_null_checks,
-    parse_uniqueness_checks,
-    parse_conditional_checks,
-    parse_group_anomaly_detection
+from config_compiler import compile_config_file
+
+from execution_backends import ENGINES, create_execution_client
+from sql_dialects import client_dialect
+
+from query_planner import (
+    schedule_tasks,
+    describe_execution_plan,
+    assign_shards,
+    task_checks
 )
 
 from data_quality_checks import (
-    execute_null_checks,
-    execute_uniqueness_checks,
-    execute_conditional_checks,
-    collect_and_store_current_counts,
-    analyze_group_anomalies,
+    map_concurrently,
+    build_execution_tasks,
+    estimate_task_costs,
+    execute_task,
+    build_skipped_results,
+    finalize_sharded_run,
+    get_completed_checks,
+    get_stored_groupings,
+    grouping_key,
+    get_historical_task_durations,
     insert_results_into_bigquery,
-    record_run_metadata
+    record_run_metadata,
+    refresh_history_summaries
 )
 
-def main():
+from result_sinks import BigQuerySink, FileSink
+from query_telemetry import QueryTelemetry, write_prometheus_metrics
+from result_cache import ResultCache
+
+def end_phase(phase_seconds, phase, started):
+    """Record the wall time of a run phase and return the start of the next one."""
+    now = time.perf_counter()
+    phase_seconds[phase] = phase_seconds.get(phase, 0.0) + now - started
+    return now
+
+def finalize_run(args, client=None, sink=None):
+    """Record a sharded run once all of its shards have finished."""
+    if client is None:
+        client = create_execution_client(args.engine, 1, args.local_database)
+    if sink is None:
+        sink = FileSink(args.output_dir) if args.output_dir else BigQuerySink(client)
+    status = finalize_sharded_run(args.finalize_run, args.shard_count, client, sink)
+    logging.info(f"Sharded run {args.finalize_run} recorded with status {status}")
+    return {'run_id': args.finalize_run, 'status': status}
+
+def shard_run_day(run_id, run_date=None, start_time=None):
+    """Day whose earlier task durations every shard of a run balances its tasks by.
+
+    Taken from --run-date, else from a generated run ID (run_YYYYMMDD_HHMMSS),
+    so shards whose pods start on either side of midnight still agree. Falls
+    back to the day the shard started.
+    """
+    if run_date:
+        return datetime.strptime(run_date, '%Y-%m-%d')
+    try:
+        return datetime.strptime(run_id[:len('run_YYYYMMDD')], 'run_%Y%m%d')
+    except ValueError:
+        logging.warning(f"Run ID {run_id} has no date and --run-date is not set; balancing "
+                        f"shards by the durations before the day this shard started")
+    start_time = start_time or datetime.utcnow()
+    return start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def main(client=None, sink=None, argv=None):
+    """Run the configured checks and return a summary of the run.
+
+    Pass a client or sink to use something other than BigQuery, and argv to
+    run with arguments other than the command line's.
+    """
     parser = argparse.ArgumentParser(description='Data Quality Validation Script')
     parser.add_argument('--config', type=str, default='config.yaml', help='Path to configuration file')
     parser.add_argument('--checks', type=str, default='all', help='Checks to run (all, null_checks, uniqueness_checks, conditional_checks, anomaly_detection)')
-    args = parser.parse_args()
+    parser.add_argument('--max-concurrency', type=int, default=1, help='Maximum number of BigQuery jobs to run at once')
+    parser.add_argument('--max-bytes-per-run', type=int, default=None, help='Byte budget for the whole run (overrides the config budget)')
+    parser.add_argument('--plan-only', action='store_true', help='Print the cost-ordered execution plan and exit without running checks')
+    parser.add_argument('--engine', type=str, default='bigquery', choices=ENGINES, help='Engine to run the checks on')
+    parser.add_argument('--local-database', type=str, default=':memory:', help='DuckDB database file holding local results and history (duckdb engine)')
+    parser.add_argument('--local-data', type=str, default=None, help='Directory of <dataset>/<table>.<parquet|csv|json> files to check (duckdb engine)')
+    parser.add_argument('--local-sql', type=str, nargs='*', default=[], help='BigQuery SQL scripts, e.g. test_generator fixtures, to load first (duckdb engine)')
+    parser.add_argument('--output-dir', type=str, default=None, help='Write results as newline-delimited JSON files in this directory instead of BigQuery')
+    parser.add_argument('--no-cache', action='store_true', help='Run every check even if a stored result for an unchanged table exists')
+    parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID', help='Resume a failed run, re-running only its checks that errored or have no result')
+    parser.add_argument('--checkpoint-interval', type=float, default=60, help='Seconds between writes of completed results during the run (0 writes after every task)')
+    parser.add_argument('--shard-index', type=int, default=0, help='Index of this shard, from 0 to --shard-count - 1')
+    parser.add_argument('--shard-count', type=int, default=1, help='Number of shards sharing the run; tasks are split between them by historical duration')
+    parser.add_argument('--run-date', type=str, default=None, metavar='YYYY-MM-DD', help='Day the sharded run started; every shard balances its tasks by the durations before it')
+    parser.add_argument('--finalize-run', type=str, default=None, metavar='RUN_ID', help='Record the sharded run RUN_ID in data_quality_runs from its --shard-count shards and exit')
+    parser.add_argument('--metrics-file', type=str, default=None, help='Write per-run query metrics in the Prometheus text format to this file')
+    parser.add_argument('--plan-cache-dir', type=str, default=None, help='Directory caching compiled configurations by config hash (default: always compile)')
+    parser.add_argument('--compile-only', action='store_true', help='Validate and compile the configuration, print a summary and exit without running checks')
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error('--shard-index must be between 0 and --shard-count - 1')
+    if args.finalize_run:
+        return finalize_run(args, client, sink)
+    # Shards record themselves separately and are combined by --finalize-run
+    shard = (args.shard_index, args.shard_count) if args.shard_count > 1 else None
 
-    run_id = f"run_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    run_id = args.resume or f"run_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
     start_time = datetime.utcnow()
-    logging.info(f"Data quality validation started with run ID: {run_id}")
+    if args.resume:
+        logging.info(f"Data quality validation resumed for run ID: {run_id}")
+    else:
+        logging.info(f"Data quality validation started with run ID: {run_id}")
+    summary = {'run_id': run_id, 'status': None, 'phase_seconds': {}, 'tasks_run': 0,
+               'tasks_skipped': 0, 'tasks_cached': 0, 'tasks_resumed': 0, 'results': 0}
+    run_started = started = time.perf_counter()
+    # Job statistics of every query, written to query_telemetry with the run metadata
+    telemetry = QueryTelemetry(run_id)
     try:
-        # Load configuration
-        config = load_config(args.config)
+        # One client is shared by every query and insert in the run
+        if client is None:
+            client = create_execution_client(args.engine, args.max_concurrency, args.local_database,
+                                             args.local_data, args.local_sql)
+        dialect = client_dialect(client)
+
+        # Result and history rows are buffered for the whole run and written in bulk
+        if sink is None:
+            sink = FileSink(args.output_dir) if args.output_dir else BigQuerySink(client)
+
+        # Validate the configuration and compile its checks, with their filters and conditions
+        # translated for local engines, and their table scans; an unchanged configuration
+        # reuses the compiled plan cached by an earlier run or shard
+        compiled = compile_config_file(args.config, args.checks, dialect, args.plan_cache_dir or None)
+        started = end_phase(summary['phase_seconds'], 'setup', started)
+        if args.compile_only:
+            print(json.dumps(compiled.describe(), indent=2))
+            summary['status'] = 'compiled'
+            return summary
+
+        # Plan one task per table-scanning query: fused table scans, sketch-backed
+        # uniqueness checks and group anomaly detection
+        tasks = build_execution_tasks(compiled.table_scans, compiled.sketch_checks,
+                                      compiled.group_configs, run_id, dialect)
+
+        # Every shard assigns all tasks the same way, from the durations of earlier days' runs
+        if shard is not None:
+            run_day = shard_run_day(run_id, args.run_date, start_time)
+            task_costs = get_historical_task_durations(run_day, client=client)
+            shards = assign_shards(tasks, args.shard_count, task_costs)
+            tasks = [task for task, task_shard in zip(tasks, shards) if task_shard == args.shard_index]
+            logging.info(f"Shard {args.shard_index} of {args.shard_count} runs {len(tasks)} of "
+                         f"{len(shards)} tasks")
+
+        # A resumed run skips tasks whose checks all have a result from an earlier attempt
+        completed_checks = set()
+        if args.resume:
+            completed_checks = get_completed_checks(run_id, client)
+            remaining = [task for task in tasks if not set(task_checks(task)) <= completed_checks]
+            summary['tasks_resumed'] = len(tasks) - len(remaining)
+            logging.info(f"Resuming {run_id}: {len(completed_checks)} checks already completed, "
+                         f"{len(remaining)} of {len(tasks)} tasks left to run")
+            tasks = remaining
+            # Group counts the earlier attempt stored are not stored again, so later runs
+            # do not count this run twice in their history
+            stored_groupings = get_stored_groupings(run_id, client)
+            for task in tasks:
+                if (task['task_type'] == 'group_anomaly'
+                        and grouping_key(task['payload']) in stored_groupings):
+                    task['counts_stored'] = True
+        started = end_phase(summary['phase_seconds'], 'plan', started)
 
-        # Parse checks
-        null_checks = parse_null_checks(config) if args.checks in ['all', 'null_checks'] else []
-        uniqueness_checks = parse_uniqueness_checks(config) if args.checks in ['all', 'uniqueness_checks'] else []
-        conditional_checks = parse_conditional_checks(config) if args.checks in ['all', 'conditional_checks'] else []
-        group_configs = parse_group_anomaly_detection(config) if args.checks in ['all', 'anomaly_detection'] else []
+        # Reuse stored results of tasks whose tables are unchanged since they were cached;
+        # --no-cache still stores fresh results for later runs
+        result_cache = None
+        cache_settings = compiled.result_cache
+        if cache_settings['enabled']:
+            result_cache = ResultCache(client, cache_settings['max_age_days'],
+                                       cache_settings['disabled_tables'], lookup=not args.no_cache)
+            result_cache.prepare(tasks, args.max_concurrency)
+        started = end_phase(summary['phase_seconds'], 'cache', started)
 
-        results = []
+        # Dry-run every query that is not cached, then run the cheapest first within the byte budgets
+        estimate_task_costs([task for task in tasks if task.get('cached_rows') is None],
+                            args.max_concurrency, client, telemetry)
+        budget = dict(compiled.byte_budget)
+        if args.max_bytes_per_run is not None:
+            budget['max_bytes_per_run'] = args.max_bytes_per_run
+        runnable, skipped = schedule_tasks(tasks, **budget)
+        execution_plan = describe_execution_plan(runnable, skipped)
+        started = end_phase(summary['phase_seconds'], 'estimate', started)
+        if args.plan_only:
+            print(json.dumps(execution_plan, indent=2))
+            summary['status'] = 'planned'
+            return summary
+        summary['tasks_run'] = len(runnable)
+        summary['tasks_skipped'] = len(skipped)
+        summary['tasks_cached'] = sum(1 for task in runnable if task.get('cached_rows') is not None)
+        total_bytes = sum(task['estimated_bytes'] or 0 for task in runnable)
+        logging.info(f"Running {len(runnable)} tasks estimated at {total_bytes} bytes; "
+                     f"{len(skipped)} skipped over budget")
 
-        # Execute null checks
-        if null_checks:
-            results.extend(execute_null_checks(null_checks, run_id))
+        skipped_results = []
+        for task in skipped:
+            logging.warning(f"Skipping {task['task_type']} on {task['dataset']}.{task['table']}: "
+                            f"{task['skip_reason']}")
+            skipped_results.extend(build_skipped_results(task, run_id))
+        insert_results_into_bigquery(skipped_results, client, sink)
 
-        # Execute uniqueness checks
-        if uniqueness_checks:
-            results.extend(execute_uniqueness_checks(uniqueness_checks, run_id))
+        # Group counts are collected and analysed from the same per-run query cache,
+        # which also holds the stored rows of cached tasks
+        query_cache = {}
+        if result_cache is not None:
+            result_cache.seed(runnable, query_cache)
+        write_errors = []
 
-        # Execute conditional checks
-        if conditional_checks:
-            results.extend(execute_conditional_checks(conditional_checks, run_id))
+        def run_task(task):
+            task_results = execute_task(task, run_id, client, query_cache, sink, telemetry)
+            if completed_checks:
+                task_results = task_results.filter('check_id',
+                                                   lambda value: value not in completed_checks)
+            # Results go into the unified data_quality_results table as tasks complete and are
+            # written at least every checkpoint interval, so a resumed run can skip them
+            insert_results_into_bigquery(task_results, client, sink)
+            write_errors.extend(sink.checkpoint(args.checkpoint_interval))
+            return len(task_results) + task.get('results_written', 0)
 
-        # Collect and store current counts for anomaly detection
-        if group_configs:
-            collect_and_store_current_counts(group_configs, run_id)
+        task_result_counts = map_concurrently(run_task, runnable, args.max_concurrency)
+        summary['results'] = len(skipped_results) + sum(task_result_counts)
+        if result_cache is not None:
+            result_cache.store(runnable, query_cache, run_id, sink)
+        started = end_phase(summary['phase_seconds'], 'execute', started)
 
-            # Analyze group anomalies
-            for group_config in group_configs:
-                results.extend(analyze_group_anomalies(group_config, run_id))
+        errors = write_errors + sink.flush()
+        if errors:
+            raise Exception(f"Insertion errors: {errors}")
+        started = end_phase(summary['phase_seconds'], 'write', started)
 
-        # Insert all results into the unified data_quality_results table
-        if results:
-            insert_results_into_bigquery(results)
+        # Fold this run's group counts into the rolling summaries the next run scores against
+        if sink.queryable:
+            refresh_history_summaries([task['payload'] for task in runnable
+                                       if task['task_type'] == 'group_anomaly'], client, telemetry)
+        started = end_phase(summary['phase_seconds'], 'summarise', started)
 
         end_time = datetime.utcnow()
-        record_run_metadata(run_id, start_time, end_time, 'success')
+        record_run_metadata(run_id, start_time, end_time, 'success', client=client, sink=sink,
+                            telemetry=telemetry, shard=shard)
+        end_phase(summary['phase_seconds'], 'record_run', started)
+        summary['status'] = 'success'
         logging.info(f"Data quality validation completed successfully for run ID: {run_id}")
 
     except Exception as e:
         end_time = datetime.utcnow()
         error_message = str(e)
-        record_run_metadata(run_id, start_time, end_time, 'failure', error_message)
         logging.exception(f"Data quality validation failed for run ID: {run_id}")
+        # Without a client or sink (e.g. the engine could not be set up) there is nowhere to
+        # record the run; a failure to record it must not replace the original error
+        if client is not None or sink is not None:
+            try:
+                record_run_metadata(run_id, start_time, end_time, 'failure', error_message, client,
+                                    sink, telemetry, shard)
+            except Exception:
+                logging.exception(f"Failed to record the failure of run ID: {run_id}")
+        else:
+            logging.error(f"Run metadata not recorded for run ID {run_id}: no client was created")
         # Optionally, send notifications or alerts
+        summary['status'] = 'failure'
+        summary['error_message'] = error_message
+    summary['telemetry'] = telemetry.totals()
+    if args.metrics_file:
+        write_prometheus_metrics(args.metrics_file, telemetry, summary['status'],
+                                 time.perf_counter() - run_started)
+    return summary
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # A failed run or shard exits non-zero, so the scheduler can retry it
+    if main()['status'] == 'failure':
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import argparse
+import json
+import logging
+
+from config_compiler import compile_config_file
+from data_quality_checks import (
+    GROUP_PAGE_SIZE,
+    execute_query_pages,
+    execute_scalar_query,
+    refresh_history_summaries,
+    write_sink
+)
+from execution_backends import ENGINES, create_execution_client
+from group_keys import canonical_group_by, group_key
+from result_sinks import BigQuerySink
+from sql_dialects import client_dialect, quote_identifier, table_reference
+
+LEGACY_HISTORY_TABLE_ID = 'your_project.your_dataset.row_count_history_legacy'  # Update this
+HISTORY_TABLE_ID = 'your_project.your_dataset.row_count_history'  # Update this
+
+def migrate_row(row):
+    """Convert a legacy row_count_history row to the keyed layout."""
+    return {
+        'run_id': row['run_id'],
+        'dataset': row['dataset'],
+        'table': row['table'],
+        'group_by_columns': canonical_group_by(row['group_by_columns'].split(',')),
+        'group_key': group_key(json.loads(row['group_values'])),
+        'group_values': row['group_values'],
+        'row_count': int(row['row_count']),
+        'filter_condition': row['filter_condition'],
+        'timestamp': row['timestamp']
+    }
+
+def migrate_history(source=LEGACY_HISTORY_TABLE_ID, destination=HISTORY_TABLE_ID,
+                    page_size=GROUP_PAGE_SIZE, client=None, sink=None):
+    """Copy legacy history rows into the keyed row_count_history a page at a time.
+
+    Grouping columns are sorted and every row gets the group key the pipeline
+    now writes, computed from its stored group values. The destination must be
+    empty, so a repeated migration cannot duplicate history; after an
+    interrupted one, empty the destination and run it again. Returns the
+    number of rows copied.
+    """
+    if sink is None:
+        sink = BigQuerySink(client)
+    dialect = client_dialect(client)
+    existing = execute_scalar_query(
+        f"SELECT COUNT(*) AS row_count FROM {table_reference(destination, dialect)};", client=client
+    )['row_count']
+    if existing:
+        raise ValueError(f"{destination} already holds {existing} rows; migrate into an empty table")
+    query = f"""
+    SELECT
+      run_id,
+      dataset,
+      {quote_identifier('table', dialect)},
+      group_by_columns,
+      group_values,
+      row_count,
+      filter_condition,
+      timestamp
+    FROM {table_reference(source, dialect)};
+    """
+    copied = 0
+    for page in execute_query_pages(query, page_size, client=client):
+        sink.add(destination, [migrate_row(row) for row in page.to_dict('records')])
+        write_sink(sink)
+        copied += len(page)
+        logging.info(f"Migrated {copied} history rows into {destination}")
+    return copied
+
+def main(client=None, argv=None):
+    """Migrate the history, then refresh the rolling summaries of the configured groupings."""
+    parser = argparse.ArgumentParser(description='Migrate row_count_history to the keyed layout')
+    parser.add_argument('--config', type=str, default=None, help='Configuration whose groupings get fresh rolling summaries')
+    parser.add_argument('--source', type=str, default=LEGACY_HISTORY_TABLE_ID, help='Legacy history table')
+    parser.add_argument('--destination', type=str, default=HISTORY_TABLE_ID, help='Empty history table in the new layout')
+    parser.add_argument('--page-size', type=int, default=GROUP_PAGE_SIZE, help='History rows read and written at a time')
+    parser.add_argument('--engine', type=str, default='bigquery', choices=ENGINES, help='Engine holding the history')
+    parser.add_argument('--local-database', type=str, default=':memory:', help='DuckDB database file holding the history (duckdb engine)')
+    args = parser.parse_args(argv)
+
+    if client is None:
+        client = create_execution_client(args.engine, 1, args.local_database)
+    copied = migrate_history(args.source, args.destination, args.page_size, client)
+    refreshed = 0
+    if args.config:
+        # Filters are translated as the pipeline stored them in row_count_history
+        compiled = compile_config_file(args.config, 'anomaly_detection', client_dialect(client))
+        refreshed = refresh_history_summaries(compiled.group_configs, client)
+    logging.info(f"Migrated {copied} rows from {args.source}; refreshed {refreshed} rolling summaries")
+    return {'rows_migrated': copied, 'summaries_refreshed': refreshed}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import hashlib
+import json
+
+from sql_dialects import (
+    concat_as_string,
+    count_if,
+    dialect_option,
+    distinct_count,
+    quote_string,
+    table_reference,
+    table_sample
+)
+
+# HyperLogLog++ precision used by APPROX_COUNT_DISTINCT and HLL_COUNT.INIT
+HLL_PRECISION = 15
+
+# Per-partition partial aggregates of incremental checks
+PARTITION_STATE_TABLE = 'your_project.your_dataset.check_partition_state'  # Update this
+
+# Check types whose counts can be summed across partitions
+ADDITIVE_CHECK_TYPES = ('null_check', 'conditional_check')
+
+# Check types whose counts can be extrapolated from a table sample
+SAMPLED_CHECK_TYPES = ('null_check', 'conditional_check')
+
+SCAN_COUNT_METRICS = {
+    'null_check': 'null_count',
+    'uniqueness_check': 'unique_count',
+    'conditional_check': 'failure_count'
+}
+
+def check_id(check_type, check):
+    """Stable identifier of a check, derived from its configuration."""
+    # Compiled checks carry the identifier assigned when they were compiled
+    if check.get('check_id'):
+        return check['check_id']
+    definition = {
+        'check_type': check_type,
+        'dataset': check['dataset'],
+        'table': check['table'],
+        'column': check.get('column'),
+        'columns': check.get('columns'),
+        'condition': check.get('condition'),
+        'filter': check.get('filter')
+    }
+    digest = hashlib.sha1(json.dumps(definition, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def uses_persisted_sketch(check, dialect='bigquery'):
+    """Whether an approximate uniqueness check merges stored per-partition sketches."""
+    if not dialect_option(dialect, 'scripting'):
+        return False
+    return bool(check.get('approximate') and check.get('partition_column'))
+
+def incremental_partition_column(check_type, check, dialect='bigquery'):
+    """Partition column to scan incrementally for a check, or None for a full scan."""
+    incremental = check.get('incremental') or {}
+    if check_type in ADDITIVE_CHECK_TYPES and dialect_option(dialect, 'scripting'):
+        return incremental.get('partition_column')
+    return None
+
+def check_sample_percent(check_type, check):
+    """Percentage of the table a check samples, or None to scan all of it."""
+    percent = check.get('sample_percent')
+    if check_type not in SAMPLED_CHECK_TYPES or percent is None:
+        return None
+    if not 0 < percent <= 100:
+        raise ValueError(f"sample_percent must be in (0, 100], got {percent} for a {check_type} "
+                         f"on {check['dataset']}.{check['table']}")
+    return None if percent == 100 else percent
+
+def plan_table_scans(null_checks, uniqueness_checks, conditional_checks, dialect='bigquery'):
+    """Group parsed checks by dataset.table so each table is scanned once.
+
+    Uniqueness checks backed by persisted sketches are left out; they are
+    executed by execute_sketch_uniqueness_check instead. On tables configured
+    for incremental checks, null and conditional checks get their own plan that
+    only scans new partitions. Both need BigQuery scripting; in other dialects
+    these checks are computed by full table scans. Sampled null and conditional
+    checks share one scan per sample size; incremental scans are never sampled.
+    """
+    plans = {}
+    for check_type, checks in (('null_check', null_checks),
+                               ('uniqueness_check', uniqueness_checks),
+                               ('conditional_check', conditional_checks)):
+        for check in checks:
+            if check_type == 'uniqueness_check' and uses_persisted_sketch(check, dialect):
+                continue
+            partition_column = incremental_partition_column(check_type, check, dialect)
+            percent = None if partition_column else check_sample_percent(check_type, check)
+            key = (check['dataset'], check['table'], partition_column, percent)
+            if key not in plans:
+                plans[key] = {
+                    'dataset': check['dataset'],
+                    'table': check['table'],
+                    'partition_column': partition_column,
+                    'sample_percent': percent,
+                    'checks': []
+                }
+            plans[key]['checks'].append({'check_type': check_type, 'check': check})
+    for plan in plans.values():
+        if plan['partition_column']:
+            plan['query'] = generate_incremental_scan_query(
+                plan['dataset'], plan['table'], plan['checks'], plan['partition_column']
+            )
+        else:
+            plan['query'] = generate_table_scan_query(plan['dataset'], plan['table'], plan['checks'],
+                                                      dialect, plan['sample_percent'])
+    return list(plans.values())
+
+def scan_column_alias(index, metric):
+    """Name of the output column holding a metric for the check at index."""
+    return f"c{index}_{metric}"
+
+def _count_if(predicate, filter_condition=None, dialect='bigquery'):
+    """Count rows matching a predicate within the check's own filter."""
+    if filter_condition:
+        return count_if(f"({filter_condition}) AND ({predicate})", dialect)
+    return count_if(predicate, dialect)
+
+def generate_table_scan_expressions(index, check_type, check, dialect='bigquery'):
+    """Generate the aggregate expressions computing one check inside a table scan."""
+    filter_condition = check.get('filter')
+    total_rows = count_if(filter_condition, dialect) if filter_condition else "COUNT(*)"
+    expressions = [(total_rows, scan_column_alias(index, 'total_rows'))]
+    if check_type == 'null_check':
+        expressions.append((
+            _count_if(f"{check['column']} IS NULL", filter_condition, dialect),
+            scan_column_alias(index, 'null_count')
+        ))
+    elif check_type == 'uniqueness_check':
+        distinct_value = concat_as_string(check['columns'], dialect)
+        if filter_condition:
+            distinct_value = f"IF({filter_condition}, {distinct_value}, NULL)"
+        expressions.append((
+            distinct_count(distinct_value, check.get('approximate'), dialect),
+            scan_column_alias(index, 'unique_count')
+        ))
+    elif check_type == 'conditional_check':
+        expressions.append((
+            _count_if(f"NOT ({check['condition']})", filter_condition, dialect),
+            scan_column_alias(index, 'failure_count')
+        ))
+    else:
+        raise ValueError(f"Unsupported check type for table scan: {check_type}")
+    return expressions
+
+def _scan_select_list(checks, dialect='bigquery'):
+    """Aggregate expressions computing every check of a table scan."""
+    select_list = []
+    for index, entry in enumerate(checks):
+        for expression, alias in generate_table_scan_expressions(index, entry['check_type'],
+                                                                 entry['check'], dialect):
+            select_list.append(f"{expression} AS {alias}")
+    return select_list
+
+def _scan_filter(checks):
+    """Union of the check filters, or None when any check covers the whole table."""
+    filters = [entry['check'].get('filter') for entry in checks]
+    if filters and all(filters):
+        unique_filters = list(dict.fromkeys(filters))
+        return " OR ".join(f"({f})" for f in unique_filters)
+    return None
+
+def generate_table_scan_query(dataset, table, checks, dialect='bigquery', sample_percent=None):
+    """Generate one SQL statement computing every check on a table in a single scan.
+
+    Each check's filter is pushed into its own COUNTIF/IF expression. When every
+    check is filtered, the union of the filters is also applied as a WHERE clause
+    so partition pruning still applies. With sample_percent, only a TABLESAMPLE
+    of the table is read and the counts are those of the sample.
+    """
+    scan_filter = _scan_filter(checks)
+    where_clause = f"WHERE {scan_filter}" if scan_filter else ""
+    select_clause = ',\n      '.join(_scan_select_list(checks, dialect))
+    query = f"""
+    SELECT
+      {select_clause}
+    FROM {table_reference(f'{dataset}.{table}', dialect)} {table_sample(sample_percent, dialect)}
+    {where_clause};
+    """
+    return query
+
+def generate_incremental_scan_query(dataset, table, checks, partition_column):
+    """Generate a script that scans only new partitions and combines stored partials.
+
+    The watermark is the oldest of the checks' latest stored partitions (NULL
+    when any check has no state yet, forcing a full scan). Partials from the
+    watermark partition onwards are replaced, since the newest partition may
+    still have been filling on the previous run; the final statement sums the
+    stored partials of every check.
+    """
+    check_keys = ', '.join(quote_string(check_id(entry['check_type'], entry['check']))
+                           for entry in checks)
+    table_key = f"""dataset = {quote_string(dataset)}
+        AND table = {quote_string(table)}"""
+    partition_filter = f"DATE({partition_column}) >= IFNULL(watermark, DATE '0001-01-01')"
+    scan_filter = _scan_filter(checks)
+    if scan_filter:
+        partition_filter += f"\n        AND ({scan_filter})"
+    select_clause = ',\n          '.join(
+        [f"DATE({partition_column}) AS partition_date"] + _scan_select_list(checks)
+    )
+    partials = ',\n      '.join(
+        f"STRUCT({quote_string(check_id(entry['check_type'], entry['check']))} AS check_key, "
+        f"{scan_column_alias(index, 'total_rows')} AS total_rows, "
+        f"{scan_column_alias(index, SCAN_COUNT_METRICS[entry['check_type']])} AS metric_count)"
+        for index, entry in enumerate(checks)
+    )
+    query = f"""
+    DECLARE watermark DATE DEFAULT (
+      SELECT IF(LOGICAL_OR(state.check_watermark IS NULL), NULL, MIN(state.check_watermark))
+      FROM UNNEST([{check_keys}]) AS check_key
+      LEFT JOIN (
+        SELECT check_key, MAX(partition_date) AS check_watermark
+        FROM `{PARTITION_STATE_TABLE}`
+        WHERE {table_key}
+        GROUP BY check_key
+      ) AS state USING (check_key)
+    );
+
+    DELETE FROM `{PARTITION_STATE_TABLE}`
+    WHERE {table_key}
+        AND check_key IN ({check_keys})
+        AND partition_date >= IFNULL(watermark, DATE '0001-01-01');
+
+    INSERT INTO `{PARTITION_STATE_TABLE}`
+      (dataset, table, check_key, partition_date, total_rows, metric_count, timestamp)
+    SELECT
+      {quote_string(dataset)},
+      {quote_string(table)},
+      partial.check_key,
+      partition_date,
+      partial.total_rows,
+      partial.metric_count,
+      CURRENT_TIMESTAMP()
+    FROM (
+      SELECT
+          {select_clause}
+      FROM `{dataset}.{table}`
+      WHERE {partition_filter}
+      GROUP BY partition_date
+    ), UNNEST([
+      {partials}
+    ]) AS partial;
+
+    SELECT
+      check_key,
+      SUM(total_rows) AS total_rows,
+      SUM(metric_count) AS metric_count
+    FROM `{PARTITION_STATE_TABLE}`
+    WHERE {table_key}
+        AND check_key IN ({check_keys})
+    GROUP BY check_key;
+    """
+    return query
+
+def schedule_tasks(tasks, max_bytes_per_run=None, max_bytes_per_table=None, table_budgets=None):
+    """Order tasks cheapest first and split off those exceeding the byte budgets.
+
+    Tasks whose dry run failed have no estimate; they run last and do not count
+    against the budgets. Returns (runnable, skipped); skipped tasks carry a
+    skip_reason.
+    """
+    table_budgets = table_budgets or {}
+    ordered = sorted(tasks, key=lambda task: (task['estimated_bytes'] is None,
+                                              task['estimated_bytes'] or 0))
+    run_bytes = 0
+    table_bytes = {}
+    runnable = []
+    skipped = []
+    for task in ordered:
+        estimated_bytes = task['estimated_bytes'] or 0
+        key = (task['dataset'], task['table'])
+        table_limit = table_budgets.get(key, max_bytes_per_table)
+        if max_bytes_per_run is not None and run_bytes + estimated_bytes > max_bytes_per_run:
+            task['skip_reason'] = (f"Estimated {estimated_bytes} bytes exceeds the remaining "
+                                   f"run budget of {max_bytes_per_run - run_bytes} bytes")
+            skipped.append(task)
+        elif table_limit is not None and table_bytes.get(key, 0) + estimated_bytes > table_limit:
+            task['skip_reason'] = (f"Estimated {estimated_bytes} bytes exceeds the remaining "
+                                   f"budget of {table_limit - table_bytes.get(key, 0)} bytes "
+                                   f"for {key[0]}.{key[1]}")
+            skipped.append(task)
+        else:
+            run_bytes += estimated_bytes
+            table_bytes[key] = table_bytes.get(key, 0) + estimated_bytes
+            runnable.append(task)
+    return runnable, skipped
+
+def task_checks(task):
+    """Identifiers of the checks a task covers."""
+    payload = task['payload']
+    if task['task_type'] == 'table_scan':
+        return [check_id(entry['check_type'], entry['check']) for entry in payload['checks']]
+    if task['task_type'] == 'sketch_uniqueness':
+        return [check_id('uniqueness_check', payload)]
+    return [check_id('anomaly_detection', payload)]
+
+def task_key(task):
+    """Stable key of a task: its check ids, as recorded in query_telemetry.checks."""
+    return ','.join(task_checks(task))
+
+def assign_shards(tasks, shard_count, task_costs=None):
+    """Assign each task to one of shard_count shards, balancing their expected cost.
+
+    Tasks are placed most expensive first on the least loaded shard (ties go to
+    the lowest index). Costs are looked up by task_key; tasks without one cost
+    the median known cost. Every pod computes the same assignment from the same
+    tasks and costs. Returns the shard index of each task, in task order.
+    """
+    task_costs = task_costs or {}
+    keys = [task_key(task) for task in tasks]
+    known_costs = sorted(task_costs[key] for key in keys if key in task_costs)
+    default_cost = known_costs[len(known_costs) // 2] if known_costs else 1.0
+    costs = [task_costs.get(key, default_cost) for key in keys]
+    loads = [0.0] * shard_count
+    shards = [None] * len(tasks)
+    for index in sorted(range(len(tasks)), key=lambda index: (-costs[index], keys[index])):
+        shard = min(range(shard_count), key=lambda shard: (loads[shard], shard))
+        shards[index] = shard
+        loads[shard] += costs[index]
+    return shards
+
+def describe_execution_plan(runnable, skipped):
+    """Summarise a scheduled run as JSON-serialisable plan entries."""
+    plan = []
+    for action, tasks in (('run', runnable), ('skipped_budget', skipped)):
+        for task in tasks:
+            plan.append({
+                'task_type': task['task_type'],
+                'dataset': task['dataset'],
+                'table': task['table'],
+                'checks': task_checks(task),
+                'estimated_bytes': task['estimated_bytes'],
+                'cached': task.get('cached_rows') is not None,
+                'action': action,
+                'skip_reason': task.get('skip_reason')
+            })
+    return plan
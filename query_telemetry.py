@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+# Labels identifying the work a query belongs to, in Prometheus label order
+TELEMETRY_LABELS = ('task_type', 'dataset', 'table', 'query_kind')
+
+# Prometheus gauges aggregated per label set from the telemetry records
+PROMETHEUS_METRICS = [
+    ('dq_query_count', 'Queries executed', lambda record: 1),
+    ('dq_query_errors', 'Queries that failed after all attempts',
+     lambda record: record['status'] == 'error'),
+    ('dq_query_retries', 'Query attempts retried after server errors', lambda record: record['retries']),
+    ('dq_query_cache_hits', 'Queries answered from the BigQuery result cache',
+     lambda record: bool(record['cache_hit'])),
+    ('dq_query_bytes_processed', 'Bytes processed by queries',
+     lambda record: record['total_bytes_processed'] or 0),
+    ('dq_query_bytes_billed', 'Bytes billed for queries', lambda record: record['total_bytes_billed'] or 0),
+    ('dq_query_slot_milliseconds', 'Slot milliseconds consumed by queries',
+     lambda record: record['slot_millis'] or 0),
+    ('dq_query_duration_seconds', 'Wall time of queries including retries and result download',
+     lambda record: record['duration_ms'] / 1000.0)
+]
+
+def _milliseconds(start, end):
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds() * 1000.0
+
+def query_fingerprint(query):
+    """Short stable hash of a query's SQL text, to join telemetry with generated_sql."""
+    return hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+
+class QueryTelemetry:
+    """Collect BigQuery job statistics for every query of a run.
+
+    labelled() returns a view sharing the same records that tags what it
+    records with more labels (task, table, checks), so the collector can be
+    passed down to the code that runs each query. Recording is thread-safe.
+    """
+
+    def __init__(self, run_id, labels=None, records=None, lock=None):
+        self.run_id = run_id
+        self.labels = labels or {}
+        self._records = records if records is not None else []
+        self._lock = lock or threading.Lock()
+
+    def labelled(self, **labels):
+        """A view of this collector that adds labels to every record."""
+        return QueryTelemetry(self.run_id, dict(self.labels, **labels), self._records, self._lock)
+
+    def record(self, query, query_job=None, attempts=1, duration_seconds=None, rows_returned=None,
+               error_message=None):
+        """Record one query's outcome and the statistics of its (last) job."""
+        created = getattr(query_job, 'created', None)
+        started = getattr(query_job, 'started', None)
+        ended = getattr(query_job, 'ended', None)
+        checks = self.labels.get('checks')
+        record = {
+            'run_id': self.run_id,
+            'task_type': self.labels.get('task_type'),
+            'dataset': self.labels.get('dataset'),
+            'table': self.labels.get('table'),
+            'checks': ','.join(checks) if checks else None,
+            'query_kind': self.labels.get('query_kind', self.labels.get('task_type')),
+            'query_fingerprint': query_fingerprint(query),
+            'job_id': getattr(query_job, 'job_id', None),
+            'status': 'error' if error_message else 'success',
+            'attempts': attempts,
+            'retries': attempts - 1,
+            'total_bytes_processed': getattr(query_job, 'total_bytes_processed', None),
+            'total_bytes_billed': getattr(query_job, 'total_bytes_billed', None),
+            'slot_millis': getattr(query_job, 'slot_millis', None),
+            'cache_hit': getattr(query_job, 'cache_hit', None),
+            'queue_ms': _milliseconds(created, started),
+            'execution_ms': _milliseconds(started, ended),
+            'duration_ms': (duration_seconds or 0.0) * 1000.0,
+            'rows_returned': rows_returned,
+            'error_message': error_message,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    @property
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def totals(self):
+        """Run totals for data_quality_runs; dry runs are only counted."""
+        records = self.records
+        queries = [record for record in records if record['query_kind'] != 'dry_run']
+        return {
+            'total_queries': len(queries),
+            'total_dry_runs': len(records) - len(queries),
+            'total_bytes_processed': sum(record['total_bytes_processed'] or 0 for record in queries),
+            'total_bytes_billed': sum(record['total_bytes_billed'] or 0 for record in queries),
+            'total_slot_millis': sum(record['slot_millis'] or 0 for record in queries),
+            'total_cache_hits': sum(1 for record in queries if record['cache_hit']),
+            'total_retries': sum(record['retries'] for record in records),
+            'total_query_seconds': sum(record['duration_ms'] for record in queries) / 1000.0
+        }
+
+def store_query_telemetry(telemetry, sink):
+    """Buffer a run's telemetry records for the query_telemetry table."""
+    table_id = 'your_project.your_dataset.query_telemetry'  # Update this
+    records = telemetry.records
+    if records:
+        sink.add(table_id, records)
+    return len(records)
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def format_prometheus_metrics(telemetry, status=None, duration_seconds=None):
+    """Render a run's query telemetry in the Prometheus text exposition format.
+
+    Query metrics are summed per task type, table and query kind; the run's
+    status and duration are added when given.
+    """
+    aggregates = {}
+    for record in telemetry.records:
+        key = tuple((label, record[label] or '') for label in TELEMETRY_LABELS)
+        values = aggregates.setdefault(key, [0] * len(PROMETHEUS_METRICS))
+        for index, (_, _, value) in enumerate(PROMETHEUS_METRICS):
+            values[index] += value(record)
+
+    lines = []
+    run_label = (('run_id', telemetry.run_id),)
+    for index, (name, description, _) in enumerate(PROMETHEUS_METRICS):
+        lines.append(f"# HELP {name} {description}.")
+        lines.append(f"# TYPE {name} gauge")
+        for key, values in sorted(aggregates.items()):
+            lines.append(f"{name}{_format_labels(run_label + key)} {_format_value(values[index])}")
+    if status is not None:
+        lines.append("# HELP dq_run_success Whether the data quality run succeeded.")
+        lines.append("# TYPE dq_run_success gauge")
+        lines.append(f"dq_run_success{_format_labels(run_label)} {int(status == 'success')}")
+    if duration_seconds is not None:
+        lines.append("# HELP dq_run_duration_seconds Wall time of the data quality run.")
+        lines.append("# TYPE dq_run_duration_seconds gauge")
+        lines.append(f"dq_run_duration_seconds{_format_labels(run_label)} {_format_value(duration_seconds)}")
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus_metrics(path, telemetry, status=None, duration_seconds=None):
+    """Write the metrics file atomically, as textfile collectors expect."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as file:
+        file.write(format_prometheus_metrics(telemetry, status, duration_seconds))
+    os.replace(temporary_path, path)
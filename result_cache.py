@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime, timedelta
+
+from data_quality_checks import execute_query_with_retries, map_concurrently
+from group_keys import json_default
+from sql_dialects import client_dialect, quote_string, table_reference
+
+# Only these tasks are pure functions of their table; incremental scans and
+# sketch checks also maintain state in BigQuery and always run, and streamed
+# group counts are too large to store
+CACHEABLE_TASK_TYPES = ('table_scan', 'group_anomaly')
+
+# Functions whose value changes between runs on an unchanged table, e.g. a
+# filter on the last 30 days; like BigQuery's own cache, queries calling them
+# are never cached
+NON_DETERMINISTIC_SQL = re.compile(
+    r'\bCURRENT_(?:DATE|DATETIME|TIME|TIMESTAMP)\b'
+    r'|\b(?:NOW|RAND|RANDOM|GENERATE_UUID|GEN_RANDOM_UUID|UUID|SESSION_USER|TODAY)\s*\(',
+    re.IGNORECASE
+)
+
+def is_deterministic(query):
+    """Whether a query returns the same rows whenever its tables are unchanged."""
+    return NON_DETERMINISTIC_SQL.search(query) is None
+
+def fetch_table_metadata(dataset, table, client):
+    """Last modification time and row count of a table, or None if it cannot be trusted.
+
+    Views, external tables and tables with rows still in the streaming buffer
+    do not reflect all changes in their metadata, so they are never cached.
+    """
+    get_table = getattr(client, 'get_table', None)
+    if get_table is None:
+        return None
+    try:
+        table_info = get_table(f"{dataset}.{table}")
+    except Exception as e:
+        logging.warning(f"Could not read metadata of {dataset}.{table}: {e}")
+        return None
+    if (getattr(table_info, 'table_type', 'TABLE') != 'TABLE'
+            or getattr(table_info, 'streaming_buffer', None) is not None
+            or table_info.modified is None):
+        return None
+    return {'last_modified_time': table_info.modified, 'num_rows': table_info.num_rows}
+
+def result_cache_key(query, metadata):
+    """Key of a query's result for one version of its table."""
+    definition = [query, metadata['last_modified_time'].isoformat(), metadata['num_rows']]
+    return hashlib.sha1(json.dumps(definition).encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """Reuse query results from earlier runs for tables that have not changed.
+
+    A task's result rows are stored in the check_result_cache table, keyed on
+    the hash of its SQL and the table's last_modified_time and row count.
+    Cached rows are placed in the run's query cache, so checks are evaluated
+    (thresholds included) exactly as if the query had run.
+    """
+
+    def __init__(self, client, max_age_days=30, disabled_tables=None, lookup=True):
+        self.client = client
+        self.max_age_days = max_age_days
+        self.disabled_tables = set(disabled_tables or [])
+        self.lookup = lookup
+        self.table_id = 'your_project.your_dataset.check_result_cache'  # Update this
+
+    def prepare(self, tasks, max_concurrency=1):
+        """Key every cacheable task and mark the ones with a stored result as cached.
+
+        Cached tasks get their stored rows in task['cached_rows'] and an
+        estimated cost of zero bytes.
+        """
+        candidates = [task for task in tasks
+                      if task['task_type'] in CACHEABLE_TASK_TYPES
+                      and not task['payload'].get('partition_column')
+                      and not task['payload'].get('streaming')
+                      and is_deterministic(task['query'])
+                      and (task['dataset'], task['table']) not in self.disabled_tables]
+        tables = sorted({(task['dataset'], task['table']) for task in candidates})
+        metadata = dict(zip(tables, map_concurrently(
+            lambda key: fetch_table_metadata(key[0], key[1], self.client), tables, max_concurrency
+        )))
+        for task in candidates:
+            table_metadata = metadata[(task['dataset'], task['table'])]
+            if table_metadata is not None:
+                task['cache_key'] = result_cache_key(task['query'], table_metadata)
+                task['table_metadata'] = table_metadata
+
+        keyed = [task for task in candidates if task.get('cache_key')]
+        entries = self.load([task['cache_key'] for task in keyed]) if self.lookup and keyed else {}
+        for task in keyed:
+            if task['cache_key'] in entries:
+                task['cached_rows'] = entries[task['cache_key']]
+                task['estimated_bytes'] = 0
+        logging.info(f"Result cache: {len(entries)} of {len(candidates)} cacheable tasks "
+                     f"reuse stored results; {len(candidates) - len(keyed)} tables without "
+                     f"reliable metadata")
+        return tasks
+
+    def load(self, cache_keys):
+        """Stored result rows per cache key, the newest entry of each key within max_age_days."""
+        dialect = client_dialect(self.client)
+        cutoff = (datetime.utcnow() - timedelta(days=self.max_age_days)).isoformat()
+        keys = ', '.join(quote_string(key, dialect) for key in sorted(set(cache_keys)))
+        query = f"""
+        SELECT
+          cache_key,
+          result
+        FROM (
+          SELECT
+            cache_key,
+            result,
+            ROW_NUMBER() OVER (PARTITION BY cache_key ORDER BY timestamp DESC) AS recency
+          FROM {table_reference(self.table_id, dialect)}
+          WHERE timestamp >= {quote_string(cutoff, dialect)}
+            AND cache_key IN ({keys})
+        )
+        WHERE recency = 1;
+        """
+        try:
+            rows = execute_query_with_retries(query, client=self.client, as_dataframe=False)
+        except Exception as e:
+            logging.warning(f"Could not read the result cache, running every check: {e}")
+            return {}
+        return {row['cache_key']: json.loads(row['result']) for row in rows}
+
+    def seed(self, tasks, query_cache):
+        """Place the stored rows of cached tasks in the run's query cache, as execution reads them."""
+        for task in tasks:
+            rows = task.get('cached_rows')
+            if rows is None:
+                continue
+            # Group counts are read as DataFrames, table scans as lists of dicts
+            if task['task_type'] == 'group_anomaly':
+                import pandas as pd
+
+                rows = pd.DataFrame(rows, columns=task['payload']['columns'] + ['row_count'])
+            query_cache[task['query']] = rows
+
+    def store(self, tasks, query_cache, run_id, sink):
+        """Buffer the results of keyed tasks that ran successfully in this run."""
+        entries = []
+        for task in tasks:
+            if not task.get('cache_key') or task.get('cached_rows') is not None:
+                continue
+            result = query_cache.get(task['query'])
+            if result is None:
+                continue
+            rows = result.to_dict('records') if hasattr(result, 'to_dict') else result
+            entries.append({
+                'cache_key': task['cache_key'],
+                'dataset': task['dataset'],
+                'table': task['table'],
+                'task_type': task['task_type'],
+                'last_modified_time': task['table_metadata']['last_modified_time'],
+                'num_rows': task['table_metadata']['num_rows'],
+                'result': json.dumps(rows, default=json_default),
+                'run_id': run_id,
+                'timestamp': datetime.utcnow().isoformat() + 'Z'
+            })
+        if entries:
+            sink.add(self.table_id, entries)
+        return len(entries)
@@ -0,0 +1,158 @@
+from result_sinks import to_json_value
+
+# Columns of data_quality_results, in table order
+RESULT_FIELDS = (
+    'run_id', 'check_id', 'dataset', 'table', 'check_type', 'check_name', 'columns', 'condition',
+    'group_by_columns', 'group_values', 'threshold', 'metric_name', 'metric_value', 'expected_value',
+    'total_rows', 'status', 'filter_condition', 'generated_sql', 'error_message', 'error_bound',
+    'estimated_bytes', 'cached', 'sample_percent', 'sample_rows', 'confidence_lower',
+    'confidence_upper', 'timestamp'
+)
+
+RESULT_DEFAULTS = {'cached': False}
+
+class CheckResult:
+    """One data_quality_results row, read and updated like a dict.
+
+    Fields live in __slots__, so a row costs a fraction of the equivalent dict;
+    setting a column the table does not have raises KeyError.
+    """
+
+    __slots__ = RESULT_FIELDS
+
+    def __init__(self, **fields):
+        for name in RESULT_FIELDS:
+            setattr(self, name, fields.get(name, RESULT_DEFAULTS.get(name)))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in RESULT_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in RESULT_FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return RESULT_FIELDS
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in RESULT_FIELDS]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"CheckResult({self.to_dict()!r})"
+
+class ResultBatch:
+    """data_quality_results rows stored column by column.
+
+    Values shared by many rows (run, check, table, timestamp) are stored as
+    references to one object, and each distinct generated SQL text is kept
+    once in sql_texts and referenced by its index. Memory therefore grows with
+    the number of distinct values rather than with per-row dicts. Sinks buffer
+    batches as they are and convert them with json_rows() when writing.
+    """
+
+    __slots__ = ('columns', 'sql_texts', '_sql_ids')
+
+    def __init__(self, records=()):
+        self.columns = {name: [] for name in RESULT_FIELDS}
+        self.sql_texts = []
+        self._sql_ids = {}
+        self.extend(records)
+
+    def __len__(self):
+        return len(self.columns['run_id'])
+
+    def intern_sql(self, query):
+        """Index of a SQL text in sql_texts, adding it the first time it is seen."""
+        if query is None:
+            return None
+        sql_id = self._sql_ids.get(query)
+        if sql_id is None:
+            sql_id = self._sql_ids[query] = len(self.sql_texts)
+            self.sql_texts.append(query)
+        return sql_id
+
+    def append(self, record):
+        """Append one row from a CheckResult or result dict."""
+        for name in RESULT_FIELDS:
+            value = record.get(name, RESULT_DEFAULTS.get(name))
+            self.columns[name].append(self.intern_sql(value) if name == 'generated_sql' else value)
+
+    def add_rows(self, count, **values):
+        """Append count rows at once.
+
+        List values hold one value per row; any other value is shared by all
+        count rows, and unset columns take their default.
+        """
+        for name in RESULT_FIELDS:
+            value = values.get(name, RESULT_DEFAULTS.get(name))
+            if name == 'generated_sql':
+                value = self.intern_sql(value)
+            if isinstance(value, list):
+                if len(value) != count:
+                    raise ValueError(f"Column {name} has {len(value)} values for {count} rows")
+                self.columns[name].extend(value)
+            else:
+                self.columns[name].extend([value] * count)
+
+    def extend(self, records):
+        """Append the rows of another batch or an iterable of rows."""
+        if not isinstance(records, ResultBatch):
+            for record in records:
+                self.append(record)
+            return
+        sql_ids = [self.intern_sql(query) for query in records.sql_texts]
+        for name in RESULT_FIELDS:
+            column = records.columns[name]
+            if name == 'generated_sql':
+                column = [None if sql_id is None else sql_ids[sql_id] for sql_id in column]
+            self.columns[name].extend(column)
+
+    def fill(self, name, value):
+        """Set one column to the same value in every row."""
+        if name == 'generated_sql':
+            value = self.intern_sql(value)
+        self.columns[name] = [value] * len(self)
+
+    def filter(self, name, predicate):
+        """A new batch of the rows whose value in column name satisfies predicate."""
+        keep = [index for index, value in enumerate(self.columns[name]) if predicate(value)]
+        batch = ResultBatch()
+        batch.sql_texts = list(self.sql_texts)
+        batch._sql_ids = dict(self._sql_ids)
+        for column_name, column in self.columns.items():
+            batch.columns[column_name] = [column[index] for index in keep]
+        return batch
+
+    def record(self, index):
+        """Row index as a CheckResult."""
+        fields = {name: column[index] for name, column in self.columns.items()}
+        if fields['generated_sql'] is not None:
+            fields['generated_sql'] = self.sql_texts[fields['generated_sql']]
+        return CheckResult(**fields)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def json_rows(self):
+        """Yield the rows as dicts of plain JSON values, the format sinks write."""
+        columns = list(self.columns.items())
+        sql_texts = self.sql_texts
+        for index in range(len(self)):
+            row = {name: to_json_value(column[index]) for name, column in columns}
+            if row['generated_sql'] is not None:
+                row['generated_sql'] = sql_texts[row['generated_sql']]
+            yield row
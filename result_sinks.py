@@ -0,0 +1,230 @@
+import copy
+import io
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from group_keys import json_default
+
+# BigQuery streaming inserts accept at most 10MB and 50,000 rows per request
+MAX_BATCH_BYTES = 9 * 1024 * 1024
+MAX_BATCH_ROWS = 10000
+
+# Above this many buffered rows for one table a single load job is used instead
+LOAD_JOB_MIN_ROWS = 100000
+
+def to_json_value(value):
+    """Convert a row value to a plain JSON value; NaN and infinity become NULL."""
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return to_json_value(value.item())
+    return value
+
+def to_json_row(row):
+    """Convert every value of a row to a plain JSON value."""
+    return {key: to_json_value(value) for key, value in row.items()}
+
+def iter_rows(parts):
+    """Rows of buffered parts, converting columnar batches as they are reached."""
+    for part in parts:
+        yield from (part.json_rows() if hasattr(part, 'json_rows') else part)
+
+def iter_row_chunks(parts, size):
+    """Rows of buffered parts in lists of at most size rows."""
+    chunk = []
+    for row in iter_rows(parts):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class ResultSink:
+    """Buffer rows per destination table across a run and write them on flush."""
+
+    # Whether written rows can be read back by queries on the run's client
+    queryable = False
+
+    def __init__(self):
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def spawn(self):
+        """An empty sink writing where this one does, for work that flushes its own rows.
+
+        Rows buffered in either sink, and the errors of writing them, stay
+        with that sink.
+        """
+        sink = copy.copy(self)
+        ResultSink.__init__(sink)
+        return sink
+
+    def add(self, table_id, rows):
+        """Buffer rows for a destination table.
+
+        Columnar batches (anything with a json_rows method, like ResultBatch)
+        are buffered as they are and only turned into rows when written.
+        """
+        if not hasattr(rows, 'json_rows'):
+            rows = [to_json_row(row) for row in rows]
+        with self._lock:
+            self._buffers.setdefault(table_id, []).append(rows)
+
+    def flush(self):
+        """Write every buffered row and return the rows that could not be written."""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            self._last_flush = time.monotonic()
+        errors = []
+        for table_id, parts in buffers.items():
+            row_count = sum(len(part) for part in parts)
+            if row_count:
+                errors.extend(self.write_parts(table_id, parts, row_count))
+        return errors
+
+    def write_parts(self, table_id, parts, row_count):
+        """Write a table's buffered parts in chunks of at most MAX_BATCH_ROWS rows.
+
+        Columnar batches are converted to rows one chunk at a time, so a flush
+        never holds all of a table's rows as dicts at once.
+        """
+        errors = []
+        for rows in iter_row_chunks(parts, MAX_BATCH_ROWS):
+            errors.extend(self.write(table_id, rows))
+        return errors
+
+    def checkpoint(self, interval):
+        """Flush if at least interval seconds have passed since the last flush.
+
+        Lets a long run persist its progress periodically while still writing
+        in batches. Returns the rows that could not be written.
+        """
+        with self._lock:
+            if time.monotonic() - self._last_flush < interval:
+                return []
+            # Claim this checkpoint so concurrent callers do not flush as well
+            self._last_flush = time.monotonic()
+        return self.flush()
+
+    def write(self, table_id, rows):
+        """Write rows to a destination table, returning per-row errors."""
+        raise NotImplementedError
+
+class BigQuerySink(ResultSink):
+    """Write buffered rows to BigQuery in size-bounded streaming batches.
+
+    Large volumes for a table are written with a single newline-delimited JSON
+    load job instead. When a streaming batch is rejected its rows are retried
+    one by one, so a single bad row does not lose the rest of the batch.
+    """
+
+    queryable = True
+
+    def __init__(self, client, max_batch_rows=MAX_BATCH_ROWS, max_batch_bytes=MAX_BATCH_BYTES,
+                 load_job_min_rows=LOAD_JOB_MIN_ROWS):
+        super().__init__()
+        self.client = client
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_bytes = max_batch_bytes
+        self.load_job_min_rows = load_job_min_rows
+
+    def write_parts(self, table_id, parts, row_count):
+        if self.load_job_min_rows and row_count >= self.load_job_min_rows:
+            return self._load(table_id, iter_rows(parts))
+        errors = []
+        for rows in iter_row_chunks(parts, self.max_batch_rows):
+            errors.extend(self.write(table_id, rows))
+        return errors
+
+    def write(self, table_id, rows):
+        if self.load_job_min_rows and len(rows) >= self.load_job_min_rows:
+            return self._load(table_id, rows)
+        errors = []
+        for batch in self._batches(rows):
+            errors.extend(self._stream(table_id, batch))
+        if not errors:
+            logging.info(f"{len(rows)} rows successfully inserted into {table_id}.")
+        return errors
+
+    def _batches(self, rows):
+        """Split rows into batches within the streaming request limits."""
+        batch = []
+        batch_bytes = 0
+        for row in rows:
+            row_bytes = len(json.dumps(row, default=json_default))
+            if batch and (len(batch) >= self.max_batch_rows
+                          or batch_bytes + row_bytes > self.max_batch_bytes):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(row)
+            batch_bytes += row_bytes
+        if batch:
+            yield batch
+
+    def _stream(self, table_id, batch):
+        """Stream one batch, retrying the rows of a rejected batch individually."""
+        errors = self.client.insert_rows_json(table_id, batch)
+        if not errors:
+            return []
+        logging.warning(f"Streaming insert into {table_id} rejected; retrying {len(batch)} rows individually.")
+        row_errors = []
+        for row in batch:
+            for error in self.client.insert_rows_json(table_id, [row]):
+                row_errors.append({'table_id': table_id, 'row': row, 'errors': error.get('errors')})
+        if row_errors:
+            logging.error(f"Failed to insert {len(row_errors)} rows into {table_id}: {row_errors}")
+        return row_errors
+
+    def _load(self, table_id, rows):
+        """Write rows with one newline-delimited JSON load job."""
+        from google.cloud import bigquery
+
+        # Rows are encoded as they are reached, so only the file contents are held at once
+        data = io.BytesIO()
+        row_count = 0
+        for row in rows:
+            data.write(json.dumps(row, default=json_default).encode('utf-8') + b'\n')
+            row_count += 1
+        data.seek(0)
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+        )
+        try:
+            load_job = self.client.load_table_from_file(data, table_id, job_config=job_config)
+            load_job.result()
+        except Exception as e:
+            logging.error(f"Load job into {table_id} failed: {e}")
+            return [{'table_id': table_id, 'row': None, 'errors': str(e)}]
+        logging.info(f"{row_count} rows loaded into {table_id}.")
+        return []
+
+class FileSink(ResultSink):
+    """Append buffered rows to one newline-delimited JSON file per table in a local directory."""
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def path_for(self, table_id):
+        """Local file holding the rows written to a table."""
+        return os.path.join(self.directory, f"{table_id}.ndjson")
+
+    def write(self, table_id, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path_for(table_id), 'a') as file:
+            for row in rows:
+                file.write(json.dumps(row, default=json_default) + '\n')
+        logging.info(f"{len(rows)} rows written to {self.path_for(table_id)}.")
+        return []
@@ -0,0 +1,210 @@
+import re
+
+# SQL dialects the generated queries can be rendered in. BigQuery scripting
+# (DECLARE, HLL_COUNT sketches) is only available on BigQuery, so incremental
+# checks and persisted sketches fall back to full scans elsewhere.
+SQL_DIALECTS = {
+    'bigquery': {
+        'identifier_quote': '`',
+        'string_type': 'STRING',
+        'count_if': 'COUNTIF',
+        'approx_count_distinct': 'APPROX_COUNT_DISTINCT',
+        'table_sample_method': 'SYSTEM',
+        'scripting': True
+    },
+    'duckdb': {
+        'identifier_quote': '"',
+        'string_type': 'VARCHAR',
+        'count_if': 'COUNT_IF',
+        'approx_count_distinct': 'APPROX_COUNT_DISTINCT',
+        'table_sample_method': 'BERNOULLI',
+        'scripting': False
+    }
+}
+
+def client_dialect(client):
+    """SQL dialect understood by a client; BigQuery unless the client declares another."""
+    return getattr(client, 'dialect', 'bigquery')
+
+def dialect_option(dialect, option):
+    """Look up one setting of a dialect."""
+    if dialect not in SQL_DIALECTS:
+        raise ValueError(f"Unsupported SQL dialect: {dialect}")
+    return SQL_DIALECTS[dialect][option]
+
+def quote_string(value, dialect='bigquery'):
+    """Quote a Python string as a string literal."""
+    if dialect == 'bigquery':
+        return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+def quote_identifier(name, dialect='bigquery'):
+    """Quote a column name, e.g. the reserved word table."""
+    quote = dialect_option(dialect, 'identifier_quote')
+    return f"{quote}{name}{quote}"
+
+def table_reference(table_id, dialect='bigquery'):
+    """Reference a dataset.table (or project.dataset.table) id in a FROM clause.
+
+    Local engines have no project, so only the dataset (as schema) and table
+    parts are kept.
+    """
+    if dialect == 'bigquery':
+        return f"`{table_id}`"
+    return '.'.join(quote_identifier(part, dialect) for part in table_id.split('.')[-2:])
+
+def count_if(predicate, dialect='bigquery'):
+    """Count the rows matching a predicate."""
+    return f"{dialect_option(dialect, 'count_if')}({predicate})"
+
+def concat_as_string(columns, dialect='bigquery'):
+    """Concatenate columns cast to strings; NULL when any column is NULL."""
+    string_type = dialect_option(dialect, 'string_type')
+    cast_columns = [f'CAST({col} AS {string_type})' for col in columns]
+    if dialect == 'bigquery':
+        return f"CONCAT({', '.join(cast_columns)})"
+    # DuckDB's CONCAT skips NULLs, while || propagates them like BigQuery's CONCAT
+    return '(' + ' || '.join(cast_columns) + ')'
+
+def table_sample(sample_percent, dialect='bigquery'):
+    """TABLESAMPLE clause reading about sample_percent of a table, or nothing for a full scan.
+
+    BigQuery samples storage blocks; DuckDB samples rows, since its blocks are
+    too large for small local tables.
+    """
+    if not sample_percent:
+        return ""
+    return f"TABLESAMPLE {dialect_option(dialect, 'table_sample_method')} ({sample_percent:g} PERCENT)"
+
+def distinct_count(expression, approximate=False, dialect='bigquery'):
+    """Exact or approximate count of distinct non-NULL values."""
+    if approximate:
+        return f"{dialect_option(dialect, 'approx_count_distinct')}({expression})"
+    return f"COUNT(DISTINCT {expression})"
+
+# BigQuery literals, quoted identifiers and comments, which are translated
+# separately from the surrounding code
+_BIGQUERY_TOKEN = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`|--[^\n]*""")
+
+_BIGQUERY_TYPES = {
+    'INT64': 'BIGINT',
+    'FLOAT64': 'DOUBLE',
+    'STRING': 'VARCHAR',
+    'BYTES': 'BLOB',
+    'NUMERIC': 'DECIMAL(38, 9)'
+}
+
+_BIGQUERY_FUNCTIONS = {
+    'GENERATE_UUID': 'gen_random_uuid',
+    'GENERATE_ARRAY': 'generate_series',
+    'RAND': 'random'
+}
+
+def _unescape_bigquery_string(literal):
+    """Value of a BigQuery single- or double-quoted string literal."""
+    return re.sub(r'\\(.)', r'\1', literal[1:-1])
+
+def _split_call(sql, open_index):
+    """Split the arguments of the call whose parenthesis opens at open_index.
+
+    Returns (arguments, index after the closing parenthesis).
+    """
+    depth = 0
+    arguments = []
+    start = open_index + 1
+    for index in range(open_index, len(sql)):
+        char = sql[index]
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                arguments.append(sql[start:index].strip())
+                return arguments, index + 1
+        elif char == ',' and depth == 1:
+            arguments.append(sql[start:index].strip())
+            start = index + 1
+    raise ValueError("Unbalanced parentheses in SQL")
+
+def _rewrite_date_arithmetic(sql):
+    """Rewrite DATE_ADD/DATE_SUB(date, INTERVAL n UNIT) as DuckDB interval arithmetic."""
+    pattern = re.compile(r'\bDATE_(ADD|SUB)\s*\(', re.IGNORECASE)
+    match = pattern.search(sql)
+    while match:
+        arguments, end = _split_call(sql, match.end() - 1)
+        interval = re.match(r'INTERVAL\s+(.+)\s+(\w+)$', arguments[1], re.IGNORECASE | re.DOTALL)
+        operator = '+' if match.group(1).upper() == 'ADD' else '-'
+        replacement = (f"CAST(({arguments[0]}) {operator} INTERVAL ({interval.group(1)}) "
+                       f"{interval.group(2)} AS DATE)")
+        sql = sql[:match.start()] + replacement + sql[end:]
+        match = pattern.search(sql, match.start() + len(replacement))
+    return sql
+
+def _name_unnest_columns(sql):
+    """Rewrite UNNEST(...) AS x as UNNEST(...) AS x(x).
+
+    In DuckDB the alias only names the table, so x would be a struct rather
+    than the array element it is in BigQuery.
+    """
+    pattern = re.compile(r'\bUNNEST\s*\(', re.IGNORECASE)
+    match = pattern.search(sql)
+    while match:
+        _, end = _split_call(sql, match.end() - 1)
+        alias = re.match(r'(\s+AS\s+)(\w+)\b(?!\s*\()', sql[end:], re.IGNORECASE)
+        if alias:
+            named = f"{alias.group(1)}{alias.group(2)}({alias.group(2)})"
+            sql = sql[:end] + named + sql[end + alias.end():]
+        match = pattern.search(sql, end)
+    return sql
+
+def _translate_bigquery_code(code):
+    """Translate BigQuery SQL with its literals already replaced by placeholders."""
+    code = _rewrite_date_arithmetic(code)
+    for bigquery_function, duckdb_function in _BIGQUERY_FUNCTIONS.items():
+        code = re.sub(rf'\b{bigquery_function}\s*\(', f'{duckdb_function}(', code, flags=re.IGNORECASE)
+    code = _name_unnest_columns(code)
+    # DDL column names may be reserved words in DuckDB (e.g. table)
+    type_names = '|'.join(list(_BIGQUERY_TYPES) + ['DATE', 'TIMESTAMP', 'BOOL'])
+    code = re.sub(rf'^(\s*)(\w+)(\s+(?:{type_names})\b)', r'\1"\2"\3', code, flags=re.MULTILINE)
+    for bigquery_type, duckdb_type in _BIGQUERY_TYPES.items():
+        code = re.sub(rf'\b{bigquery_type}\b', duckdb_type, code)
+    # Table partitioning and clustering have no DuckDB equivalent
+    code = re.sub(r'\)\s*(?:(?:PARTITION|CLUSTER)\s+BY\s+[^;]*?)+(?=;|$)', ')', code)
+    return code
+
+def translate_bigquery_sql(sql, dialect='duckdb'):
+    """Translate BigQuery SQL (DDL fixtures, config filters and conditions) to another dialect.
+
+    Covers the subset of BigQuery used by this project: string literals and
+    backtick table references, DATE_ADD/DATE_SUB, GENERATE_ARRAY/UNNEST, RAND,
+    GENERATE_UUID, the scalar types and CREATE TABLE partitioning options.
+    """
+    if dialect == 'bigquery':
+        return sql
+    tokens = []
+
+    def placeholder(match):
+        token = match.group(0)
+        if token[0] in '\'"':
+            tokens.append(quote_string(_unescape_bigquery_string(token), dialect))
+        elif token[0] == '`':
+            tokens.append(table_reference(token[1:-1], dialect))
+        else:
+            tokens.append(token)
+        return f"\x00{len(tokens) - 1}\x00"
+
+    code = _translate_bigquery_code(_BIGQUERY_TOKEN.sub(placeholder, sql))
+    return re.sub(r'\x00(\d+)\x00', lambda match: tokens[int(match.group(1))], code)
+
+def translate_checks(checks, dialect='bigquery'):
+    """Translate the BigQuery filters and conditions written in check configs to a dialect."""
+    if dialect == 'bigquery':
+        return checks
+    translated = []
+    for check in checks:
+        check = dict(check)
+        for key in ('filter', 'condition'):
+            if check.get(key):
+                check[key] = translate_bigquery_sql(check[key], dialect)
+        translated.append(check)
+    return translated
@@ -0,0 +1,500 @@
+import operator
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Compiles the BigQuery SQL conditions and filters written in config.yaml into
+# vectorised evaluators over in-memory columns. An evaluator takes a column
+# accessor and returns (values, nulls): values is a pandas Series or a scalar,
+# nulls a boolean NumPy array or False. Boolean results follow SQL three-valued
+# logic, so a NULL condition is neither counted as passing nor failing.
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<number>\d+\.\d*|\.\d+|\d+)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<identifier>`[^`]+`|[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<operator><=|>=|<>|!=|=|<|>|\+|-|\*|/|\(|\)|,)
+  | (?P<space>\s+)
+""", re.VERBOSE)
+
+_COMPARISONS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge
+}
+
+_ARITHMETIC = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv
+}
+
+_INTERVAL_UNITS = {
+    'MICROSECOND': 'us',
+    'MILLISECOND': 'ms',
+    'SECOND': 's',
+    'MINUTE': 'min',
+    'HOUR': 'h',
+    'DAY': 'D',
+    'WEEK': 'W'
+}
+
+_CAST_TYPES = ('STRING', 'INT64', 'FLOAT64', 'NUMERIC', 'BOOL', 'DATE', 'TIMESTAMP')
+
+_compiled_expressions = {}
+
+def tokenize(expression):
+    """Split a SQL expression into (kind, text) tokens."""
+    tokens = []
+    position = 0
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ValueError(f"Unsupported syntax in expression at: {expression[position:]}")
+        if match.lastgroup != 'space':
+            tokens.append((match.lastgroup, match.group()))
+        position = match.end()
+    return tokens
+
+def _is_null(nulls):
+    return nulls is not False
+
+def _union_nulls(*nulls_list):
+    """Rows that are NULL in any operand."""
+    union = False
+    for nulls in nulls_list:
+        if nulls is not False:
+            union = nulls if union is False else union | nulls
+    return union
+
+def _as_bool_array(values):
+    """A Series or scalar boolean result as a NumPy bool array (or bool scalar)."""
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype=bool, na_value=False)
+    return bool(values)
+
+def _normalise_column(series):
+    """Make date columns comparable with DATE literals, leaving other columns untouched."""
+    if series.dtype == object:
+        first = series.dropna()[:1]
+        if len(first) and hasattr(first.iloc[0], 'isoformat') and not isinstance(first.iloc[0], str):
+            return pd.to_datetime(series)
+    return series
+
+def _literal(value):
+    return lambda columns: (value, False)
+
+def _column(name):
+    def evaluate(columns):
+        return columns(name)
+    return evaluate
+
+def _comparison(op, left, right):
+    def evaluate(columns):
+        left_values, left_nulls = left(columns)
+        right_values, right_nulls = right(columns)
+        if left_values is None or right_values is None:
+            return False, True
+        return (_as_bool_array(op(left_values, right_values)),
+                _union_nulls(left_nulls, right_nulls))
+    return evaluate
+
+def _arithmetic(op, left, right):
+    def evaluate(columns):
+        left_values, left_nulls = left(columns)
+        right_values, right_nulls = right(columns)
+        if left_values is None or right_values is None:
+            return None, True
+        return op(left_values, right_values), _union_nulls(left_nulls, right_nulls)
+    return evaluate
+
+def _negate(operand):
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        return (None if values is None else -values), nulls
+    return evaluate
+
+def _boolean_operand(operand, columns):
+    """A boolean operand's (values, nulls), with a NULL literal as an all-NULL operand."""
+    values, nulls = operand(columns)
+    if values is None:
+        return False, True
+    return values, nulls
+
+def _logical_not(operand):
+    def evaluate(columns):
+        values, nulls = _boolean_operand(operand, columns)
+        return np.logical_not(values), nulls
+    return evaluate
+
+def _logical_and(left, right):
+    """Kleene AND: FALSE if either side is known FALSE, NULL if otherwise unknown."""
+    def evaluate(columns):
+        left_values, left_nulls = _boolean_operand(left, columns)
+        right_values, right_nulls = _boolean_operand(right, columns)
+        values = np.logical_and(left_values, right_values)
+        if not _is_null(left_nulls) and not _is_null(right_nulls):
+            return values, False
+        known_false = np.logical_or(np.logical_and(np.logical_not(left_values), np.logical_not(left_nulls)),
+                                    np.logical_and(np.logical_not(right_values), np.logical_not(right_nulls)))
+        return values, np.logical_and(_union_nulls(left_nulls, right_nulls), np.logical_not(known_false))
+    return evaluate
+
+def _logical_or(left, right):
+    """Kleene OR: TRUE if either side is known TRUE, NULL if otherwise unknown."""
+    def evaluate(columns):
+        left_values, left_nulls = _boolean_operand(left, columns)
+        right_values, right_nulls = _boolean_operand(right, columns)
+        values = np.logical_or(left_values, right_values)
+        if not _is_null(left_nulls) and not _is_null(right_nulls):
+            return values, False
+        known_true = np.logical_or(np.logical_and(left_values, np.logical_not(left_nulls)),
+                                   np.logical_and(right_values, np.logical_not(right_nulls)))
+        return values, np.logical_and(_union_nulls(left_nulls, right_nulls), np.logical_not(known_true))
+    return evaluate
+
+def _is_null_test(operand, negated):
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        if values is None:
+            nulls = True
+        return (np.logical_not(nulls) if negated else nulls), False
+    return evaluate
+
+def _in_list(operand, items, negated):
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        item_values = [item(columns)[0] for item in items]
+        if isinstance(values, pd.Series):
+            matched = values.isin(item_values).to_numpy()
+        else:
+            matched = values in item_values
+        return (np.logical_not(matched) if negated else matched), nulls
+    return evaluate
+
+def _like(operand, pattern, negated):
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        pattern_value = pattern(columns)[0]
+        regex = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char)
+                        for char in pattern_value)
+        matched = values.astype(str).str.fullmatch(regex, flags=re.DOTALL).to_numpy(dtype=bool, na_value=False)
+        return (np.logical_not(matched) if negated else matched), nulls
+    return evaluate
+
+def _string_method(name):
+    def apply(values):
+        return getattr(values.str, name)()
+    return apply
+
+def _length(values):
+    return values.str.len()
+
+def _date(values):
+    return pd.to_datetime(values).dt.normalize() if isinstance(values, pd.Series) else pd.Timestamp(values).normalize()
+
+_SCALAR_FUNCTIONS = {
+    'LENGTH': _length,
+    'CHAR_LENGTH': _length,
+    'UPPER': _string_method('upper'),
+    'LOWER': _string_method('lower'),
+    'TRIM': _string_method('strip'),
+    'ABS': abs,
+    'DATE': _date
+}
+
+def _scalar_function(function, operand):
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        if values is None:
+            return None, True
+        return function(values), nulls
+    return evaluate
+
+def _coalesce(operands):
+    def evaluate(columns):
+        values, nulls = operands[0](columns)
+        for operand in operands[1:]:
+            if nulls is False:
+                break
+            other_values, other_nulls = operand(columns)
+            if values is None or nulls is True:
+                values, nulls = other_values, other_nulls
+                continue
+            values = values.where(~nulls, other_values)
+            nulls = np.logical_and(nulls, other_nulls) if other_nulls is not False else False
+        return values, nulls
+    return evaluate
+
+def _concat(operands):
+    """BigQuery CONCAT: the arguments joined as strings, NULL when any argument is NULL."""
+    def evaluate(columns):
+        results = [operand(columns) for operand in operands]
+        if any(values is None for values, _ in results):
+            return None, True
+        values = ''
+        for operand_values, _ in results:
+            if isinstance(operand_values, pd.Series):
+                operand_values = operand_values.astype(str)
+            values = values + (operand_values if isinstance(operand_values, (pd.Series, str))
+                               else str(operand_values))
+        return values, _union_nulls(*[nulls for _, nulls in results])
+    return evaluate
+
+def _current_date(columns):
+    return pd.Timestamp(datetime.utcnow().date()), False
+
+def _interval_offset(amount, unit):
+    """Offset for INTERVAL amount unit."""
+    unit = unit.upper()
+    if unit in _INTERVAL_UNITS:
+        return pd.to_timedelta(amount, unit=_INTERVAL_UNITS[unit])
+    if unit in ('MONTH', 'QUARTER', 'YEAR'):
+        months = {'MONTH': 1, 'QUARTER': 3, 'YEAR': 12}[unit] * int(amount)
+        return pd.DateOffset(months=months)
+    raise ValueError(f"Unsupported interval unit: {unit}")
+
+def _date_arithmetic(sign, operand, amount, unit):
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        amount_values, amount_nulls = amount(columns)
+        offset = _interval_offset(amount_values, unit)
+        return (values + offset if sign > 0 else values - offset), _union_nulls(nulls, amount_nulls)
+    return evaluate
+
+def _cast_values(values, type_name):
+    """Convert a Series or scalar to a SQL type; NULL rows keep their null mask."""
+    if type_name in ('DATE', 'TIMESTAMP'):
+        return _date(values) if type_name == 'DATE' else pd.to_datetime(values)
+    if type_name == 'STRING':
+        return values.astype(str) if isinstance(values, pd.Series) else str(values)
+    if type_name == 'BOOL':
+        return values.astype(bool) if isinstance(values, pd.Series) else bool(values)
+    numbers = pd.to_numeric(values, errors='coerce')
+    if type_name == 'INT64':
+        # BigQuery rounds half away from zero when casting to INT64
+        numbers = np.trunc(numbers + np.copysign(0.5, numbers))
+    return numbers
+
+def _cast(operand, type_name):
+    type_name = type_name.upper()
+    if type_name not in _CAST_TYPES:
+        raise ValueError(f"Unsupported CAST type: {type_name}")
+
+    def evaluate(columns):
+        values, nulls = operand(columns)
+        if values is None:
+            return None, True
+        return _cast_values(values, type_name), nulls
+    return evaluate
+
+class _Parser:
+    """Recursive-descent parser building an evaluator from SQL expression tokens."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def keyword(self, *words, offset=0):
+        kind, text = self.peek(offset)
+        return kind == 'identifier' and text.upper() in words
+
+    def take(self, expected=None):
+        kind, text = self.peek()
+        if kind is None or (expected is not None and text.upper() != expected):
+            raise ValueError(f"Expected {expected or 'a token'} but found {text!r}")
+        self.position += 1
+        return kind, text
+
+    def parse(self):
+        evaluator = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token {self.peek()[1]!r}")
+        return evaluator
+
+    def parse_or(self):
+        left = self.parse_and()
+        while self.keyword('OR'):
+            self.take()
+            left = _logical_or(left, self.parse_and())
+        return left
+
+    def parse_and(self):
+        left = self.parse_not()
+        while self.keyword('AND'):
+            self.take()
+            left = _logical_and(left, self.parse_not())
+        return left
+
+    def parse_not(self):
+        if self.keyword('NOT'):
+            self.take()
+            return _logical_not(self.parse_not())
+        return self.parse_predicate()
+
+    def parse_predicate(self):
+        left = self.parse_additive()
+        kind, text = self.peek()
+        if kind == 'operator' and text in _COMPARISONS:
+            self.take()
+            return _comparison(_COMPARISONS[text], left, self.parse_additive())
+        if self.keyword('IS'):
+            self.take()
+            negated = self.keyword('NOT')
+            if negated:
+                self.take()
+            self.take('NULL')
+            return _is_null_test(left, negated)
+        negated = self.keyword('NOT') and self.keyword('IN', 'BETWEEN', 'LIKE', offset=1)
+        if negated:
+            self.take()
+        if self.keyword('IN'):
+            self.take()
+            self.take('(')
+            items = [self.parse_additive()]
+            while self.peek()[1] == ',':
+                self.take()
+                items.append(self.parse_additive())
+            self.take(')')
+            return _in_list(left, items, negated)
+        if self.keyword('BETWEEN'):
+            self.take()
+            low = self.parse_additive()
+            self.take('AND')
+            high = self.parse_additive()
+            between = _logical_and(_comparison(operator.ge, left, low),
+                                   _comparison(operator.le, left, high))
+            return _logical_not(between) if negated else between
+        if self.keyword('LIKE'):
+            self.take()
+            return _like(left, self.parse_additive(), negated)
+        return left
+
+    def parse_additive(self):
+        left = self.parse_term()
+        while self.peek()[1] in ('+', '-'):
+            _, text = self.take()
+            left = _arithmetic(_ARITHMETIC[text], left, self.parse_term())
+        return left
+
+    def parse_term(self):
+        left = self.parse_unary()
+        while self.peek()[1] in ('*', '/'):
+            _, text = self.take()
+            left = _arithmetic(_ARITHMETIC[text], left, self.parse_unary())
+        return left
+
+    def parse_unary(self):
+        if self.peek()[1] == '-':
+            self.take()
+            return _negate(self.parse_unary())
+        return self.parse_primary()
+
+    def parse_arguments(self):
+        self.take('(')
+        arguments = []
+        if self.peek()[1] != ')':
+            arguments.append(self.parse_or())
+            while self.peek()[1] == ',':
+                self.take()
+                arguments.append(self.parse_or())
+        self.take(')')
+        return arguments
+
+    def parse_primary(self):
+        kind, text = self.take()
+        if kind == 'number':
+            return _literal(float(text) if '.' in text else int(text))
+        if kind == 'string':
+            return _literal(re.sub(r'\\(.)', r'\1', text[1:-1]))
+        if kind == 'operator' and text == '(':
+            evaluator = self.parse_or()
+            self.take(')')
+            return evaluator
+        if kind != 'identifier':
+            raise ValueError(f"Unexpected token {text!r}")
+        word = text.upper()
+        if word == 'NULL':
+            return _literal(None)
+        if word in ('TRUE', 'FALSE'):
+            return _literal(word == 'TRUE')
+        if word in ('DATE', 'TIMESTAMP') and self.peek()[0] == 'string':
+            _, literal = self.take()
+            value = pd.Timestamp(literal[1:-1])
+            return _literal(value.normalize() if word == 'DATE' else value)
+        if self.peek()[1] == '(':
+            return self.parse_function(word)
+        return _column(text.strip('`').split('.')[-1])
+
+    def parse_function(self, name):
+        if name in ('DATE_SUB', 'DATE_ADD', 'TIMESTAMP_SUB', 'TIMESTAMP_ADD'):
+            self.take('(')
+            operand = self.parse_or()
+            self.take(',')
+            self.take('INTERVAL')
+            amount = self.parse_additive()
+            _, unit = self.take()
+            self.take(')')
+            return _date_arithmetic(1 if name.endswith('_ADD') else -1, operand, amount, unit)
+        if name == 'CAST':
+            self.take('(')
+            operand = self.parse_or()
+            self.take('AS')
+            _, type_name = self.take()
+            self.take(')')
+            return _cast(operand, type_name)
+        arguments = self.parse_arguments()
+        if name == 'CURRENT_DATE' and not arguments:
+            return _current_date
+        if name == 'CONCAT' and arguments:
+            return _concat(arguments)
+        if name in ('COALESCE', 'IFNULL') and arguments:
+            return _coalesce(arguments)
+        if name in _SCALAR_FUNCTIONS and len(arguments) == 1:
+            return _scalar_function(_SCALAR_FUNCTIONS[name], arguments[0])
+        raise ValueError(f"Unsupported function in expression: {name}")
+
+def compile_expression(expression):
+    """Compile a SQL expression once into a vectorised evaluator, cached by its text."""
+    if expression not in _compiled_expressions:
+        _compiled_expressions[expression] = _Parser(tokenize(expression)).parse()
+    return _compiled_expressions[expression]
+
+def column_accessor(get_series):
+    """Wrap a name -> Series lookup as the cached column accessor evaluators expect."""
+    cache = {}
+
+    def columns(name):
+        if name not in cache:
+            series = _normalise_column(get_series(name))
+            nulls = series.isna().to_numpy()
+            cache[name] = (series, nulls if nulls.any() else False)
+        return cache[name]
+    return columns
+
+def evaluate_predicate(expression, columns, row_count):
+    """Rows where a SQL predicate is TRUE (not FALSE or NULL), as a bool array."""
+    values, nulls = compile_expression(expression)(columns)
+    values = np.broadcast_to(np.asarray(values, dtype=bool), (row_count,))
+    if nulls is False:
+        return values
+    return np.logical_and(values, np.logical_not(np.broadcast_to(nulls, (row_count,))))
+
+def evaluate_negated_predicate(expression, columns, row_count):
+    """Rows where a SQL predicate is FALSE (NOT predicate is TRUE), as a bool array."""
+    values, nulls = compile_expression(expression)(columns)
+    values = np.broadcast_to(np.logical_not(np.asarray(values, dtype=bool)), (row_count,))
+    if nulls is False:
+        return values
+    return np.logical_and(values, np.logical_not(np.broadcast_to(nulls, (row_count,))))
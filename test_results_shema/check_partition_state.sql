@@ -0,0 +1,11 @@
+CREATE TABLE `your_project.your_dataset.check_partition_state` (
+  dataset STRING NOT NULL,
+  table STRING NOT NULL,
+  check_key STRING NOT NULL,
+  partition_date DATE NOT NULL,
+  total_rows INT64 NOT NULL,
+  metric_count INT64 NOT NULL,
+  timestamp TIMESTAMP NOT NULL
+)
+PARTITION BY partition_date
+CLUSTER BY dataset, table, check_key;
@@ -0,0 +1,13 @@
+CREATE TABLE `your_project.your_dataset.check_result_cache` (
+  cache_key STRING NOT NULL,
+  dataset STRING NOT NULL,
+  table STRING NOT NULL,
+  task_type STRING NOT NULL,
+  last_modified_time TIMESTAMP NOT NULL,
+  num_rows INT64,
+  result STRING NOT NULL,
+  run_id STRING NOT NULL,
+  timestamp TIMESTAMP NOT NULL
+)
+PARTITION BY DATE(timestamp)
+CLUSTER BY cache_key;
@@ -1,5 +1,6 @@
 CREATE TABLE `your_project.your_dataset.data_quality_results` (
   run_id STRING NOT NULL,
+  check_id STRING,
   dataset STRING NOT NULL,
   table STRING NOT NULL,
   check_type STRING NOT NULL,
@@ -17,5 +18,12 @@ CREATE TABLE `your_project.your_dataset.data_quality_results` (
   filter_condition STRING,
   generated_sql STRING,
   error_message STRING,
+  error_bound FLOAT64,
+  estimated_bytes INT64,
+  cached BOOL,
+  sample_percent FLOAT64,
+  sample_rows INT64,
+  confidence_lower FLOAT64,
+  confidence_upper FLOAT64,
   timestamp TIMESTAMP NOT NULL
 );
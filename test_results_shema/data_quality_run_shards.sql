@@ -0,0 +1,17 @@
+CREATE TABLE `your_project.your_dataset.data_quality_run_shards` (
+  run_id STRING NOT NULL,
+  shard_index INT64 NOT NULL,
+  shard_count INT64 NOT NULL,
+  start_time TIMESTAMP NOT NULL,
+  end_time TIMESTAMP NOT NULL,
+  status STRING NOT NULL,
+  error_message STRING,
+  total_queries INT64,
+  total_dry_runs INT64,
+  total_bytes_processed INT64,
+  total_bytes_billed INT64,
+  total_slot_millis INT64,
+  total_cache_hits INT64,
+  total_retries INT64,
+  total_query_seconds FLOAT64
+);
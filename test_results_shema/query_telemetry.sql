@@ -0,0 +1,25 @@
+CREATE TABLE `your_project.your_dataset.query_telemetry` (
+  run_id STRING NOT NULL,
+  task_type STRING,
+  dataset STRING,
+  table STRING,
+  checks STRING,
+  query_kind STRING,
+  query_fingerprint STRING NOT NULL,
+  job_id STRING,
+  status STRING NOT NULL,
+  attempts INT64 NOT NULL,
+  retries INT64 NOT NULL,
+  total_bytes_processed INT64,
+  total_bytes_billed INT64,
+  slot_millis INT64,
+  cache_hit BOOL,
+  queue_ms FLOAT64,
+  execution_ms FLOAT64,
+  duration_ms FLOAT64,
+  rows_returned INT64,
+  error_message STRING,
+  timestamp TIMESTAMP NOT NULL
+)
+PARTITION BY DATE(timestamp)
+CLUSTER BY dataset, table, task_type;
@@ -3,8 +3,11 @@ CREATE TABLE `your_project.your_dataset.row_count_history` (
   dataset STRING NOT NULL,
   table STRING NOT NULL,
   group_by_columns STRING NOT NULL,
+  group_key INT64 NOT NULL,
   group_values STRING NOT NULL,
   row_count INT64 NOT NULL,
   filter_condition STRING,
   timestamp TIMESTAMP NOT NULL
-);
+)
+PARTITION BY DATE(timestamp)
+CLUSTER BY dataset, table, group_by_columns, group_key;
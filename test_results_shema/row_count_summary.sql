@@ -0,0 +1,16 @@
+CREATE TABLE `your_project.your_dataset.row_count_summary` (
+  dataset STRING NOT NULL,
+  table STRING NOT NULL,
+  group_by_columns STRING NOT NULL,
+  filter_condition STRING,
+  group_key INT64 NOT NULL,
+  group_values STRING NOT NULL,
+  history_depth INT64 NOT NULL,
+  point_count INT64 NOT NULL,
+  count_sum FLOAT64 NOT NULL,
+  count_sum_squares FLOAT64 NOT NULL,
+  last_timestamp TIMESTAMP NOT NULL,
+  last_run_id STRING NOT NULL,
+  updated_at TIMESTAMP NOT NULL
+)
+CLUSTER BY dataset, table, group_by_columns, group_key;
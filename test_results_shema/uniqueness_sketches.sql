@@ -0,0 +1,13 @@
+CREATE TABLE `your_project.your_dataset.uniqueness_sketches` (
+  dataset STRING NOT NULL,
+  table STRING NOT NULL,
+  columns STRING NOT NULL,
+  filter_condition STRING,
+  partition_date DATE NOT NULL,
+  total_rows INT64 NOT NULL,
+  sketch BYTES,
+  run_id STRING NOT NULL,
+  timestamp TIMESTAMP NOT NULL
+)
+PARTITION BY partition_date
+CLUSTER BY dataset, table, columns;
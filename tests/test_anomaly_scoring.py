@@ -0,0 +1,35 @@
+import numpy as np
+
+from anomaly_scoring import build_history_matrix, score_anomalies
+
+
+def test_build_history_matrix_pads_and_truncates():
+    matrix = build_history_matrix([[3, 2, 1], [5], []], depth=2)
+    np.testing.assert_array_equal(matrix, [[3, 2], [5, np.nan], [np.nan, np.nan]])
+
+
+def test_score_anomalies_mean_model():
+    history = build_history_matrix([[100, 100, 100], [100, 100, 100], [100]])
+    expected, score, status = score_anomalies([100, 150, 500], history, 'mean', threshold=0.1,
+                                              minimum_data_points=3)
+    np.testing.assert_allclose(expected[:2], [100, 100])
+    np.testing.assert_allclose(score[:2], [0.0, 0.5])
+    assert np.isnan(score[2])
+    assert status.tolist() == ['normal', 'anomaly', 'insufficient_data']
+
+
+def test_score_anomalies_handles_constant_history():
+    history = build_history_matrix([[10, 10, 10], [10, 10, 10]])
+    _, score, status = score_anomalies([10, 11], history, 'zscore', threshold=3,
+                                       minimum_data_points=3)
+    assert score.tolist() == [0.0, np.inf]
+    assert status.tolist() == ['normal', 'anomaly']
+
+
+def test_score_anomalies_robust_models():
+    history = build_history_matrix([[10, 12, 11, 1000, 9]])
+    expected, _, status = score_anomalies([11], history, 'median', minimum_data_points=5)
+    assert expected.tolist() == [11.0]
+    assert status.tolist() == ['normal']
+    _, _, status = score_anomalies([11], history, 'mad', threshold=3, minimum_data_points=5)
+    assert status.tolist() == ['normal']
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+import yaml
+
+from config_compiler import ConfigError, compile_config, compile_config_file
+
+
+def table_config(**checks):
+    return {'tables': [{'dataset': 'sales_data', 'table': 'orders', 'checks': checks}]}
+
+
+def test_compile_config_reports_every_problem():
+    config = table_config(
+        null_checks=[{'column': 'id', 'threshold': -1}],
+        conditional_checks=[{'threshold': 0}],
+        range_checks=[]
+    )
+    with pytest.raises(ConfigError) as error:
+        compile_config(config)
+    problems = error.value.problems
+    assert len(problems) == 3
+    assert any('threshold must be at least 0' in problem for problem in problems)
+    assert any('condition is required' in problem for problem in problems)
+    assert any("unknown check list 'range_checks'" in problem for problem in problems)
+
+
+def test_compile_config_rejects_duplicate_tables():
+    config = {'tables': [{'dataset': 'd', 'table': 't'}, {'dataset': 'd', 'table': 't'}]}
+    with pytest.raises(ConfigError, match='configured more than once'):
+        compile_config(config)
+
+
+def test_check_ids_do_not_depend_on_the_dialect():
+    config = table_config(conditional_checks=[{
+        'condition': 'amount >= 0',
+        'threshold': 0,
+        'filter': 'order_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)'
+    }])
+    bigquery_check = compile_config(config).conditional_checks[0]
+    duckdb_check = compile_config(config, dialect='duckdb').conditional_checks[0]
+    assert duckdb_check['filter'] != bigquery_check['filter']
+    assert duckdb_check['check_id'] == bigquery_check['check_id']
+
+
+def test_compile_config_selects_checks():
+    config = table_config(null_checks=[{'column': 'id', 'threshold': 0}],
+                          uniqueness_checks=[{'columns': ['id'], 'threshold': 0}])
+    compiled = compile_config(config, checks='uniqueness_checks')
+    assert compiled.null_checks == []
+    assert [check['columns'] for check in compiled.uniqueness_checks] == [['id']]
+
+
+def test_plan_cache_round_trips_as_json(tmp_path):
+    config_file = tmp_path / 'config.yaml'
+    config_file.write_text(yaml.safe_dump({
+        'budget': {'max_bytes_per_run': 100},
+        'tables': [{'dataset': 'sales_data', 'table': 'orders', 'max_bytes': 10, 'cache': False,
+                    'checks': {'null_checks': [{'column': 'id', 'threshold': 0}],
+                               'uniqueness_checks': [{'columns': ['id'], 'threshold': 0,
+                                                      'approximate': True,
+                                                      'partition_column': 'order_date'}]}}]
+    }))
+    cache_dir = tmp_path / 'plans'
+    compiled = compile_config_file(str(config_file), cache_dir=str(cache_dir))
+    [cache_file] = cache_dir.iterdir()
+    assert cache_file.suffix == '.json'
+
+    cached = compile_config_file(str(config_file), cache_dir=str(cache_dir))
+    assert cached.to_dict() == compiled.to_dict()
+    assert cached.byte_budget['table_budgets'] == {('sales_data', 'orders'): 10}
+    assert cached.result_cache['disabled_tables'] == [('sales_data', 'orders')]
+    assert cached.table_scans[0]['checks'][0]['check'] is cached.null_checks[0]
+    assert cached.sketch_checks[0] is cached.uniqueness_checks[0]
+
+
+def test_plan_cache_ignores_plans_of_other_code(tmp_path):
+    config_file = tmp_path / 'config.yaml'
+    config_file.write_text(yaml.safe_dump(table_config(null_checks=[{'column': 'id', 'threshold': 0}])))
+    compile_config_file(str(config_file), cache_dir=str(tmp_path))
+    [cache_file] = tmp_path.glob('*.json')
+    cache_file.write_text(json.dumps({'plan_code_version': 'old', 'plan': {}}))
+    compiled = compile_config_file(str(config_file), cache_dir=str(tmp_path))
+    assert [check['column'] for check in compiled.null_checks] == ['id']
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import dataframe_checks
+from config_compiler import compile_config
+from data_quality_checks import execute_table_scan
+from dataframe_checks import DataFrameContext, evaluate_uniqueness_check, run_dataframe_checks
+from execution_backends import DuckDBClient
+
+CONFIG = {'tables': [{
+    'dataset': 'sales_data',
+    'table': 'orders',
+    'checks': {
+        'null_checks': [
+            {'column': 'email', 'threshold': 0},
+            {'column': 'amount', 'threshold': 5, 'filter': "region = 'East'"}
+        ],
+        'uniqueness_checks': [
+            {'columns': ['email'], 'threshold': 0},
+            {'columns': ['region', 'amount'], 'threshold': 0},
+            {'columns': ['order_id'], 'threshold': 0, 'filter': 'amount > 10'}
+        ],
+        'conditional_checks': [
+            {'condition': 'amount >= 0', 'threshold': 0},
+            {'condition': "email LIKE '%@example.com'", 'threshold': 0, 'filter': 'region IN ("East", "West")'},
+            {'condition': 'order_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)', 'threshold': 0},
+            {'condition': 'amount BETWEEN 0 AND 50 OR region IS NULL', 'threshold': 0}
+        ]
+    }
+}]}
+
+
+def make_orders(rows=200):
+    rng = np.random.default_rng(3)
+    today = date.today()
+    emails = np.array([f"user{index}@example.com" for index in range(rows // 2)] + ['bad@other.org'],
+                      dtype=object)
+    frame = pd.DataFrame({
+        'order_id': rng.integers(0, rows, size=rows),
+        'email': emails[rng.integers(0, len(emails), size=rows)],
+        'region': rng.choice(np.array(['East', 'West', 'North'], dtype=object), size=rows),
+        'amount': rng.integers(-5, 60, size=rows).astype(float),
+        'order_date': pd.to_datetime([today - timedelta(days=int(days))
+                                      for days in rng.integers(0, 60, size=rows)])
+    })
+    for column, step in (('email', 7), ('region', 11), ('amount', 13), ('order_date', 17)):
+        frame.loc[frame.index[::step], column] = None
+    return frame
+
+
+def metrics(results):
+    return {result['check_id']: (result['metric_value'], result['total_rows']) for result in results}
+
+
+def test_dataframe_metrics_match_the_duckdb_pipeline():
+    frame = make_orders()
+    client = DuckDBClient()
+    client.connection.execute("CREATE SCHEMA sales_data")
+    client.connection.register('orders_frame', frame)
+    client.connection.execute("CREATE TABLE sales_data.orders AS SELECT * FROM orders_frame")
+
+    pipeline_results = []
+    for plan in compile_config(CONFIG, dialect='duckdb').table_scans:
+        pipeline_results.extend(execute_table_scan(plan, 'run_1', client))
+    dataframe_results = run_dataframe_checks(frame, CONFIG, 'sales_data', 'orders', 'run_1')
+
+    assert len(dataframe_results) == 9
+    assert all(result['status'] != 'error' for result in pipeline_results + dataframe_results)
+    assert metrics(dataframe_results) == metrics(pipeline_results)
+
+
+def test_uniqueness_survives_hash_collisions(monkeypatch):
+    frame = pd.DataFrame({'region': ['East', 'East', 'West', 'North', None],
+                          'email': ['a', 'a', 'b', 'c', 'd']})
+    check = {'dataset': 'sales_data', 'table': 'orders', 'columns': ['region', 'email'],
+             'threshold': 0}
+    expected = evaluate_uniqueness_check(DataFrameContext(frame), check, 'run_1')['metric_value']
+    # Every value hashes alike, so every row collides with every other
+    monkeypatch.setattr(dataframe_checks, '_hash_values', lambda values: np.zeros(len(values), np.uint64))
+    result = evaluate_uniqueness_check(DataFrameContext(frame), check, 'run_1')
+    # Five rows, three distinct non-NULL combinations
+    assert expected == 2
+    assert result['metric_value'] == 2
@@ -0,0 +1,63 @@
+import pytest
+
+import data_quality_checks
+from data_quality_checks import analyze_group_anomalies, stream_group_anomalies
+from execution_backends import DuckDBClient
+from result_sinks import ResultSink
+
+GROUP_CONFIG = {'dataset': 'sales_data', 'table': 'orders', 'columns': ['region'],
+                'anomaly_threshold': 0.2, 'historical_data_points': 7, 'minimum_data_points': 3,
+                'model': 'median', 'max_groups': 2}
+
+
+class DuckDBSink(ResultSink):
+    """Writes to a DuckDB client, rejecting every row for the table other.rejected."""
+
+    queryable = True
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def write(self, table_id, rows):
+        if table_id == 'other.rejected':
+            return [{'table_id': table_id, 'row': row, 'errors': 'rejected'} for row in rows]
+        return self.client.insert_rows_json(table_id, rows)
+
+
+@pytest.fixture
+def client():
+    client = DuckDBClient()
+    client.connection.execute("CREATE SCHEMA sales_data")
+    client.connection.execute(
+        "CREATE TABLE sales_data.orders AS "
+        "SELECT ['East', 'West', 'North'][i % 3 + 1] AS region FROM range(30) AS t(i)")
+    return client
+
+
+def result_rows(client):
+    return client.connection.execute(
+        "SELECT status, error_message FROM your_dataset.data_quality_results").fetchall()
+
+
+def test_max_groups_and_other_value_errors_are_reported_differently(client, monkeypatch):
+    [result] = analyze_group_anomalies(GROUP_CONFIG, 'run-1', client)
+    assert result['status'] == 'error'
+    assert 'more than the limit of 2' in result['error_message']
+    assert 'raise max_groups' in result['error_message']
+
+    def failing_query(*args, **kwargs):
+        raise ValueError('not a row limit')
+
+    monkeypatch.setattr(data_quality_checks, 'execute_query_with_retries', failing_query)
+    assert analyze_group_anomalies(GROUP_CONFIG, 'run-1', client) == []
+
+
+def test_streaming_flushes_only_its_own_rows(client):
+    sink = DuckDBSink(client)
+    sink.add('other.rejected', [{'id': 1}])
+    written = stream_group_anomalies(dict(GROUP_CONFIG, max_groups=None), 'run-1', client, sink)
+    assert written == 3
+    assert result_rows(client) == [('insufficient_data', None)] * 3
+    # Another task's row is still buffered, and its error is reported by the run's flush
+    assert [error['table_id'] for error in sink.flush()] == ['other.rejected']
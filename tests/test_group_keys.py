@@ -0,0 +1,31 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+from dataframe_checks import DataFrameContext, count_groups
+from execution_backends import DuckDBClient
+from group_keys import as_dates, group_key, serialize_groups
+
+
+def test_date_groups_key_the_same_in_the_warehouse_and_pandas():
+    client = DuckDBClient()
+    client.connection.execute("CREATE SCHEMA sales_data")
+    client.connection.execute(
+        "CREATE TABLE sales_data.orders AS "
+        "SELECT DATE '2024-01-01' + CAST(range % 3 AS INTEGER) AS order_date FROM range(9)"
+    )
+    rows = client.run_query("SELECT order_date FROM sales_data.orders GROUP BY order_date")
+    _, warehouse_keys = serialize_groups(['order_date'], [[row['order_date'] for row in rows]])
+
+    frame = pd.DataFrame({'order_date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03'])})
+    _, dataframe_keys, _ = count_groups(DataFrameContext(frame),
+                                        {'columns': ['order_date'], 'filter': None})
+    assert sorted(dataframe_keys) == sorted(warehouse_keys)
+    assert group_key({'order_date': date(2024, 1, 1)}) in warehouse_keys
+
+
+def test_as_dates_only_converts_naive_midnights():
+    assert as_dates([pd.Timestamp('2024-01-01'), None]) == [date(2024, 1, 1), None]
+    timestamps = [datetime(2024, 1, 1), datetime(2024, 1, 1, 12)]
+    assert as_dates(timestamps) == timestamps
+    assert as_dates(['2024-01-01']) == ['2024-01-01']
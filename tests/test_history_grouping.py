@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from data_quality_checks import (analyze_group_anomalies, get_history_summaries,
+                                 refresh_history_summaries)
+from execution_backends import DuckDBClient
+from group_keys import group_key, serialize_group_values
+
+HISTORY_TABLE = 'your_project.your_dataset.row_count_history'
+
+# Two groupings on the same column, told apart only by their filters
+GROUPINGS = [
+    {'dataset': 'sales_data', 'table': 'orders', 'columns': ['region'], 'filter': "status = 'a'",
+     'anomaly_threshold': 0.2, 'historical_data_points': 7, 'minimum_data_points': 3,
+     'model': 'mean'},
+    {'dataset': 'sales_data', 'table': 'orders', 'columns': ['region'], 'filter': "status = 'b'",
+     'anomaly_threshold': 0.2, 'historical_data_points': 7, 'minimum_data_points': 3,
+     'model': 'mean'},
+]
+COUNTS = {"status = 'a'": 2, "status = 'b'": 20}
+
+
+def history_row(run_id, filter_condition, row_count, timestamp):
+    return {'run_id': run_id, 'dataset': 'sales_data', 'table': 'orders',
+            'group_by_columns': 'region', 'group_key': group_key({'region': 'East'}),
+            'group_values': serialize_group_values({'region': 'East'}), 'row_count': row_count,
+            'filter_condition': filter_condition, 'timestamp': timestamp.isoformat()}
+
+
+@pytest.fixture
+def client():
+    client = DuckDBClient()
+    client.connection.execute("CREATE SCHEMA sales_data")
+    client.connection.execute(
+        "CREATE TABLE sales_data.orders AS "
+        "SELECT 'East' AS region, CASE WHEN i < 2 THEN 'a' ELSE 'b' END AS status "
+        "FROM range(22) AS t(i)")
+    start = datetime(2026, 1, 1)
+    rows = [history_row(f"run-{day}", filter_condition, row_count, start + timedelta(days=day))
+            for day in range(5) for filter_condition, row_count in COUNTS.items()]
+    assert client.insert_rows_json(HISTORY_TABLE, rows) == []
+    return client
+
+
+def expected_values(client, run_id):
+    return {group_config['filter']: analyze_group_anomalies(group_config, run_id, client)
+            .columns['expected_value'] for group_config in GROUPINGS}
+
+
+def test_filters_on_the_same_columns_keep_separate_history(client):
+    from_history = expected_values(client, 'current')
+    assert from_history == {filter_condition: [float(count)]
+                            for filter_condition, count in COUNTS.items()}
+
+    assert refresh_history_summaries(GROUPINGS, client) == 2
+    for group_config in GROUPINGS:
+        summaries = get_history_summaries('sales_data', 'orders', ['region'], 7, client,
+                                          filter_condition=group_config['filter'],
+                                          exclude_run_id='current')
+        count = COUNTS[group_config['filter']]
+        assert list(summaries.values()) == [(5, 5.0 * count, 5.0 * count * count)]
+    assert expected_values(client, 'current') == from_history
+
+
+def test_out_of_date_summaries_are_not_used(client):
+    refresh_history_summaries(GROUPINGS, client)
+    filter_condition = GROUPINGS[0]['filter']
+
+    # Counts stored after the refresh are newer than the summary
+    client.insert_rows_json(HISTORY_TABLE, [history_row('run-5', filter_condition, 8,
+                                                        datetime(2026, 1, 6))])
+    assert get_history_summaries('sales_data', 'orders', ['region'], 7, client,
+                                 filter_condition=filter_condition,
+                                 exclude_run_id='current') == {}
+    assert expected_values(client, 'current')[filter_condition] == [(2 * 5 + 8) / 6]
+
+    # A summary refreshed with the current run's counts, as on --resume
+    refresh_history_summaries(GROUPINGS, client)
+    assert get_history_summaries('sales_data', 'orders', ['region'], 7, client,
+                                 filter_condition=filter_condition, exclude_run_id='run-5') == {}
+    assert expected_values(client, 'run-5')[filter_condition] == [2.0]
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from anomaly_scoring import build_history_matrix, score_anomalies, score_anomalies_from_summary
+
+
+@pytest.mark.parametrize('model', ['mean', 'zscore'])
+def test_summary_scores_match_full_history(model):
+    rng = np.random.default_rng(7)
+    histories = [list(rng.integers(80, 120, size=size)) for size in (0, 3, 7, 7, 7)]
+    histories.append([50] * 7)
+    current = [100, 95, 130, 100, 60, 50]
+    expected, score, status = score_anomalies(current, build_history_matrix(histories, 7), model,
+                                              threshold=0.2, minimum_data_points=5)
+    summary_expected, summary_score, summary_status = score_anomalies_from_summary(
+        current, [len(history) for history in histories],
+        [float(sum(history)) for history in histories],
+        [float(sum(count * count for count in history)) for history in histories],
+        model, threshold=0.2, minimum_data_points=5)
+    np.testing.assert_allclose(summary_expected, expected)
+    np.testing.assert_allclose(summary_score, score)
+    assert summary_status.tolist() == status.tolist()
+
+
+def test_summary_scoring_rejects_other_models():
+    with pytest.raises(ValueError):
+        score_anomalies_from_summary([1], [5], [5.0], [5.0], 'median')
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from main import shard_run_day
+
+
+def test_shard_run_day_prefers_run_date():
+    assert shard_run_day('run_20240102_235959', '2024-03-04') == datetime(2024, 3, 4)
+
+
+def test_shard_run_day_reads_generated_run_id():
+    # A shard starting after midnight still balances by the day the run started
+    assert shard_run_day('run_20240102_235959', None, datetime(2024, 1, 3, 0, 5)) == datetime(2024, 1, 2)
+
+
+def test_shard_run_day_falls_back_to_start_day():
+    assert shard_run_day('data-quality-abc12', None, datetime(2024, 1, 3, 12, 30)) == datetime(2024, 1, 3)
@@ -0,0 +1,28 @@
+from query_planner import assign_shards, task_key
+
+
+def make_task(check_id):
+    return {'task_type': 'sketch_uniqueness', 'dataset': 'dataset', 'table': 'table',
+            'query': '', 'payload': {'check_id': check_id}, 'estimated_bytes': 0}
+
+
+def test_assign_shards_does_not_depend_on_task_order():
+    tasks = [make_task(f'check_{index}') for index in range(10)]
+    costs = {task_key(task): index % 4 + 1.0 for index, task in enumerate(tasks)}
+    shards = dict(zip(map(task_key, tasks), assign_shards(tasks, 3, costs)))
+    reordered = list(reversed(tasks))
+    assert dict(zip(map(task_key, reordered), assign_shards(reordered, 3, costs))) == shards
+
+
+def test_assign_shards_balances_cost():
+    tasks = [make_task(name) for name in ('a', 'b', 'c', 'd')]
+    costs = {'a': 4.0, 'b': 3.0, 'c': 2.0, 'd': 1.0}
+    assert assign_shards(tasks, 2, costs) == [0, 1, 1, 0]
+
+
+def test_assign_shards_gives_unknown_tasks_the_median_cost():
+    tasks = [make_task(name) for name in ('a', 'b', 'c', 'new')]
+    costs = {'a': 1.0, 'b': 5.0, 'c': 9.0}
+    shards = assign_shards(tasks, 2, costs)
+    # new costs 5, the median, so it balances b rather than being placed last
+    assert shards == [0, 1, 0, 1]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from result_cache import ResultCache, is_deterministic, result_cache_key
+
+class FakeTable:
+    table_type = 'TABLE'
+    streaming_buffer = None
+    modified = datetime(2024, 1, 1)
+    num_rows = 100
+
+class MetadataClient:
+    def get_table(self, table_id):
+        return FakeTable()
+
+def make_task(query):
+    return {'task_type': 'group_anomaly', 'dataset': 'ds', 'table': 't', 'query': query,
+            'payload': {'columns': ['region']}}
+
+def test_queries_with_current_date_or_random_values_are_not_deterministic():
+    assert not is_deterministic("SELECT COUNT(*) FROM t WHERE d >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)")
+    assert not is_deterministic("SELECT COUNT(*) FROM t WHERE ts < current_timestamp")
+    assert not is_deterministic("SELECT RAND() FROM t")
+    assert is_deterministic("SELECT region, COUNT(*) AS row_count FROM t GROUP BY region")
+    assert is_deterministic("SELECT current_dates FROM t")
+
+def test_prepare_keys_only_deterministic_tasks():
+    fixed = make_task("SELECT region, COUNT(*) AS row_count FROM t GROUP BY region")
+    moving = make_task("SELECT region, COUNT(*) AS row_count FROM t "
+                       "WHERE d >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY) GROUP BY region")
+    ResultCache(MetadataClient(), lookup=False).prepare([fixed, moving])
+    assert fixed['cache_key'] == result_cache_key(fixed['query'], fixed['table_metadata'])
+    assert 'cache_key' not in moving
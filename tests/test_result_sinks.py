@@ -0,0 +1,51 @@
+from result_records import ResultBatch
+from result_sinks import MAX_BATCH_ROWS, BigQuerySink, ResultSink
+
+
+class RecordingSink(ResultSink):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, table_id, rows):
+        self.writes.append((table_id, len(rows)))
+        return []
+
+
+class LoadClient:
+
+    def __init__(self):
+        self.loaded = None
+
+    def load_table_from_file(self, file, table_id, job_config=None):
+        self.loaded = file.read().decode('utf-8').splitlines()
+        return self
+
+    def result(self):
+        return None
+
+
+def result_batch(count):
+    batch = ResultBatch()
+    batch.add_rows(count, run_id='run_1', check_type='null_check', status='pass',
+                   generated_sql='SELECT 1')
+    return batch
+
+
+def test_flush_writes_batches_and_rows_in_bounded_chunks():
+    sink = RecordingSink()
+    sink.add('results', result_batch(MAX_BATCH_ROWS + 5))
+    sink.add('results', [{'run_id': 'run_1'}] * 10)
+    sink.add('history', [{'run_id': 'run_1'}])
+    assert sink.flush() == []
+    assert sink.writes == [('results', MAX_BATCH_ROWS), ('results', 15), ('history', 1)]
+
+
+def test_large_flush_uses_one_load_job():
+    client = LoadClient()
+    sink = BigQuerySink(client, load_job_min_rows=20)
+    sink.add('results', result_batch(15))
+    sink.add('results', [{'run_id': 'run_1'}] * 5)
+    assert sink.flush() == []
+    assert len(client.loaded) == 20
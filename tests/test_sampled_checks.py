@@ -0,0 +1,36 @@
+import pytest
+
+from data_quality_checks import build_sampled_check_result, sampled_count_interval
+
+
+def test_interval_brackets_the_extrapolated_count():
+    estimate, lower, upper = sampled_count_interval(50, 0.1)
+    assert estimate == pytest.approx(500)
+    assert lower < estimate < upper
+
+
+def test_interval_of_a_zero_count_is_informative():
+    estimate, lower, upper = sampled_count_interval(0, 0.01)
+    assert estimate == 0
+    assert lower == 0
+    assert upper > 0
+
+
+def test_full_sample_is_exact():
+    assert sampled_count_interval(42, 1.0) == pytest.approx((42, 42, 42))
+
+
+def test_interval_widens_with_confidence():
+    _, lower_95, upper_95 = sampled_count_interval(50, 0.1, 0.95)
+    _, lower_99, upper_99 = sampled_count_interval(50, 0.1, 0.99)
+    assert lower_99 < lower_95 and upper_99 > upper_95
+
+
+def test_sampled_check_fails_when_the_upper_bound_exceeds_the_threshold():
+    check = {'dataset': 'd', 'table': 't', 'column': 'email', 'threshold': 10, 'filter': None,
+             'confidence': 0.95}
+    result = build_sampled_check_result('run_1', 'null_check', check, 'SELECT 1', 10, 1000, 0)
+    assert result['metric_value'] == 0
+    assert result['total_rows'] == 10000
+    assert result['confidence_upper'] > 10
+    assert result['status'] == 'fail'
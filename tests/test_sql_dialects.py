@@ -0,0 +1,32 @@
+import duckdb
+
+from sql_dialects import translate_bigquery_sql
+
+
+def test_bigquery_sql_is_unchanged_for_bigquery():
+    sql = 'status = "active"'
+    assert translate_bigquery_sql(sql, 'bigquery') == sql
+
+
+def test_string_literals_use_single_quotes():
+    assert translate_bigquery_sql('status = "active"') == "status = 'active'"
+    assert translate_bigquery_sql("name = 'it\\'s'") == "name = 'it''s'"
+
+
+def test_create_table_drops_partitioning_and_maps_types():
+    sql = ("CREATE TABLE `your_project.sales_data.orders` (id INT64, region STRING, amount FLOAT64) "
+           "PARTITION BY DATE(created_at) CLUSTER BY region")
+    assert translate_bigquery_sql(sql) == (
+        'CREATE TABLE "sales_data"."orders" (id BIGINT, region VARCHAR, amount DOUBLE)')
+
+
+def test_translated_filters_run_on_duckdb():
+    connection = duckdb.connect()
+    filter_condition = translate_bigquery_sql(
+        "order_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY) AND region = \"East\"")
+    query = translate_bigquery_sql("SELECT COUNT(*) FROM UNNEST(GENERATE_ARRAY(1, 10)) AS x")
+    assert connection.execute(query).fetchone() == (10,)
+    count = connection.execute(
+        "SELECT COUNT(*) FROM (SELECT CURRENT_DATE - 5 AS order_date, 'East' AS region "
+        f"UNION ALL SELECT CURRENT_DATE - 60, 'East') WHERE {filter_condition}").fetchone()
+    assert count == (1,)
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from sql_expressions import column_accessor, evaluate_negated_predicate, evaluate_predicate
+
+
+def truth_values(expression, frame):
+    """'T', 'F' or 'N' (NULL) per row of a predicate evaluated on a DataFrame."""
+    columns = column_accessor(lambda name: frame[name])
+    true_rows = evaluate_predicate(expression, columns, len(frame))
+    false_rows = evaluate_negated_predicate(expression, columns, len(frame))
+    return ''.join('T' if true else 'F' if false else 'N' for true, false in zip(true_rows, false_rows))
+
+
+@pytest.fixture
+def frame():
+    today = pd.Timestamp(date.today())
+    return pd.DataFrame({
+        'amount': [5.0, None, -1.0, 20.0],
+        'flag': [True, True, False, None],
+        'status': ['active', 'inactive', None, 'archived'],
+        'order_date': [today, today - timedelta(days=10), None, today - timedelta(days=40)]
+    })
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('amount > 0', 'TNFT'),
+    ('amount > 0 AND flag', 'TNFN'),
+    ('amount > 0 OR flag', 'TTFT'),
+    ('NOT amount > 0', 'FNTF'),
+    ('amount > 0 AND NULL', 'NNFN'),
+    ('amount > 0 OR NULL', 'TNNT'),
+    ('NOT (amount > 0 OR NULL)', 'FNNF'),
+    ('amount IS NULL', 'FTFF'),
+    ('status IS NOT NULL', 'TTFT'),
+])
+def test_three_valued_logic(frame, expression, expected):
+    assert truth_values(expression, frame) == expected
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ("status IN ('active', 'archived')", 'TFNT'),
+    ("status NOT IN ('active')", 'FTNT'),
+    ('amount IN (5, 20)', 'TNFT'),
+    ("status LIKE 'a%'", 'TFNT'),
+    ("status NOT LIKE '_ctive'", 'FTNT'),
+    ('amount BETWEEN 0 AND 10', 'TNFF'),
+    ('amount NOT BETWEEN 0 AND 10', 'FNTT'),
+])
+def test_in_like_and_between(frame, expression, expected):
+    assert truth_values(expression, frame) == expected
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('order_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)', 'TTNF'),
+    ('order_date < DATE_ADD(DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH), INTERVAL 1 DAY)', 'FFNT'),
+    ('order_date = CURRENT_DATE()', 'TFNF'),
+    ("CAST(amount AS INT64) = 5", 'TNFF'),
+    ("CAST('2000-01-01' AS DATE) < order_date", 'TTNT'),
+])
+def test_dates_and_casts(frame, expression, expected):
+    assert truth_values(expression, frame) == expected
+
+
+def test_concat_is_null_when_any_argument_is_null(frame):
+    assert truth_values("CONCAT(status, '-x') = 'active-x'", frame) == 'TFNF'
+    assert truth_values("CONCAT(status, NULL) IS NULL", frame) == 'TTTT'
+
+
+def test_unsupported_syntax_is_rejected(frame):
+    with pytest.raises(ValueError, match='Unsupported function'):
+        truth_values('REGEXP_CONTAINS(status, "a")', frame)